@@ -1,10 +1,13 @@
 import getpass
-from database import DatabaseHelper
+from database import DatabaseHelper, SettingsCache
 from auth import AuthManager
+from simulation import profile_from_settings, simulate_profiles
 
 class AdminPanel:
     """Admin panel for managing users, games, and settings"""
     
+    PAGE_SIZE = 20
+    
     def __init__(self, db: DatabaseHelper, auth: AuthManager, admin_user: dict):
         self.db = db
         self.auth = auth
@@ -52,42 +55,65 @@ class AdminPanel:
             else:
                 print("Invalid choice. Please enter 1-10.")
     
+    def paginate(self, fetch_page, print_page, cursor_of):
+        """
+        Page through a listing with next/previous navigation.
+        fetch_page(after) returns up to PAGE_SIZE rows after a cursor (None
+        for the first page); cursor_of(row) gives the cursor after a row.
+        Previous pages are revisited from a stack of their starting cursors.
+        """
+        cursors = [None]
+        while True:
+            rows = fetch_page(cursors[-1])
+            if not rows and len(cursors) == 1:
+                return False
+            
+            print_page(rows)
+            has_next = len(rows) == self.PAGE_SIZE
+            
+            options = []
+            if has_next:
+                options.append("[n] Next")
+            if len(cursors) > 1:
+                options.append("[p] Previous")
+            options.append("[q] Back")
+            choice = input(f"\nPage {len(cursors)} - {', '.join(options)}: ").strip().lower()
+            
+            if choice == 'n' and has_next:
+                cursors.append(cursor_of(rows[-1]))
+            elif choice == 'p' and len(cursors) > 1:
+                cursors.pop()
+            elif choice in ('q', ''):
+                return True
+    
     def view_all_users(self):
         """View all users in the system"""
         print("\n" + "=" * 60)
         print("ALL USERS")
         print("=" * 60)
         
-        # Query users directly, not from view
-        with self.db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT user_id, username, email, role, is_banned, 
-                       total_games_played, created_at, last_login
-                FROM users
-                ORDER BY user_id
-                LIMIT 100
-            """)
-            users = cursor.fetchall()
-        
-        if not users:
-            print("No users found.")
-            return
-        
-        print(f"\nTotal Users: {len(users)}")
-        print("\n{:<5} {:<20} {:<10} {:<15} {:<10}".format(
-            "ID", "Username", "Role", "Games Played", "Status"
-        ))
-        print("-" * 60)
-        
-        for user in users:
-            status = "BANNED" if user['is_banned'] else "Active"
-            print("{:<5} {:<20} {:<10} {:<15} {:<10}".format(
-                user['user_id'],
-                user['username'][:19],
-                user['role'],
-                user['total_games_played'],
-                status
+        def print_page(users):
+            print("\n{:<5} {:<20} {:<10} {:<15} {:<10}".format(
+                "ID", "Username", "Role", "Games Played", "Status"
             ))
+            print("-" * 60)
+            
+            for user in users:
+                status = "BANNED" if user['is_banned'] else "Active"
+                print("{:<5} {:<20} {:<10} {:<15} {:<10}".format(
+                    user['user_id'],
+                    user['username'][:19],
+                    user['role'],
+                    user['total_games_played'],
+                    status
+                ))
+        
+        if not self.paginate(
+            lambda after: self.db.get_users_page(self.PAGE_SIZE, after),
+            print_page,
+            lambda user: user['user_id']
+        ):
+            print("No users found.")
     
     def view_user_details(self):
         """View detailed information about a specific user"""
@@ -100,7 +126,6 @@ class AdminPanel:
             return
         
         profile = self.db.get_user_profile(user['user_id'])
-        sessions = self.db.get_all_users(limit=100)  # This should be user-specific
         
         print("\n" + "=" * 60)
         print(f"USER DETAILS - {user['username']}")
@@ -146,7 +171,7 @@ class AdminPanel:
             action = input("Unban this user? (y/n): ").lower()
             if action == 'y':
                 # Unban user
-                with self.db.get_cursor() as cursor:
+                with self.db.get_cursor(query_name='ban_unban_user') as cursor:
                     cursor.execute("""
                         UPDATE users SET is_banned = FALSE WHERE user_id = %s
                     """, (user['user_id'],))
@@ -203,7 +228,7 @@ class AdminPanel:
         )
         
         # Delete user (CASCADE will handle related data)
-        with self.db.get_cursor() as cursor:
+        with self.db.get_cursor(query_name='delete_user') as cursor:
             cursor.execute("""
                 DELETE FROM users WHERE user_id = %s
             """, (user['user_id'],))
@@ -257,6 +282,10 @@ class AdminPanel:
                 print("\n[CANCELLED] No changes made.")
                 return
             
+            if not self.preview_setting_change(settings, selected_setting['setting_key'], new_value):
+                print("\n[CANCELLED] No changes made.")
+                return
+            
             # Update setting
             self.db.update_game_setting(
                 selected_setting['setting_key'],
@@ -269,66 +298,91 @@ class AdminPanel:
         except ValueError:
             print("\n[ERROR] Please enter a valid number.")
     
+    def preview_setting_change(self, settings, setting_key, new_value, hands=500000):
+        """
+        Simulate the house edge before and after a payout or bet limit change
+        Returns: True if the admin confirms the change, False if they do not
+        or the value is invalid
+        """
+        try:
+            SettingsCache.validate(setting_key, new_value)
+        except ValueError as e:
+            print(f"\n[ERROR] {e}")
+            return False
+        
+        current = profile_from_settings(settings)
+        if setting_key not in current:
+            return True
+        
+        proposed = profile_from_settings(settings, **{
+            setting_key: type(current[setting_key])(float(new_value))
+        })
+        before, after = simulate_profiles([current, proposed], hands)
+        
+        print(f"\nSimulated {hands:,} rounds:")
+        print(f"  House edge now:   {before['house_edge'] * 100:.2f}% "
+              f"(${before['expected_at_min_bet']:.2f} to ${before['expected_at_max_bet']:.2f} per round)")
+        print(f"  House edge after: {after['house_edge'] * 100:.2f}% "
+              f"(${after['expected_at_min_bet']:.2f} to ${after['expected_at_max_bet']:.2f} per round)")
+        
+        return input("Apply this change? (y/n): ").lower() == 'y'
+    
     def view_admin_logs(self):
-        """View recent admin actions"""
+        """View admin actions, newest first"""
         print("\n" + "=" * 60)
-        print("ADMIN LOGS (Last 20 Actions)")
+        print("ADMIN LOGS")
         print("=" * 60)
         
-        logs = self.db.get_admin_logs(limit=20)
-        
-        if not logs:
+        def print_page(logs):
+            for log in logs:
+                timestamp = log['performed_at'].strftime('%Y-%m-%d %H:%M:%S')
+                admin_name = log['admin_name']
+                action = log['action_type']
+                target = log['target_username'] if log['target_username'] else 'N/A'
+                description = log['description']
+                
+                print(f"\n[{timestamp}]")
+                print(f"  Admin: {admin_name}")
+                print(f"  Action: {action}")
+                print(f"  Target: {target}")
+                print(f"  Details: {description}")
+                print("-" * 60)
+        
+        if not self.paginate(
+            lambda after: self.db.get_admin_logs(self.PAGE_SIZE, after),
+            print_page,
+            self.db.admin_log_cursor
+        ):
             print("\nNo admin logs found.")
-            return
-        
-        for log in logs:
-            timestamp = log['performed_at'].strftime('%Y-%m-%d %H:%M:%S')
-            admin_name = log['admin_name']
-            action = log['action_type']
-            target = log['target_username'] if log['target_username'] else 'N/A'
-            description = log['description']
-            
-            print(f"\n[{timestamp}]")
-            print(f"  Admin: {admin_name}")
-            print(f"  Action: {action}")
-            print(f"  Target: {target}")
-            print(f"  Details: {description}")
-            print("-" * 60)
     
     def view_all_sessions(self):
-        """View all game sessions"""
+        """View all game sessions, most recent first"""
         print("\n" + "=" * 60)
-        print("ALL GAME SESSIONS (Last 20)")
+        print("ALL GAME SESSIONS")
         print("=" * 60)
         
-        with self.db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT gs.*, u.username
-                FROM game_sessions gs
-                JOIN users u ON gs.user_id = u.user_id
-                ORDER BY gs.started_at DESC
-                LIMIT 20
-            """)
-            sessions = cursor.fetchall()
-        
-        if not sessions:
-            print("\nNo game sessions found.")
-            return
-        
-        print("\n{:<10} {:<15} {:<12} {:<12} {:<10} {:<10}".format(
-            "Session", "Player", "Mode", "Money", "Rounds", "Status"
-        ))
-        print("-" * 70)
-        
-        for session in sessions:
-            print("{:<10} {:<15} {:<12} ${:<11.2f} {:<10} {:<10}".format(
-                session['session_id'],
-                session['username'][:14],
-                session['game_mode'],
-                float(session['current_money']),
-                session['rounds_completed'],
-                session['status']
+        def print_page(sessions):
+            print("\n{:<10} {:<15} {:<12} {:<12} {:<10} {:<10}".format(
+                "Session", "Player", "Mode", "Money", "Rounds", "Status"
             ))
+            print("-" * 70)
+            
+            for session in sessions:
+                print("{:<10} {:<15} {:<12} ${:<11.2f} {:<10} {:<10}".format(
+                    session['session_id'],
+                    session['username'][:14],
+                    session['game_mode'],
+                    float(session['current_money']),
+                    session['rounds_completed'],
+                    session['status']
+                ))
+        
+        if not self.paginate(
+            lambda after: self.db.get_sessions_page(self.PAGE_SIZE, after),
+            print_page,
+            self.db.session_cursor
+        ):
+            print("\nNo game sessions found.")
     
     def create_admin_user(self):
         """Create a new admin user"""
@@ -3,40 +3,166 @@ from flask_cors import CORS
 
 from database import DatabaseHelper
 from auth import AuthManager
+from session_store import PostgresSessionStore
+from leaderboard_index import MODES, WINDOWS
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 db = DatabaseHelper(
     host="localhost",
     port=5432,
     database="blackjack_db",
     user="postgres",
-    password="1234"  # Replace with your own local DB password
+    password="1234",  # Replace with your own local DB password
+    pool_mode="blocking"  # Flask serves requests on multiple threads
 )
 
-auth = AuthManager(db)
+db.start_settings_listener()
+
+# Leaderboard reads are served from memory; see leaderboard_index.py
+leaderboard = db.enable_leaderboard_index()
+
+# Sessions are shared through Postgres so any API process can serve any user
+auth = AuthManager(db, session_store=PostgresSessionStore(db))
+auth.start_session_sweeper()
 
 
 @app.route("/api/leaderboard", methods=["GET"])
 def api_get_leaderboard():
-    """Return leaderboard entries."""
+    """
+    Return a page of leaderboard entries.
+
+    Query params: limit (default 10), after_money and after_id to continue
+    after the last entry of the previous page, mode and window (see
+    _leaderboard_board). When there may be more entries, the X-Next-Cursor
+    header holds the query string for the next page.
+    """
     limit = request.args.get("limit", default=10, type=int)
-    rows = db.get_leaderboard(limit)
+    after_money = request.args.get("after_money", type=float)
+    after_id = request.args.get("after_id", type=int)
+    mode, window, error = _leaderboard_board()
+
+    if error:
+        return error
+    if limit < 1 or limit > 1000:
+        return jsonify({"error": "limit must be between 1 and 1000"}), 400
+
+    rows = leaderboard.top(limit, after_money, after_id, mode, window)
+
+    response = jsonify([_leaderboard_entry(row) for row in rows])
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = (
+            f"after_money={last['final_money']}&after_id={last['leaderboard_id']}"
+            f"&mode={mode}&window={window}"
+        )
+    return response, 200
 
-    result = []
-    for row in rows:
-        result.append({
-            "leaderboard_id": row.get("leaderboard_id"),
-            "username": row.get("username"),
-            "final_money": float(row.get("final_money")),
-            "profit": float(row.get("profit")),
-            "rounds_completed": int(row.get("rounds_completed")),
-            "recorded_at": row.get("recorded_at").isoformat() if row.get("recorded_at") else None,
-            "rank": row.get("rank"),
-        })
 
-    return jsonify(result), 200
+@app.route("/api/leaderboard/rank", methods=["GET"])
+def api_get_leaderboard_rank():
+    """
+    Return the leaderboard rank of a user's best entry (?user_id=)
+    or of a score (?score=), optionally for a mode and window.
+    """
+    user_id = request.args.get("user_id", type=int)
+    score = request.args.get("score", type=float)
+    mode, window, error = _leaderboard_board()
+
+    if error:
+        return error
+    if user_id is None and score is None:
+        return jsonify({"error": "user_id or score is required"}), 400
+
+    if user_id is not None:
+        row = leaderboard.rank_of_user(user_id, mode, window)
+        if not row:
+            return jsonify({"error": "User has no leaderboard entries"}), 404
+    else:
+        row = {
+            "leaderboard_id": None,
+            "score": score,
+            "rank": leaderboard.rank_of_score(score, mode, window),
+        }
+
+    return jsonify({
+        "user_id": user_id,
+        "leaderboard_id": row.get("leaderboard_id"),
+        "score": float(row.get("score")),
+        "rank": int(row.get("rank")),
+    }), 200
+
+
+@app.route("/api/leaderboard/around", methods=["GET"])
+def api_get_leaderboard_around():
+    """
+    Return the entries around a user's best entry.
+
+    Query params: user_id, radius (entries above and below, default 5),
+    mode and window
+    """
+    user_id = request.args.get("user_id", type=int)
+    radius = request.args.get("radius", default=5, type=int)
+    mode, window, error = _leaderboard_board()
+
+    if error:
+        return error
+    if user_id is None:
+        return jsonify({"error": "user_id is required"}), 400
+    if radius < 0 or radius > 100:
+        return jsonify({"error": "radius must be between 0 and 100"}), 400
+
+    rows = leaderboard.around(user_id, radius, mode, window)
+    if rows is None:
+        return jsonify({"error": "User has no leaderboard entries"}), 404
+
+    return jsonify([_leaderboard_entry(row) for row in rows]), 200
+
+
+@app.route("/api/leaderboard/friends", methods=["GET"])
+def api_get_friends_leaderboard():
+    """Return the best entry of the current user and each friend, ranked among them."""
+    session_token = request.args.get("session_token")
+
+    if not session_token:
+        return jsonify({"error": "session_token is required"}), 400
+
+    session_info = auth.validate_session(session_token)
+    if not session_info["valid"]:
+        return jsonify({"error": "Invalid or expired session"}), 401
+
+    rows = db.get_friends_leaderboard(session_info["user_id"])
+    return jsonify([_leaderboard_entry(row) for row in rows]), 200
+
+
+def _leaderboard_board():
+    """
+    Read the mode ('all', 'tournament', 'freeplay', 'web'; default 'all')
+    and window ('daily', 'weekly', 'all_time'; default 'all_time') params.
+    Returns: (mode, window, error response or None)
+    """
+    mode = request.args.get("mode", default="all")
+    window = request.args.get("window", default="all_time")
+
+    if mode not in MODES:
+        return mode, window, (jsonify({"error": f"mode must be one of {', '.join(MODES)}"}), 400)
+    if window not in WINDOWS:
+        return mode, window, (jsonify({"error": f"window must be one of {', '.join(WINDOWS)}"}), 400)
+    return mode, window, None
+
+
+def _leaderboard_entry(row):
+    return {
+        "leaderboard_id": row.get("leaderboard_id"),
+        "username": row.get("username"),
+        "game_mode": row.get("game_mode"),
+        "final_money": float(row.get("final_money")),
+        "profit": float(row.get("profit")),
+        "rounds_completed": int(row.get("rounds_completed")),
+        "recorded_at": row.get("recorded_at").isoformat() if row.get("recorded_at") else None,
+        "rank": row.get("rank"),
+    }
 
 
 @app.route("/api/score", methods=["POST"])
@@ -68,16 +194,15 @@ def api_post_score():
 
     user_id = session_info["user_id"]
 
-    starting_money_setting = db.get_game_setting("starting_money")
+    starting_money = db.get_typed_setting("starting_money", 1000.0)
 
     try:
-        starting_money = float(starting_money_setting) if starting_money_setting is not None else 1000.0
         final_money = float(final_money)
         rounds_completed = int(rounds_completed)
     except (TypeError, ValueError):
         return jsonify({"error": "final_money must be numeric and rounds_completed must be an integer"}), 400
 
-    with db.get_cursor() as cursor:
+    with db.get_cursor(query_name='api_post_score') as cursor:
         cursor.execute(
             """
             INSERT INTO game_sessions
@@ -91,6 +216,15 @@ def api_post_score():
         session_row = cursor.fetchone()
         session_id = session_row["session_id"]
 
+        cursor.execute(
+            """
+            UPDATE users
+            SET total_games_played = total_games_played + 1
+            WHERE user_id = %s
+            """,
+            (user_id,)
+        )
+
     profit = final_money - starting_money
     leaderboard_id = db.add_to_leaderboard(
         user_id=user_id,
@@ -100,8 +234,6 @@ def api_post_score():
         profit=profit
     )
 
-    db.update_user_statistics(user_id)
-
     return jsonify({
         "leaderboard_id": leaderboard_id,
         "session_id": session_id,
@@ -123,22 +255,14 @@ def api_get_friends():
     if not session_info["valid"]:
         return jsonify({"error": "Invalid or expired session"}), 401
 
-    user_id = session_info["user_id"]
-    rows = db.get_friends(user_id)
+    rows = db.get_friends(session_info["user_id"])
 
     friends = []
     for row in rows:
-        if row["user_id"] == user_id:
-            friend_id = row["friend_id"]
-            friend_name = row["friend_name"]
-        else:
-            friend_id = row["user_id"]
-            friend_name = row["user_name"]
-
         friends.append({
             "friendship_id": row["friendship_id"],
-            "friend_id": friend_id,
-            "friend_name": friend_name,
+            "friend_id": row["friend_id"],
+            "friend_name": row["friend_name"],
             "since": row["created_at"].isoformat() if row.get("created_at") else None,
         })
 
@@ -169,10 +293,12 @@ def api_send_friend_request():
     if target_user["user_id"] == user_id:
         return jsonify({"error": "You cannot add yourself as a friend"}), 400
 
-    try:
-        friendship_id = db.send_friend_request(user_id, target_user["user_id"])
-    except Exception:
-        return jsonify({"error": "Friend request already exists or users are already friends"}), 400
+    friendship_id = db.send_friend_request(user_id, target_user["user_id"])
+    if friendship_id is None:
+        existing = db.get_friendship_between(user_id, target_user["user_id"])
+        if existing and existing["status"] == "accepted":
+            return jsonify({"error": "You are already friends"}), 400
+        return jsonify({"error": "Friend request already exists"}), 400
 
     return jsonify({
         "friendship_id": friendship_id,
@@ -180,6 +306,34 @@ def api_send_friend_request():
     }), 201
 
 
+@app.route("/api/friends/suggestions", methods=["GET"])
+def api_get_friend_suggestions():
+    """Return friends-of-friends for the current user, most mutual friends first."""
+    session_token = request.args.get("session_token")
+    limit = request.args.get("limit", default=10, type=int)
+
+    if not session_token:
+        return jsonify({"error": "session_token is required"}), 400
+    if limit < 1 or limit > 100:
+        return jsonify({"error": "limit must be between 1 and 100"}), 400
+
+    session_info = auth.validate_session(session_token)
+    if not session_info["valid"]:
+        return jsonify({"error": "Invalid or expired session"}), 401
+
+    rows = db.get_friend_suggestions(session_info["user_id"], limit)
+
+    suggestions = []
+    for row in rows:
+        suggestions.append({
+            "user_id": row["candidate_id"],
+            "username": row["candidate_name"],
+            "mutual_friends": row["mutual_count"],
+        })
+
+    return jsonify(suggestions), 200
+
+
 @app.route("/api/register", methods=["POST"])
 def api_register():
     data = request.get_json(force=True) or {}
@@ -193,6 +347,9 @@ def api_register():
 
     result = auth.register_user(username, email, password)
 
+    if result.get("busy"):
+        return jsonify({"success": False, "message": result["message"]}), 503
+
     if not result["success"]:
         return jsonify({"success": False, "message": result["message"]}), 400
 
@@ -230,6 +387,10 @@ def api_login():
 
     login_result = auth.login(username, password)
 
+    # Password hashing pool saturated: fail fast rather than queue
+    if login_result.get("busy"):
+        return jsonify({"success": False, "message": login_result["message"]}), 503
+
     if not login_result["success"]:
         return jsonify({"success": False, "message": login_result["message"]}), 401
 
@@ -298,7 +459,7 @@ def api_respond_friend_request():
 
     user_id = session_info["user_id"]
 
-    with db.get_cursor() as cursor:
+    with db.get_cursor(query_name='api_respond_friend_request') as cursor:
         cursor.execute(
             """
             SELECT * FROM friendships
@@ -364,5 +525,54 @@ def api_accept_friend_request():
     return jsonify({"success": True}), 200
 
 
+
+@app.route("/api/messages/unread", methods=["GET"])
+def api_get_inbox_summary():
+    """Return the current user's unread message count per sender, and the total."""
+    session_token = request.args.get("session_token")
+
+    if not session_token:
+        return jsonify({"error": "session_token is required"}), 400
+
+    session_info = auth.validate_session(session_token)
+    if not session_info["valid"]:
+        return jsonify({"error": "Invalid or expired session"}), 401
+
+    rows = db.get_inbox_summary(session_info["user_id"])
+
+    conversations = []
+    for row in rows:
+        conversations.append({
+            "sender_id": row["sender_id"],
+            "sender_name": row["sender_name"],
+            "unread_count": row["unread_count"],
+            "last_message_at": row["last_message_at"].isoformat() if row.get("last_message_at") else None,
+        })
+
+    return jsonify({
+        "total_unread": sum(c["unread_count"] for c in conversations),
+        "conversations": conversations,
+    }), 200
+
+
+@app.route("/api/admin/db-stats", methods=["GET"])
+def api_get_db_stats():
+    """Return connection pool and per-query statistics (admin only)."""
+    session_token = request.args.get("session_token")
+
+    if not session_token:
+        return jsonify({"error": "session_token is required"}), 400
+
+    admin_check = auth.require_admin(session_token)
+    if not admin_check["authorized"]:
+        return jsonify({"error": admin_check["message"]}), 403
+
+    return jsonify({
+        "pool": db.get_pool_stats(),
+        "queries": db.get_query_stats(),
+        "slow_queries": db.get_slow_queries(),
+    }), 200
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000, debug=True)
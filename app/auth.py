@@ -1,31 +1,52 @@
 import bcrypt
+import logging
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta
 from database import DatabaseHelper
+from password_hasher import DEFAULT_ROUNDS, HasherBusy, PasswordHasher
+from session_store import MemorySessionStore
+
+logger = logging.getLogger(__name__)
 
 class AuthManager:
     """
     Handles user authentication, registration, and session management
     """
     
-    def __init__(self, db: DatabaseHelper):
+    BUSY_MESSAGE = 'Server is busy, please try again shortly'
+    
+    def __init__(self, db: DatabaseHelper, session_store=None, hasher: PasswordHasher = None):
         self.db = db
-        self.active_sessions = {}  # {session_token: {'user_id': int, 'expires': datetime}}
+        # bcrypt runs on this pool rather than the calling thread; the
+        # cost factor follows the bcrypt_rounds setting
+        self.hasher = hasher if hasher is not None else PasswordHasher(rounds=self.bcrypt_rounds)
+        # Where sessions live; see session_store.py. The default keeps
+        # them in this process only.
+        self.sessions = session_store if session_store is not None else MemorySessionStore()
+        self.sweeper = None
     
     # ============================================
     # PASSWORD HASHING
     # ============================================
     
+    def bcrypt_rounds(self) -> int:
+        """Cost factor for new password hashes (game setting bcrypt_rounds)"""
+        if self.db is None:
+            return DEFAULT_ROUNDS
+        return self.db.get_typed_setting('bcrypt_rounds', DEFAULT_ROUNDS)
+    
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a password using bcrypt"""
+        """Hash a password using bcrypt, on the calling thread (see self.hasher)"""
         salt = bcrypt.gensalt()
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
+        """Verify a password against its hash, on the calling thread (see self.hasher)"""
         return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
     
     # ============================================
@@ -53,7 +74,10 @@ class AuthManager:
             return {'success': False, 'message': 'Username already exists', 'user_id': None}
         
         # Hash password
-        password_hash = self.hash_password(password)
+        try:
+            password_hash = self.hasher.hash(password)
+        except HasherBusy:
+            return {'success': False, 'message': self.BUSY_MESSAGE, 'user_id': None, 'busy': True}
         
         # Create user
         try:
@@ -78,6 +102,8 @@ class AuthManager:
         """
         Login a user
         Returns: {'success': bool, 'message': str, 'session_token': str, 'user': dict}
+        plus 'busy': True when the password could not be checked because
+        the hashing pool is saturated
         """
         # Get user from database
         user = self.db.get_user_by_username(username)
@@ -100,7 +126,18 @@ class AuthManager:
             }
         
         # Verify password
-        if not self.verify_password(password, user['password_hash']):
+        try:
+            valid = self.hasher.verify(password, user['password_hash'])
+        except HasherBusy:
+            return {
+                'success': False,
+                'message': self.BUSY_MESSAGE,
+                'session_token': None,
+                'user': None,
+                'busy': True
+            }
+        
+        if not valid:
             return {
                 'success': False,
                 'message': 'Invalid username or password',
@@ -108,6 +145,10 @@ class AuthManager:
                 'user': None
             }
         
+        # Bring the hash up to the configured cost while we have the password
+        if self.hasher.needs_rehash(user['password_hash']):
+            self._rehash(user['user_id'], password)
+        
         # Update last login
         self.db.update_last_login(user['user_id'])
         
@@ -125,6 +166,23 @@ class AuthManager:
             'user': user_data
         }
     
+    def _rehash(self, user_id: int, password: str):
+        """
+        Store a new hash of password once the pool has made it; login does
+        not wait for it. Skipped if the hashing pool is busy.
+        """
+        try:
+            future = self.hasher.hash_async(password)
+        except HasherBusy:
+            return
+        future.add_done_callback(lambda done: self._store_rehash(user_id, done))
+    
+    def _store_rehash(self, user_id: int, future):
+        try:
+            self.db.update_password_hash(user_id, future.result())
+        except Exception:
+            logger.exception("Rehashing password of user %s failed", user_id)
+    
     # ============================================
     # SESSION MANAGEMENT
     # ============================================
@@ -134,10 +192,7 @@ class AuthManager:
         session_token = secrets.token_urlsafe(32)
         expires = datetime.now() + timedelta(hours=duration_hours)
         
-        self.active_sessions[session_token] = {
-            'user_id': user_id,
-            'expires': expires
-        }
+        self.sessions.create(session_token, user_id, expires)
         
         return session_token
     
@@ -146,24 +201,20 @@ class AuthManager:
         Validate a session token
         Returns: {'valid': bool, 'user_id': int or None}
         """
-        if session_token not in self.active_sessions:
+        session = self.sessions.get(session_token)
+        if session is None:
             return {'valid': False, 'user_id': None}
         
-        session = self.active_sessions[session_token]
-        
         # Check if expired
         if datetime.now() > session['expires']:
-            del self.active_sessions[session_token]
+            self.sessions.delete(session_token)
             return {'valid': False, 'user_id': None}
         
         return {'valid': True, 'user_id': session['user_id']}
     
     def logout(self, session_token: str) -> bool:
         """Logout a user by removing their session"""
-        if session_token in self.active_sessions:
-            del self.active_sessions[session_token]
-            return True
-        return False
+        return self.sessions.delete(session_token)
     
     def get_current_user(self, session_token: str) -> dict:
         """Get current user from session token"""
@@ -233,39 +284,44 @@ class AuthManager:
         if not user:
             return {'success': False, 'message': 'User not found'}
         
-        # Verify old password
-        if not self.verify_password(old_password, user['password_hash']):
-            return {'success': False, 'message': 'Incorrect current password'}
-        
-        # Validate new password
-        if len(new_password) < 6:
-            return {'success': False, 'message': 'New password must be at least 6 characters'}
-        
-        # Hash new password
-        new_hash = self.hash_password(new_password)
+        try:
+            # Verify old password
+            if not self.hasher.verify(old_password, user['password_hash']):
+                return {'success': False, 'message': 'Incorrect current password'}
+            
+            # Validate new password
+            if len(new_password) < 6:
+                return {'success': False, 'message': 'New password must be at least 6 characters'}
+            
+            # Hash new password
+            new_hash = self.hasher.hash(new_password)
+        except HasherBusy:
+            return {'success': False, 'message': self.BUSY_MESSAGE, 'busy': True}
         
         # Update in database
         try:
-            with self.db.get_cursor() as cursor:
-                cursor.execute("""
-                    UPDATE users 
-                    SET password_hash = %s
-                    WHERE user_id = %s
-                """, (new_hash, user_id))
+            self.db.update_password_hash(user_id, new_hash)
             
             return {'success': True, 'message': 'Password changed successfully'}
         except Exception as e:
             return {'success': False, 'message': f'Failed to change password: {str(e)}'}
     
     def cleanup_expired_sessions(self):
-        """Remove expired sessions (run periodically)"""
-        current_time = datetime.now()
-        expired_tokens = [
-            token for token, session in self.active_sessions.items()
-            if current_time > session['expires']
-        ]
-        
-        for token in expired_tokens:
-            del self.active_sessions[token]
-        
-        return len(expired_tokens)
\ No newline at end of file
+        """Remove expired sessions (run periodically, see start_session_sweeper)"""
+        return self.sessions.cleanup_expired()
+    
+    def start_session_sweeper(self, interval: float = 60.0):
+        """Run cleanup_expired_sessions every interval seconds on a background thread"""
+        if self.sweeper is None:
+            self.sweeper = threading.Thread(target=self._sweep, args=(interval,), daemon=True)
+            self.sweeper.start()
+    
+    def _sweep(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                removed = self.cleanup_expired_sessions()
+                if removed:
+                    logger.info("Removed %d expired sessions", removed)
+            except Exception:
+                logger.exception("Session cleanup failed")
\ No newline at end of file
@@ -1,25 +1,42 @@
 import random
 import json
 import getpass
-from database import DatabaseHelper
+from database import DatabaseHelper, SettingsCache
 from auth import AuthManager
 from admin import AdminPanel
 
+SUITS = ('Hearts', 'Diamonds', 'Clubs', 'Spades')
+RANKS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+
+# Card values indexed by card code (suit index * 13 + rank index)
+CARD_VALUES = bytes([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * len(SUITS))
+HARD_VALUES = bytes([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 1] * len(SUITS))
+IS_ACE = bytes([0] * 12 + [1]) * len(SUITS)
+
 class Card:
-    def __init__(self, suit, rank):
-        self.suit = suit
-        self.rank = rank
+    """
+    Playing card. Cards are interned: there is exactly one Card object per
+    suit and rank, so Card('Hearts', 'A') always returns the same instance.
+    Decks store cards as small integer codes and map them back to these
+    shared objects for display and to_dict.
+    """
+    __slots__ = ('suit', 'rank', 'code', '_value')
+    _interned = {}
+
+    def __new__(cls, suit, rank):
+        try:
+            return cls._interned[(suit, rank)]
+        except KeyError:
+            raise ValueError(f"Invalid card: {rank} of {suit}") from None
+
+    def __reduce__(self):
+        return Card, (self.suit, self.rank)
 
     def __str__(self):
         return f"{self.rank} of {self.suit}"
     
     def value(self):
-        if self.rank in ['J', 'Q', 'K']:
-            return 10
-        elif self.rank == 'A':
-            return 11  
-        else:
-            return int(self.rank)
+        return self._value
     
     def to_dict(self):
         """Convert card to dictionary for JSON storage"""
@@ -30,24 +47,45 @@ class Card:
         """Create card from dictionary"""
         return Card(data['suit'], data['rank'])
 
+    @staticmethod
+    def from_code(code):
+        """Get the card for an integer card code"""
+        return CARDS[code]
+
+def _make_card(code):
+    card = object.__new__(Card)
+    card.suit = SUITS[code // len(RANKS)]
+    card.rank = RANKS[code % len(RANKS)]
+    card.code = code
+    card._value = CARD_VALUES[code]
+    return card
+
+CARDS = tuple(_make_card(code) for code in range(len(CARD_VALUES)))
+Card._interned = {(card.suit, card.rank): card for card in CARDS}
+
 class Deck:
+    """Deck of cards, stored as a bytearray of card codes"""
+
     def __init__(self):
-        self.cards = []
-        suits = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-        ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        for suit in suits:
-            for rank in ranks:
-                self.cards.append(Card(suit, rank))
+        self.codes = bytearray(range(len(CARDS)))
+
+    @property
+    def cards(self):
+        return [CARDS[code] for code in self.codes]
+
+    @cards.setter
+    def cards(self, cards):
+        self.codes = bytearray(card.code for card in cards)
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        random.shuffle(self.codes)
 
     def deal(self):
-        return self.cards.pop()
+        return CARDS[self.codes.pop()]
     
     def to_dict(self):
         """Convert deck to dictionary for JSON storage"""
-        return [card.to_dict() for card in self.cards]
+        return [CARDS[code].to_dict() for code in self.codes]
     
     @staticmethod
     def from_dict(data):
@@ -56,27 +94,138 @@ class Deck:
         deck.cards = [Card.from_dict(card_data) for card_data in data]
         return deck
 
+class Shoe(Deck):
+    """
+    Multi-deck shoe that lives across the rounds of a game session.
+    Cards are only gathered and reshuffled once the cut card is reached,
+    at `penetration` (fraction of the shoe dealt).
+
+    Every shuffle is driven by the session's seed and a shuffle counter, so
+    the whole shoe can be rebuilt from (seed, shuffle_index, cards dealt).
+
+    If the shoe runs out mid-round it is refilled without the cards still
+    on the table (in_play, reset by begin_round); those are kept in `held`
+    until the next reshuffle.
+    """
+
+    def __init__(self, num_decks=1, penetration=0.75, seed=None, shuffle_index=0):
+        self.num_decks = num_decks
+        self.penetration = penetration
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.shuffle_index = shuffle_index
+        self.in_play = bytearray()
+        self._fill()
+
+    def _fill(self, held=b''):
+        """
+        Fill the shoe in the order given by the seed and shuffle counter,
+        leaving out the held cards
+        """
+        self.codes = bytearray(range(len(CARDS))) * self.num_decks
+        random.Random(f"{self.seed}:{self.shuffle_index}").shuffle(self.codes)
+        self.held = bytearray(held)
+        for code in self.held:
+            self.codes.remove(code)
+        # False while the order came from a saved card list rather than the seed
+        self.from_seed = True
+
+    def size(self):
+        return len(CARDS) * self.num_decks
+
+    def cards_dealt(self):
+        return self.size() - len(self.held) - len(self.codes)
+
+    def needs_reshuffle(self):
+        """True once the cut card has been dealt"""
+        return self.cards_dealt() >= self.size() * self.penetration
+
+    def reshuffle(self):
+        """Gather every card back into the shoe and shuffle"""
+        self.shuffle_index += 1
+        self._fill()
+
+    def shuffle(self):
+        self.reshuffle()
+
+    def begin_round(self):
+        """Start a round: reshuffle if the cut card has been dealt"""
+        self.in_play = bytearray()
+        if self.needs_reshuffle():
+            self.reshuffle()
+            return True
+        return False
+
+    def deal(self):
+        if not self.codes:
+            # Out of cards mid-round: shuffle in the discards only
+            self.shuffle_index += 1
+            self._fill(self.in_play)
+            if not self.codes:
+                self._fill()
+        code = self.codes.pop()
+        self.in_play.append(code)
+        return CARDS[code]
+
+    def to_dict(self):
+        """Convert shoe to dictionary for JSON storage"""
+        data = {
+            'num_decks': self.num_decks,
+            'penetration': self.penetration,
+            'seed': self.seed,
+            'shuffle_index': self.shuffle_index,
+            'dealt': self.cards_dealt(),
+        }
+        if self.held:
+            data['held'] = list(self.held)
+        if not self.from_seed:
+            # Loaded from a legacy save: the order cannot be rebuilt from the seed
+            data['codes'] = list(self.codes)
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """Create shoe from dictionary (or from a saved list of cards)"""
+        if isinstance(data, list):
+            shoe = Shoe(1)
+            shoe.cards = [Card.from_dict(card_data) for card_data in data]
+            shoe.from_seed = False
+            return shoe
+        shoe = Shoe(data['num_decks'], data['penetration'],
+                    data.get('seed'), data.get('shuffle_index', 0))
+        if 'codes' in data:
+            shoe.codes = bytearray(data['codes'])
+            shoe.from_seed = False
+        else:
+            if data.get('held'):
+                shoe._fill(data['held'])
+            del shoe.codes[len(shoe.codes) - data['dealt']:]
+        return shoe
+
 class Hand:
+    """
+    A player's or dealer's hand. Keeps a running hard total (aces as 1) and
+    ace count so scoring is O(1); add cards with add_card only.
+    """
+
     def __init__(self):
         self.cards = []
+        self.hard_total = 0
+        self.aces = 0
 
     def add_card(self, card):
         self.cards.append(card)
+        self.hard_total += HARD_VALUES[card.code]
+        self.aces += IS_ACE[card.code]
 
-    def calculate_value(self):
-        value = 0
-        aces = 0
-
-        for card in self.cards:
-            value += card.value()
-            if card.rank == 'A':
-                aces += 1
+    def is_soft(self):
+        """True if an ace is currently counted as 11"""
+        return self.aces > 0 and self.hard_total <= 11
 
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-
-        return value
+    def calculate_value(self):
+        # At most one ace can count as 11 without busting
+        if self.aces and self.hard_total <= 11:
+            return self.hard_total + 10
+        return self.hard_total
     
     def display(self, hidden=False):
         if hidden:
@@ -92,11 +241,19 @@ class Hand:
         """Convert hand to dictionary for JSON storage"""
         return [card.to_dict() for card in self.cards]
     
+    def to_codes(self):
+        """Convert hand to a compact list of card codes"""
+        return [card.code for card in self.cards]
+    
     @staticmethod
     def from_dict(data):
-        """Create hand from dictionary"""
+        """Create hand from dictionary or list of card codes"""
         hand = Hand()
-        hand.cards = [Card.from_dict(card_data) for card_data in data]
+        for card_data in data:
+            if isinstance(card_data, int):
+                hand.add_card(CARDS[card_data])
+            else:
+                hand.add_card(Card.from_dict(card_data))
         return hand
 
 class BlackjackGame:
@@ -108,14 +265,36 @@ class BlackjackGame:
         self.current_user = None
         self.session_token = None
         self.current_session_id = None
+        self.shoes = {}  # {session_id: Shoe}
+    
+    def get_shoe(self, session_id):
+        """Get the shoe for a game session, creating it from the game settings"""
+        shoe = self.shoes.get(session_id)
+        if shoe is None:
+            num_decks = self.db.get_typed_setting('num_decks', 1)
+            penetration = self.db.get_typed_setting('shoe_penetration', 0.75)
+            # Values written straight to game_settings skip
+            # SettingsCache.validate(); keep the shoe dealable anyway
+            low, high = SettingsCache.RANGES['num_decks']
+            num_decks = min(max(num_decks, low), high)
+            if not SettingsCache.in_range('shoe_penetration', penetration):
+                penetration = 1.0 if penetration > 1.0 else 0.75
+            shoe = Shoe(num_decks, penetration)
+            self.shoes[session_id] = shoe
+        return shoe
+    
+    def complete_session(self, session_id):
+        """Mark a game session completed and drop its shoe"""
+        self.db.complete_session(session_id)
+        self.shoes.pop(session_id, None)
     
-    def save_game_state(self, session_id, round_number, player_hand, dealer_hand, deck, bet, phase):
+    def save_game_state(self, session_id, round_number, player_hand, dealer_hand, shoe, bet, phase):
         """Save current game state to database"""
         self.db.save_game_state(
             session_id, round_number,
-            player_hand.to_dict(),
-            dealer_hand.to_dict(),
-            deck.to_dict(),
+            player_hand.to_codes(),
+            dealer_hand.to_codes(),
+            shoe.to_dict(),
             bet, phase
         )
     
@@ -128,13 +307,16 @@ class BlackjackGame:
         # Reconstruct game objects
         player_hand = Hand.from_dict(state['player_hand'])
         dealer_hand = Hand.from_dict(state['dealer_hand'])
-        deck = Deck.from_dict(state['deck_state'])
+        shoe = Shoe.from_dict(state['deck_state'])
+        # Cards on the table stay out of a mid-round refill
+        shoe.in_play = bytearray(player_hand.to_codes() + dealer_hand.to_codes())
+        self.shoes[session_id] = shoe
         
         return {
             'round_number': state['round_number'],
             'player_hand': player_hand,
             'dealer_hand': dealer_hand,
-            'deck': deck,
+            'shoe': shoe,
             'bet': float(state['current_bet']),
             'phase': state['game_phase']
         }
@@ -168,28 +350,28 @@ class BlackjackGame:
         if bet == 'SAVE':
             print("\n[SAVED] Game saved! You can resume later.")
             # Save with minimal state - just track the round we're on
-            deck = Deck()
             player_hand = Hand()
             dealer_hand = Hand()
             self.save_game_state(session_id, round_number, player_hand, dealer_hand,
-                                deck, 0, 'betting')
+                                self.get_shoe(session_id), 0, 'betting')
             return None
         
-        deck = Deck()
-        deck.shuffle()
+        shoe = self.get_shoe(session_id)
+        if shoe.begin_round():
+            print("\nCut card reached. Shuffling the shoe...")
         
         player_hand = Hand()
         dealer_hand = Hand()
         
         # Deal initial cards
-        player_hand.add_card(deck.deal())
-        dealer_hand.add_card(deck.deal())
-        player_hand.add_card(deck.deal())
-        dealer_hand.add_card(deck.deal())
+        player_hand.add_card(shoe.deal())
+        dealer_hand.add_card(shoe.deal())
+        player_hand.add_card(shoe.deal())
+        dealer_hand.add_card(shoe.deal())
         
         # Save initial game state
         self.save_game_state(session_id, round_number, player_hand, dealer_hand, 
-                            deck, bet, 'player_turn')
+                            shoe, bet, 'player_turn')
         
         print("\nDealer's Hand:")
         dealer_hand.display(hidden=True)
@@ -199,18 +381,18 @@ class BlackjackGame:
         
         # Check for blackjack
         if player_hand.calculate_value() == 21:
-            print("\nBlackjack! You win 1.5x your bet!")
-            winnings = int(bet * 1.5)
+            payout = self.db.get_typed_setting('blackjack_payout', 1.5)
+            print(f"\nBlackjack! You win {payout}x your bet!")
+            winnings = int(bet * payout)
             new_money = money + winnings
             
-            # Save to database and clear save state
-            self.db.save_game_round(
+            # Save round, clear save state and update session in one transaction
+            self.db.commit_round(
                 session_id, round_number, bet,
                 player_hand.to_dict(), dealer_hand.to_dict(),
                 21, dealer_hand.calculate_value(),
                 'blackjack', winnings, new_money
             )
-            self.db.delete_game_state(session_id)
             
             return new_money
         
@@ -221,30 +403,29 @@ class BlackjackGame:
             if choice == 'save':
                 print("\n[SAVED] Game saved! You can resume later.")
                 self.save_game_state(session_id, round_number, player_hand, dealer_hand,
-                                    deck, bet, 'player_turn')
+                                    shoe, bet, 'player_turn')
                 return None  # Signal to exit
             
             elif choice == 'h':
-                player_hand.add_card(deck.deal())
+                player_hand.add_card(shoe.deal())
                 print("\nYour Hand:")
                 player_hand.display()
                 
                 # Update save state
                 self.save_game_state(session_id, round_number, player_hand, dealer_hand,
-                                    deck, bet, 'player_turn')
+                                    shoe, bet, 'player_turn')
                 
                 if player_hand.calculate_value() > 21:
                     print(f"\nBust! You lose ${bet}!")
                     new_money = money - bet
                     
-                    # Save to database and clear save state
-                    self.db.save_game_round(
+                    # Save round, clear save state and update session in one transaction
+                    self.db.commit_round(
                         session_id, round_number, bet,
                         player_hand.to_dict(), dealer_hand.to_dict(),
                         player_hand.calculate_value(), dealer_hand.calculate_value(),
                         'bust', -bet, new_money
                     )
-                    self.db.delete_game_state(session_id)
                     
                     return new_money
                 elif player_hand.calculate_value() == 21:
@@ -264,7 +445,7 @@ class BlackjackGame:
         
         while dealer_hand.calculate_value() < 17:
             print("\nDealer hits")
-            dealer_hand.add_card(deck.deal())
+            dealer_hand.add_card(shoe.deal())
             print("\nDealer's Hand:")
             dealer_hand.display()
         
@@ -299,14 +480,13 @@ class BlackjackGame:
             winnings = 0
             new_money = money
         
-        # Save to database and clear save state
-        self.db.save_game_round(
+        # Save round, clear save state and update session in one transaction
+        self.db.commit_round(
             session_id, round_number, bet,
             player_hand.to_dict(), dealer_hand.to_dict(),
             player_value, dealer_value,
             result, winnings, new_money
         )
-        self.db.delete_game_state(session_id)
         
         return new_money
     
@@ -334,7 +514,7 @@ class BlackjackGame:
         # Otherwise resume mid-round
         player_hand = saved_state['player_hand']
         dealer_hand = saved_state['dealer_hand']
-        deck = saved_state['deck']
+        shoe = saved_state['shoe']
         bet = saved_state['bet']
         
         print(f"\nRound {round_number}")
@@ -353,28 +533,27 @@ class BlackjackGame:
             if choice == 'save':
                 print("\n[SAVED] Game saved!")
                 self.save_game_state(session_id, round_number, player_hand, dealer_hand,
-                                    deck, bet, 'player_turn')
+                                    shoe, bet, 'player_turn')
                 return None
             
             elif choice == 'h':
-                player_hand.add_card(deck.deal())
+                player_hand.add_card(shoe.deal())
                 print("\nYour Hand:")
                 player_hand.display()
                 
                 self.save_game_state(session_id, round_number, player_hand, dealer_hand,
-                                    deck, bet, 'player_turn')
+                                    shoe, bet, 'player_turn')
                 
                 if player_hand.calculate_value() > 21:
                     print(f"\nBust! You lose ${bet}!")
                     new_money = money - bet
                     
-                    self.db.save_game_round(
+                    self.db.commit_round(
                         session_id, round_number, bet,
                         player_hand.to_dict(), dealer_hand.to_dict(),
                         player_hand.calculate_value(), dealer_hand.calculate_value(),
                         'bust', -bet, new_money
                     )
-                    self.db.delete_game_state(session_id)
                     
                     return new_money
                 elif player_hand.calculate_value() == 21:
@@ -394,7 +573,7 @@ class BlackjackGame:
         
         while dealer_hand.calculate_value() < 17:
             print("\nDealer hits")
-            dealer_hand.add_card(deck.deal())
+            dealer_hand.add_card(shoe.deal())
             print("\nDealer's Hand:")
             dealer_hand.display()
         
@@ -429,13 +608,12 @@ class BlackjackGame:
             new_money = money
             print("\nIt's a tie! Bet returned.")
         
-        self.db.save_game_round(
+        self.db.commit_round(
             session_id, round_number, bet,
             player_hand.to_dict(), dealer_hand.to_dict(),
             player_value, dealer_value,
             result, winnings, new_money
         )
-        self.db.delete_game_state(session_id)
         
         return new_money
     
@@ -474,14 +652,12 @@ class BlackjackGame:
                             return  # User saved and quit
                         
                         money = result
-                        self.db.update_session(session_id, money, round_num)
                         
                         if money <= 0:
                             print("\n" + "=" * 60)
                             print("GAME OVER - BROKE!")
                             print("=" * 60)
-                            self.db.complete_session(session_id)
-                            self.db.update_user_statistics(self.current_user['user_id'])
+                            self.complete_session(session_id)
                             return
                         
                         print(f"\nCurrent money: ${money}")
@@ -498,11 +674,8 @@ class BlackjackGame:
         print("Complete 10 rounds or go broke!")
         print("=" * 60)
         
-        starting_money_setting = self.db.get_game_setting('starting_money')
-        starting_money = float(starting_money_setting) if starting_money_setting else 1000.0
-        
-        max_rounds_setting = self.db.get_game_setting('tournament_rounds')
-        max_rounds = int(max_rounds_setting) if max_rounds_setting else 10
+        starting_money = self.db.get_typed_setting('starting_money', 1000.0)
+        max_rounds = self.db.get_typed_setting('tournament_rounds', 10)
         
         session_id = self.db.create_game_session(
             self.current_user['user_id'],
@@ -525,15 +698,13 @@ class BlackjackGame:
                 return
             
             money = result
-            self.db.update_session(session_id, money, round_num)
             
             if money <= 0:
                 print("\n" + "=" * 60)
                 print("GAME OVER - BROKE!")
                 print("=" * 60)
                 print(f"You completed {round_num} rounds")
-                self.db.complete_session(session_id)
-                self.db.update_user_statistics(self.current_user['user_id'])
+                self.complete_session(session_id)
                 return
             
             print(f"\nCurrent money: ${money}")
@@ -542,8 +713,7 @@ class BlackjackGame:
     
     def finish_tournament(self, session_id, money, max_rounds):
         """Finish tournament and save to leaderboard"""
-        starting_money_setting = self.db.get_game_setting('starting_money')
-        starting_money = float(starting_money_setting) if starting_money_setting else 1000.0
+        starting_money = self.db.get_typed_setting('starting_money', 1000.0)
         
         print("\n" + "=" * 60)
         print("TOURNAMENT COMPLETE!")
@@ -557,7 +727,7 @@ class BlackjackGame:
         else:
             print("Break even!")
         
-        self.db.complete_session(session_id)
+        self.complete_session(session_id)
         self.db.add_to_leaderboard(
             self.current_user['user_id'],
             session_id,
@@ -565,7 +735,6 @@ class BlackjackGame:
             max_rounds,
             profit
         )
-        self.db.update_user_statistics(self.current_user['user_id'])
         
         print("\nScore saved to leaderboard!")
         self.display_leaderboard()
@@ -579,8 +748,7 @@ class BlackjackGame:
         print("Play until you quit or go broke!")
         print("=" * 60)
         
-        starting_money_setting = self.db.get_game_setting('starting_money')
-        starting_money = float(starting_money_setting) if starting_money_setting else 1000.0
+        starting_money = self.db.get_typed_setting('starting_money', 1000.0)
         
         session_id = self.db.create_game_session(
             self.current_user['user_id'],
@@ -605,14 +773,12 @@ class BlackjackGame:
                 return
             
             money = result
-            self.db.update_session(session_id, money, round_num)
             
             if money <= 0:
                 print("\n" + "=" * 60)
                 print("GAME OVER - BROKE!")
                 print("=" * 60)
-                self.db.complete_session(session_id)
-                self.db.update_user_statistics(self.current_user['user_id'])
+                self.complete_session(session_id)
                 return
             
             print(f"\nCurrent money: ${money}")
@@ -620,8 +786,7 @@ class BlackjackGame:
             play_again = input("\nContinue playing? (y/n): ").lower()
             if play_again != 'y':
                 print(f"\nYou ended with ${money}. Thanks for playing!")
-                self.db.complete_session(session_id)
-                self.db.update_user_statistics(self.current_user['user_id'])
+                self.complete_session(session_id)
                 return
     
     def display_leaderboard(self):
@@ -766,14 +931,12 @@ class BlackjackGame:
                             break
                         
                         money = result
-                        self.db.update_session(session_id, money, round_num)
                         
                         if money <= 0:
                             print("\n" + "=" * 60)
                             print("GAME OVER - BROKE!")
                             print("=" * 60)
-                            self.db.complete_session(session_id)
-                            self.db.update_user_statistics(self.current_user['user_id'])
+                            self.complete_session(session_id)
                             break
                         
                         print(f"\nCurrent money: ${money}")
@@ -825,6 +988,8 @@ def main():
         password='1234'  # CHANGE THIS!
     )
     
+    db.start_settings_listener()
+    
     auth = AuthManager(db)
     
     # Create and run game
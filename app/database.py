@@ -2,10 +2,601 @@ import psycopg2
 from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 import json
+import os
+import select
+import atexit
+import logging
+import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
+from collections import deque
 import random
 
+from leaderboard_index import LeaderboardIndex
+from password_hasher import MIN_ROUNDS, MAX_ROUNDS
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(__name__ + '.slow_queries')
+
+
+class QueryStats:
+    """
+    Per-query timing: call count, total time, p50/p95/p99 latency over the
+    most recent sample_size calls, and rows returned or affected. Calls
+    slower than slow_query_ms are written to the slow-query log.
+    """
+    
+    def __init__(self, slow_query_ms=200.0, sample_size=1024, slow_log_size=100):
+        self.slow_query_ms = slow_query_ms
+        self.sample_size = sample_size
+        self.lock = threading.Lock()
+        self.queries = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+    
+    def record(self, name, seconds, rows=0, sql=None):
+        """Record one call of a named query"""
+        with self.lock:
+            entry = self.queries.get(name)
+            if entry is None:
+                entry = self.queries[name] = {
+                    'calls': 0, 'total': 0.0, 'rows': 0,
+                    'samples': deque(maxlen=self.sample_size),
+                }
+            entry['calls'] += 1
+            entry['total'] += seconds
+            entry['rows'] += rows
+            entry['samples'].append(seconds)
+        
+        elapsed_ms = seconds * 1000
+        if elapsed_ms >= self.slow_query_ms:
+            if isinstance(sql, bytes):
+                sql = sql.decode('utf-8', 'replace')
+            sql = ' '.join(sql.split())[:500] if sql else None
+            with self.lock:
+                self.slow_queries.append({
+                    'query': name,
+                    'ms': elapsed_ms,
+                    'rows': rows,
+                    'sql': sql,
+                    'at': datetime.now().isoformat(),
+                })
+            slow_query_logger.warning("Slow query %s: %.1f ms, %d rows: %s",
+                                      name, elapsed_ms, rows, sql)
+    
+    @staticmethod
+    def _percentile(ordered, fraction):
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index] * 1000
+    
+    def snapshot(self):
+        """Stats per query name, with times in milliseconds"""
+        with self.lock:
+            result = {}
+            for name, entry in self.queries.items():
+                ordered = sorted(entry['samples'])
+                result[name] = {
+                    'calls': entry['calls'],
+                    'rows': entry['rows'],
+                    'total_ms': entry['total'] * 1000,
+                    'avg_ms': entry['total'] * 1000 / entry['calls'],
+                    'p50_ms': self._percentile(ordered, 0.50),
+                    'p95_ms': self._percentile(ordered, 0.95),
+                    'p99_ms': self._percentile(ordered, 0.99),
+                }
+            return result
+    
+    def get_slow_queries(self):
+        with self.lock:
+            return list(self.slow_queries)
+    
+    def reset(self):
+        with self.lock:
+            self.queries = {}
+            self.slow_queries.clear()
+
+
+class WriteBehindBuffer:
+    """
+    Buffers inserts into append-only tables (game_rounds, admin_logs) and
+    writes them in batches with multi-row INSERTs.
+
+    Tables are flushed every flush_interval seconds from a background
+    thread, sooner when a queue reaches flush_size rows (the thread is woken;
+    callers never flush inline), and at interpreter exit.
+
+    Rows that could not be written are appended to a local spool file and
+    retried on later flushes, separately from new rows, so rows are written
+    at least once. When a batch fails its rows are retried one by one: rows
+    rejected by the database (a constraint violation, say) are kept in the
+    spool for max_attempts flushes and then moved to the dead-letter file,
+    so a single bad row cannot block every later write.
+    """
+    
+    TABLE_COLUMNS = {
+        'game_rounds': ('session_id', 'round_number', 'bet_amount', 'player_hand',
+                        'dealer_hand', 'player_score', 'dealer_score', 'result',
+                        'winnings', 'balance_after'),
+        'admin_logs': ('admin_id', 'action_type', 'target_user_id', 'description',
+                       'details'),
+    }
+    MAX_ROWS_PER_INSERT = 1000
+    # Failures that say nothing about the rows themselves: retry without
+    # counting an attempt
+    TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, pool.PoolError)
+    
+    def __init__(self, db, flush_size=500, flush_interval=1.0,
+                 spool_path='write_buffer.spool', dead_letter_path=None, max_attempts=3):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        if dead_letter_path is None and spool_path:
+            dead_letter_path = spool_path + '.dead'
+        self.dead_letter_path = dead_letter_path
+        self.max_attempts = max_attempts
+        self.queues = {table: [] for table in self.TABLE_COLUMNS}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flush_requested = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def add(self, table, row):
+        """Queue one row (a tuple in TABLE_COLUMNS order) for insertion"""
+        with self.lock:
+            queue = self.queues[table]
+            queue.append(tuple(row))
+            full = len(queue) >= self.flush_size
+        
+        if full:
+            self.flush_requested.set()
+    
+    def pending(self):
+        """Number of rows waiting to be written"""
+        with self.lock:
+            return sum(len(queue) for queue in self.queues.values())
+    
+    def flush(self):
+        """Write all queued and spooled rows. Returns the number of rows written"""
+        with self.flush_lock:
+            with self.lock:
+                batches = self.queues
+                self.queues = {table: [] for table in self.TABLE_COLUMNS}
+            
+            spooled = self._read_spool()
+            # Spooled rows first, in their own transactions, so rows that
+            # failed before cannot take new rows down with them
+            work = list(spooled.items())
+            work += [(table, [(row, 0) for row in rows])
+                     for table, rows in batches.items() if rows]
+            
+            written = 0
+            retry, dead = [], []
+            for table, entries in work:
+                count, failed = self._write_table(table, entries)
+                written += count
+                for row, attempts in failed:
+                    if attempts >= self.max_attempts:
+                        dead.append((table, row, attempts))
+                    else:
+                        retry.append((table, row, attempts))
+            
+            if dead:
+                logger.error("Write-behind: moving %d rows to %s after %d failed attempts",
+                             len(dead), self.dead_letter_path, self.max_attempts)
+                self._append_lines(self.dead_letter_path, dead)
+            if retry:
+                logger.warning("Write-behind: spooling %d rows", len(retry))
+                self._write_spool(retry)
+            elif spooled:
+                os.remove(self.spool_path)
+            return written
+    
+    def close(self):
+        """Stop the flush thread and write out everything still queued"""
+        self.stopped.set()
+        self.flush_requested.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+    
+    def _run(self):
+        while not self.stopped.is_set():
+            self.flush_requested.wait(self.flush_interval)
+            self.flush_requested.clear()
+            if self.stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush thread error")
+    
+    def _write_table(self, table, entries):
+        """
+        Insert [(row, attempts)] into table: as one batch, or row by row if
+        the batch fails.
+        Returns: (rows written, [(row, attempts)] still to write)
+        """
+        try:
+            with self.db.get_cursor(query_name='write_behind_flush') as cursor:
+                self._insert(cursor, table, [row for row, _ in entries])
+            return len(entries), []
+        except self.TRANSIENT_ERRORS:
+            logger.exception("Write-behind flush of %s failed", table)
+            return 0, entries
+        except Exception:
+            logger.exception("Write-behind batch insert into %s failed, retrying row by row", table)
+        
+        written, failed = 0, []
+        for index, (row, attempts) in enumerate(entries):
+            try:
+                with self.db.get_cursor(query_name='write_behind_flush') as cursor:
+                    self._insert(cursor, table, [row])
+                written += 1
+            except self.TRANSIENT_ERRORS:
+                # Database unreachable: keep the rest for the next flush
+                failed.extend(entries[index:])
+                break
+            except Exception as e:
+                logger.warning("Write-behind row rejected by %s: %s", table, e)
+                failed.append((row, attempts + 1))
+        return written, failed
+    
+    def _insert(self, cursor, table, rows):
+        columns = self.TABLE_COLUMNS[table]
+        placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        for start in range(0, len(rows), self.MAX_ROWS_PER_INSERT):
+            chunk = rows[start:start + self.MAX_ROWS_PER_INSERT]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+                + ", ".join([placeholder] * len(chunk)),
+                [value for row in chunk for value in row]
+            )
+    
+    def _read_spool(self):
+        """Spooled rows as {table: [(row, attempts)]}"""
+        spooled = {}
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return spooled
+        with open(self.spool_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    spooled.setdefault(entry['table'], []).append(
+                        (tuple(entry['row']), entry.get('attempts', 0)))
+        return spooled
+    
+    def _write_spool(self, entries):
+        if not self.spool_path:
+            return
+        # Rewritten in full: it already holds any rows read back for this flush
+        self._write_lines(self.spool_path, entries, 'w')
+    
+    def _append_lines(self, path, entries):
+        if path:
+            self._write_lines(path, entries, 'a')
+    
+    @staticmethod
+    def _write_lines(path, entries, mode):
+        with open(path, mode) as f:
+            for table, row, attempts in entries:
+                f.write(json.dumps({'table': table, 'row': row, 'attempts': attempts},
+                                   default=float) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+_statement_cursors = {}
+
+
+def _statement_cursor(cursor_factory):
+    """
+    Subclass of cursor_factory that remembers the last statement passed to
+    execute(), before parameter binding (cursor.query has the values filled in)
+    """
+    cursor_factory = cursor_factory or psycopg2.extensions.cursor
+    recording = _statement_cursors.get(cursor_factory)
+    if recording is None:
+        class recording(cursor_factory):
+            statement = None
+            
+            def execute(self, query, vars=None):
+                self.statement = query
+                return super().execute(query, vars)
+            
+            def executemany(self, query, vars_list):
+                self.statement = query
+                return super().executemany(query, vars_list)
+        
+        _statement_cursors[cursor_factory] = recording
+    return recording
+
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+
+class BlockingConnectionPool:
+    """
+    Thread-safe connection pool that waits for a free connection instead of
+    raising when all maxconn connections are checked out.
+
+    Idle connections are health-checked before reuse once they have been idle
+    for health_check_after seconds, and connections older than max_lifetime
+    seconds are closed and replaced. stats() reports pool usage, wait times
+    and checkout latency.
+    """
+    
+    def __init__(self, minconn, maxconn, timeout=30.0, health_check_after=30.0,
+                 max_lifetime=3600.0, connection_factory=psycopg2.connect,
+                 **conn_params):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.connection_factory = connection_factory
+        self.conn_params = conn_params
+        
+        self.cond = threading.Condition()
+        self.idle = []          # [(conn, returned_at)], most recently used last
+        self.created = {}       # {id(conn): created_at}
+        self.checked_out = {}   # {id(conn): checked_out_at}
+        self.total = 0
+        self.waiting = 0
+        self.closed = False
+        
+        self.checkouts = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_checkout_latency = 0.0
+        self.total_hold = 0.0
+        
+        for _ in range(minconn):
+            conn = self._connect()
+            self.total += 1
+            self.idle.append((conn, time.monotonic()))
+    
+    def _connect(self):
+        conn = self.connection_factory(**self.conn_params)
+        with self.cond:
+            self.created[id(conn)] = time.monotonic()
+        return conn
+    
+    def _discard(self, conn):
+        # Also called from getconn without the lock held; cond is reentrant
+        with self.cond:
+            self.created.pop(id(conn), None)
+            self.recycled += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _is_expired(self, conn, now):
+        return now - self.created.get(id(conn), now) > self.max_lifetime
+    
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def getconn(self, key=None):
+        """Check out a connection, waiting up to timeout seconds for one"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn = None
+        returned_at = None
+        
+        with self.cond:
+            self.waiting += 1
+            try:
+                while True:
+                    if self.closed:
+                        raise pool.PoolError("connection pool is closed")
+                    if self.idle:
+                        conn, returned_at = self.idle.pop()
+                        break
+                    if self.total < self.maxconn:
+                        self.total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.cond.wait(remaining):
+                        if not self.idle and self.total >= self.maxconn:
+                            self.timeouts += 1
+                            raise PoolTimeoutError(
+                                f"no connection available within {self.timeout}s")
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - start
+        
+        # Connect or health-check outside the lock; the slot is already ours
+        try:
+            now = time.monotonic()
+            if conn is not None and (conn.closed or self._is_expired(conn, now) or (
+                    now - returned_at > self.health_check_after and not self._is_healthy(conn))):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self.cond:
+                self.total -= 1
+                self.cond.notify()
+            raise
+        
+        checked_out_at = time.monotonic()
+        with self.cond:
+            self.checked_out[id(conn)] = checked_out_at
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.total_checkout_latency += checked_out_at - start
+        return conn
+    
+    def putconn(self, conn, key=None, close=False):
+        """Return a connection to the pool"""
+        now = time.monotonic()
+        with self.cond:
+            checked_out_at = self.checked_out.pop(id(conn), now)
+            self.total_hold += now - checked_out_at
+            
+            if close or self.closed or conn.closed or self._is_expired(conn, now):
+                self._discard(conn)
+                self.total -= 1
+            else:
+                self.idle.append((conn, now))
+            self.cond.notify()
+    
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self.cond:
+            self.closed = True
+            for conn, _ in self.idle:
+                self._discard(conn)
+                self.total -= 1
+            self.idle = []
+            self.cond.notify_all()
+    
+    def stats(self):
+        """Pool usage counters and timings (seconds)"""
+        with self.cond:
+            checkouts = self.checkouts or 1
+            return {
+                'maxconn': self.maxconn,
+                'total': self.total,
+                'in_use': len(self.checked_out),
+                'idle': len(self.idle),
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'recycled': self.recycled,
+                'avg_wait': self.total_wait / checkouts,
+                'max_wait': self.max_wait,
+                'avg_checkout_latency': self.total_checkout_latency / checkouts,
+                'avg_hold': self.total_hold / checkouts,
+            }
+
+
+class SettingsCache:
+    """
+    Process-local cache of game_settings, loaded with one query.
+
+    Values are dropped as soon as a setting changes: locally through
+    invalidate(), and from other processes through the game_settings_changed
+    notification (see DatabaseHelper.start_settings_listener). The ttl only
+    bounds staleness when no listener is running.
+    """
+    
+    TYPES = {
+        'starting_money': float,
+        'tournament_rounds': int,
+        'blackjack_payout': float,
+        'min_bet': int,
+        'max_bet': int,
+        'num_decks': int,
+        'shoe_penetration': float,
+        'bcrypt_rounds': int,
+    }
+    
+    # Bounds checked by validate(): low <= value <= high, except that
+    # settings in OPEN_BELOW must be greater than low
+    RANGES = {
+        'num_decks': (1, 8),
+        'shoe_penetration': (0.0, 1.0),
+        'bcrypt_rounds': (MIN_ROUNDS, MAX_ROUNDS),
+    }
+    OPEN_BELOW = {'shoe_penetration'}
+    
+    def __init__(self, loader, ttl=30.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.values = None
+        self.loaded_at = 0.0
+        self.version = 0
+    
+    def get(self, key):
+        """Raw setting value (string), or None if it does not exist"""
+        return self._current().get(key)
+    
+    def get_typed(self, key, default=None):
+        """Setting value converted to its type, or default if missing or invalid"""
+        value = self.get(key)
+        if value is None:
+            return default
+        try:
+            return self._convert(key, value)
+        except ValueError:
+            return default
+    
+    @classmethod
+    def _convert(cls, key, value):
+        setting_type = cls.TYPES.get(key, str)
+        if setting_type is int:
+            return int(float(value))
+        return setting_type(value)
+    
+    @classmethod
+    def validate(cls, key, value):
+        """
+        Check a new value for a setting before it is stored.
+        Returns: the value converted to its type
+        Raises: ValueError if it is not of the setting's type or out of range
+        """
+        try:
+            typed = cls._convert(key, value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number, got {value!r}") from None
+        if not cls.in_range(key, typed):
+            low, high = cls.RANGES[key]
+            if key in cls.OPEN_BELOW:
+                raise ValueError(f"{key} must be above {low} and at most {high}, got {value}")
+            raise ValueError(f"{key} must be between {low} and {high}, got {value}")
+        return typed
+    
+    @classmethod
+    def in_range(cls, key, typed_value):
+        """True if a typed value is within the setting's RANGES bounds (or it has none)"""
+        if key not in cls.RANGES:
+            return True
+        low, high = cls.RANGES[key]
+        if key in cls.OPEN_BELOW:
+            return low < typed_value <= high
+        return low <= typed_value <= high
+    
+    def invalidate(self):
+        with self.lock:
+            self.values = None
+            self.version += 1
+    
+    def _current(self):
+        with self.lock:
+            if self.values is not None and time.monotonic() - self.loaded_at < self.ttl:
+                return self.values
+            version = self.version
+        
+        values = self.loader()
+        with self.lock:
+            # Don't keep values that were invalidated while loading
+            if self.version == version:
+                self.values = values
+                self.loaded_at = time.monotonic()
+        return values
+
+
 class DatabaseHelper:
     """
     Database helper class for Blackjack game
@@ -14,22 +605,81 @@ class DatabaseHelper:
     
     def __init__(self, host='localhost', port=5432, database='blackjack_db', 
                  user='your_user', password='your_password', 
-                 minconn=1, maxconn=20):
+                 minconn=1, maxconn=20, pool_mode='simple', pool_timeout=30.0,
+                 slow_query_ms=200.0, settings_ttl=30.0,
+                 buffered_writes=False, **buffer_options):
+        self.conn_params = {
+            'host': host,
+            'port': port,
+            'database': database,
+            'user': user,
+            'password': password,
+        }
+        
         #initialize connection pool
-        self.connection_pool = pool.SimpleConnectionPool(
-            minconn,
-            maxconn,
-            host = host,
-            port = port,
-            database = database,
-            user = user,
-            password = password
-        )
+        # 'simple' is not thread-safe; use 'blocking' when serving requests on threads
+        if pool_mode == 'blocking':
+            self.connection_pool = BlockingConnectionPool(
+                minconn,
+                maxconn,
+                timeout = pool_timeout,
+                host = host,
+                port = port,
+                database = database,
+                user = user,
+                password = password
+            )
+        else:
+            self.connection_pool = pool.SimpleConnectionPool(
+                minconn,
+                maxconn,
+                host = host,
+                port = port,
+                database = database,
+                user = user,
+                password = password
+            )
+        
+        # Per-query timing, see get_query_stats
+        self.query_stats = QueryStats(slow_query_ms)
+        
+        # Game settings are read from memory, see get_game_setting
+        self.settings_cache = SettingsCache(self._load_game_settings, settings_ttl)
+        self.settings_listener = None
+        self.leaderboard_index = None
+        
+        # Optional write-behind buffer for game_rounds and admin_logs
+        self.write_buffer = WriteBehindBuffer(self, **buffer_options) if buffered_writes else None
+    
+    def get_pool_stats(self):
+        """Connection pool statistics (only the blocking pool keeps timings)"""
+        if isinstance(self.connection_pool, BlockingConnectionPool):
+            return self.connection_pool.stats()
+        return {
+            'maxconn': self.connection_pool.maxconn,
+            'in_use': len(self.connection_pool._used),
+            'idle': len(self.connection_pool._pool),
+        }
+    
+    def get_query_stats(self):
+        """Call counts, latency percentiles (ms) and row counts per query"""
+        return self.query_stats.snapshot()
+    
+    def get_slow_queries(self):
+        """Most recent queries slower than the slow-query threshold"""
+        return self.query_stats.get_slow_queries()
+    
+    def flush_writes(self):
+        """Write out any buffered game_rounds and admin_logs rows"""
+        if self.write_buffer:
+            self.write_buffer.flush()
     
     @contextmanager
     def get_connection(self):
         """Context manager for database connections"""
+        start = time.perf_counter()
         conn = self.connection_pool.getconn()
+        self.query_stats.record('connection_checkout', time.perf_counter() - start)
         try:
             yield conn
             conn.commit()
@@ -40,14 +690,28 @@ class DatabaseHelper:
             self.connection_pool.putconn(conn)
     
     @contextmanager
-    def get_cursor(self, cursor_factory=RealDictCursor):
-        """Context manager for database cursors"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(cursor_factory=cursor_factory)
-            try:
-                yield cursor
-            finally:
-                cursor.close()
+    def get_cursor(self, cursor_factory=RealDictCursor, query_name='unnamed'):
+        """
+        Context manager for database cursors.
+        Timed in query_stats under query_name (by convention the calling
+        method's name, e.g. 'get_leaderboard').
+        """
+        start = time.perf_counter()
+        rows = 0
+        sql = None
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(cursor_factory=_statement_cursor(cursor_factory))
+                try:
+                    yield cursor
+                finally:
+                    rows = max(cursor.rowcount, 0)
+                    # The statement as written, never with parameters bound:
+                    # these end up in logs and /api/admin/db-stats
+                    sql = cursor.statement
+                    cursor.close()
+        finally:
+            self.query_stats.record(query_name, time.perf_counter() - start, rows, sql)
     
 
     # USER OPERATIONS
@@ -55,7 +719,7 @@ class DatabaseHelper:
     
     def create_user(self, username, email, password_hash, role='player'):
         """Create a new user"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='create_user') as cursor:
             cursor.execute("""
                 INSERT INTO users (username, email, password_hash, role)
                 VALUES (%s, %s, %s, %s)
@@ -74,50 +738,46 @@ class DatabaseHelper:
         
     def create_dummy_users(self, count=100):
         """
-        Create dummy users for testing.
+        Create dummy users for testing, in one transaction.
         Usernames: dummy1, dummy2, ..., dummy100
         Emails: dummy1@example.com, ...
         Password hash: "test123" (pre-hashed or placeholder)
+        Existing dummy users are skipped.
+        For large volumes use generate_load_data.py.
         """
         password_hash = "$2b$12$abcdefghijklmnopqrstuv1234567890abcd"  # dummy hash
-
-        created = 0
-        for i in range(1, count + 1):
-            username = f"dummy{i}"
-            email = f"dummy{i}@example.com"
-
-            try:
-                with self.get_cursor() as cursor:
-                    cursor.execute("""
-                        INSERT INTO users (username, email, password_hash, role)
-                        VALUES (%s, %s, %s, 'player')
-                        RETURNING user_id
-                    """, (username, email, password_hash))
-                    
-                    user_id = cursor.fetchone()['user_id']
-
-                    # create profile
+        
+        rows = [(f"dummy{i}", f"dummy{i}@example.com", password_hash)
+                for i in range(1, count + 1)]
+        created = []
+        with self.get_cursor(query_name='create_dummy_users') as cursor:
+            for start in range(0, len(rows), 1000):
+                chunk = rows[start:start + 1000]
+                cursor.execute(
+                    "INSERT INTO users (username, email, password_hash, role) VALUES "
+                    + ", ".join(["(%s, %s, %s, 'player')"] * len(chunk))
+                    + " ON CONFLICT DO NOTHING RETURNING user_id",
+                    [value for row in chunk for value in row]
+                )
+                user_ids = [row['user_id'] for row in cursor.fetchall()]
+                if user_ids:
+                    # create profiles
                     cursor.execute("""
                         INSERT INTO user_profiles (user_id)
-                        VALUES (%s)
-                    """, (user_id,))
-                
-                print(f"Created: {username}")
-                created += 1
-
-            except Exception as e:
-                print(f"Skipping {username}: {e}")
-
-        print(f"\nFinished. Successfully created {created}/{count} dummy users.")
+                        SELECT unnest(%s::INT[])
+                    """, (user_ids,))
+                created.extend(user_ids)
+        
+        print(f"\nFinished. Successfully created {len(created)}/{count} dummy users.")
 
 
     def create_dummy_leaderboard(self):
         """
-        Create fake sessions + leaderboard entries for all dummy users (dummy1 - dummy100).
-        Uses real game_sessions so foreign keys are valid.
+        Create fake sessions + leaderboard entries for all dummy users (dummy1 - dummy100),
+        in one transaction. Uses real game_sessions so foreign keys are valid.
         """
-        # 1) Get all dummy users
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='create_dummy_leaderboard') as cursor:
+            # 1) Get all dummy users
             cursor.execute("""
                 SELECT user_id, username
                 FROM users
@@ -125,56 +785,52 @@ class DatabaseHelper:
                 ORDER BY user_id;
             """)
             users = cursor.fetchall()
-
-        created = 0
-        for u in users:
-            user_id = u["user_id"]
-            username = u["username"]
-
-            starting_money = 1000
-            rounds_completed = random.randint(5, 20)
-            final_money = starting_money + random.randint(-500, 1000)
-            profit = final_money - starting_money
-
-            # VALID game modes based on your CHECK constraint
-            game_mode = random.choice(["tournament", "freeplay"])
-
-            # 2) Create a valid game session
-            session_id = self.create_game_session(
-                user_id=user_id,
-                game_mode=game_mode,
-                starting_money=starting_money,
-                max_rounds=rounds_completed,
-            )
-
-            # 3) Update the session
-            self.update_session(
-                session_id=session_id,
-                current_money=final_money,
-                rounds_completed=rounds_completed,
+            if not users:
+                print("\nNo dummy users found.")
+                return
+            
+            entries = {}
+            for u in users:
+                starting_money = 1000
+                rounds_completed = random.randint(5, 20)
+                final_money = starting_money + random.randint(-500, 1000)
+                # VALID game modes based on your CHECK constraint
+                game_mode = random.choice(["tournament", "freeplay"])
+                entries[u["user_id"]] = (game_mode, starting_money, final_money, rounds_completed)
+            
+            # 2) Create completed game sessions
+            cursor.execute(
+                "INSERT INTO game_sessions (user_id, game_mode, starting_money, current_money, "
+                "rounds_completed, max_rounds, status, ended_at) VALUES "
+                + ", ".join(["(%s, %s, %s, %s, %s, %s, 'completed', CURRENT_TIMESTAMP)"] * len(entries))
+                + " RETURNING session_id, user_id",
+                [value for user_id, (mode, start, final, rounds) in entries.items()
+                 for value in (user_id, mode, start, final, rounds, rounds)]
             )
-
-            # 4) Mark the session as completed
-            self.complete_session(session_id)
-
-            # 5) Insert leaderboard entry
-            self.add_to_leaderboard(
-                user_id=user_id,
-                session_id=session_id,
-                final_money=final_money,
-                rounds_completed=rounds_completed,
-                profit=profit,
+            sessions = {row['user_id']: row['session_id'] for row in cursor.fetchall()}
+            
+            # 3) Count them as played games, as complete_session does
+            cursor.execute("""
+                UPDATE users
+                SET total_games_played = total_games_played + 1
+                WHERE user_id = ANY(%s)
+            """, (list(sessions),))
+            
+            # 4) Insert leaderboard entries
+            cursor.execute(
+                "INSERT INTO leaderboard (user_id, session_id, game_mode, final_money, "
+                "rounds_completed, profit) VALUES "
+                + ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(entries)),
+                [value for user_id, (mode, start, final, rounds) in entries.items()
+                 for value in (user_id, sessions[user_id], mode, final, rounds, final - start)]
             )
-
-            print(f"Added leaderboard entry for {username} (mode={game_mode}, session={session_id})")
-            created += 1
-
-        print(f"\nFinished adding {created} dummy leaderboard entries.")
+        
+        print(f"\nFinished adding {len(entries)} dummy leaderboard entries.")
 
     
     def get_user_by_username(self, username):
         """Get user by username"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_user_by_username') as cursor:
             cursor.execute("""
                 SELECT * FROM users WHERE username = %s
             """, (username,))
@@ -182,7 +838,7 @@ class DatabaseHelper:
     
     def get_user_by_id(self, user_id):
         """Get user by ID"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_user_by_id') as cursor:
             cursor.execute("""
                 SELECT * FROM users WHERE user_id = %s
             """, (user_id,))
@@ -190,16 +846,25 @@ class DatabaseHelper:
     
     def update_last_login(self, user_id):
         """Update user's last login timestamp"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='update_last_login') as cursor:
             cursor.execute("""
                 UPDATE users 
                 SET last_login = CURRENT_TIMESTAMP
                 WHERE user_id = %s
             """, (user_id,))
     
+    def update_password_hash(self, user_id, password_hash):
+        """Replace a user's password hash"""
+        with self.get_cursor(query_name='update_password_hash') as cursor:
+            cursor.execute("""
+                UPDATE users
+                SET password_hash = %s
+                WHERE user_id = %s
+            """, (password_hash, user_id))
+    
     def ban_user(self, user_id, admin_id):
         """Ban a user (admin only)"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='ban_user') as cursor:
             cursor.execute("""
                 UPDATE users SET is_banned = TRUE WHERE user_id = %s
             """, (user_id,))
@@ -210,7 +875,7 @@ class DatabaseHelper:
     
     def get_user_profile(self, user_id):
         """Get user profile with statistics"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_user_profile') as cursor:
             cursor.execute("""
                 SELECT u.*, up.* 
                 FROM users u
@@ -218,14 +883,51 @@ class DatabaseHelper:
                 WHERE u.user_id = %s
             """, (user_id,))
             return cursor.fetchone()
-    
+
+
+    # AUTH SESSION OPERATIONS (backing session_store.PostgresSessionStore)
+
+
+    def create_auth_session(self, token_hash, user_id, expires_at):
+        """Store a login session under the sha256 of its token"""
+        with self.get_cursor(query_name='create_auth_session') as cursor:
+            cursor.execute("""
+                INSERT INTO auth_sessions (token_hash, user_id, expires_at)
+                VALUES (%s, %s, %s)
+            """, (token_hash, user_id, expires_at))
+
+    def get_auth_session(self, token_hash):
+        """Get a login session by token hash (including expired ones)"""
+        with self.get_cursor(query_name='get_auth_session') as cursor:
+            cursor.execute("""
+                SELECT user_id, expires_at FROM auth_sessions
+                WHERE token_hash = %s
+            """, (token_hash,))
+            return cursor.fetchone()
+
+    def delete_auth_session(self, token_hash):
+        """Delete a login session by token hash. Returns True if it existed"""
+        with self.get_cursor(query_name='delete_auth_session') as cursor:
+            cursor.execute("""
+                DELETE FROM auth_sessions WHERE token_hash = %s
+            """, (token_hash,))
+            return cursor.rowcount > 0
+
+    def delete_expired_auth_sessions(self, now):
+        """Delete sessions that expired before now. Returns the number deleted"""
+        with self.get_cursor(query_name='delete_expired_auth_sessions') as cursor:
+            cursor.execute("""
+                DELETE FROM auth_sessions WHERE expires_at < %s
+            """, (now,))
+            return cursor.rowcount
+
 
     # GAME SESSION OPERATIONS
 
     
     def create_game_session(self, user_id, game_mode, starting_money=1000, max_rounds=None):
         """Create a new game session"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='create_game_session') as cursor:
             cursor.execute("""
                 INSERT INTO game_sessions 
                 (user_id, game_mode, starting_money, current_money, max_rounds)
@@ -237,7 +939,7 @@ class DatabaseHelper:
     
     def get_active_session(self, user_id):
         """Get user's active game session"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_active_session') as cursor:
             cursor.execute("""
                 SELECT * FROM game_sessions
                 WHERE user_id = %s AND status = 'active'
@@ -248,7 +950,7 @@ class DatabaseHelper:
     
     def update_session(self, session_id, current_money, rounds_completed):
         """Update game session"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='update_session') as cursor:
             cursor.execute("""
                 UPDATE game_sessions
                 SET current_money = %s, rounds_completed = %s
@@ -256,13 +958,22 @@ class DatabaseHelper:
             """, (current_money, rounds_completed, session_id))
     
     def complete_session(self, session_id):
-        """Mark session as completed"""
-        with self.get_cursor() as cursor:
+        """Mark session as completed and count it in the user's games played"""
+        with self.get_cursor(query_name='complete_session') as cursor:
             cursor.execute("""
                 UPDATE game_sessions
                 SET status = 'completed', ended_at = CURRENT_TIMESTAMP
-                WHERE session_id = %s
+                WHERE session_id = %s AND status <> 'completed'
+                RETURNING user_id
             """, (session_id,))
+            
+            session = cursor.fetchone()
+            if session:
+                cursor.execute("""
+                    UPDATE users
+                    SET total_games_played = total_games_played + 1
+                    WHERE user_id = %s
+                """, (session['user_id'],))
     
 
     # GAME STATE OPERATIONS (Save/Load)
@@ -270,19 +981,21 @@ class DatabaseHelper:
     
     def save_game_state(self, session_id, round_number, player_hand, dealer_hand, 
                        deck_state, current_bet, game_phase):
-        """Save current game state"""
-        with self.get_cursor() as cursor:
-            # Delete old save for this session
-            cursor.execute("""
-                DELETE FROM game_states WHERE session_id = %s
-            """, (session_id,))
-            
-            # Insert new save
+        """Save current game state (one save per session, updated in place)"""
+        with self.get_cursor(query_name='save_game_state') as cursor:
             cursor.execute("""
                 INSERT INTO game_states 
                 (session_id, round_number, player_hand, dealer_hand, 
                  deck_state, current_bet, game_phase)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (session_id) DO UPDATE
+                SET round_number = EXCLUDED.round_number,
+                    player_hand = EXCLUDED.player_hand,
+                    dealer_hand = EXCLUDED.dealer_hand,
+                    deck_state = EXCLUDED.deck_state,
+                    current_bet = EXCLUDED.current_bet,
+                    game_phase = EXCLUDED.game_phase,
+                    saved_at = CURRENT_TIMESTAMP
                 RETURNING state_id
             """, (session_id, round_number, json.dumps(player_hand), 
                   json.dumps(dealer_hand), json.dumps(deck_state), 
@@ -292,12 +1005,10 @@ class DatabaseHelper:
     
     def load_game_state(self, session_id):
         """Load saved game state"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='load_game_state') as cursor:
             cursor.execute("""
                 SELECT * FROM game_states
                 WHERE session_id = %s
-                ORDER BY saved_at DESC
-                LIMIT 1
             """, (session_id,))
             
             state = cursor.fetchone()
@@ -314,7 +1025,7 @@ class DatabaseHelper:
     
     def delete_game_state(self, session_id):
         """Delete saved game state"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='delete_game_state') as cursor:
             cursor.execute("""
                 DELETE FROM game_states WHERE session_id = %s
             """, (session_id,))
@@ -326,23 +1037,72 @@ class DatabaseHelper:
     def save_game_round(self, session_id, round_number, bet_amount, player_hand, 
                        dealer_hand, player_score, dealer_score, result, 
                        winnings, balance_after):
-        """Save completed game round"""
-        with self.get_cursor() as cursor:
+        """Save completed game round (returns None when writes are buffered)"""
+        with self.get_cursor(query_name='save_game_round') as cursor:
+            return self._insert_round(
+                cursor, session_id, round_number, bet_amount, player_hand,
+                dealer_hand, player_score, dealer_score, result,
+                winnings, balance_after)
+    
+    def commit_round(self, session_id, round_number, bet_amount, player_hand,
+                     dealer_hand, player_score, dealer_score, result,
+                     winnings, balance_after):
+        """
+        Finish a round in one transaction: save the round, apply it to the
+        player's statistics, clear the saved game state and update the
+        session's money and round count.
+        The round is inserted in the same transaction even when writes are
+        buffered, so it is never lost or saved without the rest.
+        """
+        with self.get_cursor(query_name='commit_round') as cursor:
+            round_id = self._insert_round(
+                cursor, session_id, round_number, bet_amount, player_hand,
+                dealer_hand, player_score, dealer_score, result,
+                winnings, balance_after, buffered=False)
+            
+            cursor.execute("""
+                DELETE FROM game_states WHERE session_id = %s
+            """, (session_id,))
+            
+            cursor.execute("""
+                UPDATE game_sessions
+                SET current_money = %s, rounds_completed = %s
+                WHERE session_id = %s
+            """, (balance_after, round_number, session_id))
+            
+            return round_id
+    
+    def _insert_round(self, cursor, session_id, round_number, bet_amount, player_hand,
+                      dealer_hand, player_score, dealer_score, result,
+                      winnings, balance_after, buffered=True):
+        """
+        Insert a round (or queue it, if buffered and writes are buffered).
+        The trg_apply_new_rounds trigger adds it to the profile statistics
+        in the transaction that writes the row, so a buffered round is only
+        counted once it is actually written.
+        """
+        row = (session_id, round_number, bet_amount, json.dumps(player_hand),
+               json.dumps(dealer_hand), player_score, dealer_score,
+               result, winnings, balance_after)
+        
+        if buffered and self.write_buffer:
+            self.write_buffer.add('game_rounds', row)
+            round_id = None
+        else:
             cursor.execute("""
                 INSERT INTO game_rounds
                 (session_id, round_number, bet_amount, player_hand, dealer_hand,
                  player_score, dealer_score, result, winnings, balance_after)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING round_id
-            """, (session_id, round_number, bet_amount, json.dumps(player_hand),
-                  json.dumps(dealer_hand), player_score, dealer_score, 
-                  result, winnings, balance_after))
-            
-            return cursor.fetchone()['round_id']
+            """, row)
+            round_id = cursor.fetchone()['round_id']
+        
+        return round_id
     
     def get_session_rounds(self, session_id):
         """Get all rounds for a session"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_session_rounds') as cursor:
             cursor.execute("""
                 SELECT * FROM game_rounds
                 WHERE session_id = %s
@@ -357,28 +1117,169 @@ class DatabaseHelper:
     def add_to_leaderboard(self, user_id, session_id, final_money, 
                           rounds_completed, profit):
         """Add score to leaderboard"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='add_to_leaderboard') as cursor:
             cursor.execute("""
-                INSERT INTO leaderboard
-                (user_id, session_id, final_money, rounds_completed, profit)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING leaderboard_id
-            """, (user_id, session_id, final_money, rounds_completed, profit))
+                WITH inserted AS (
+                    INSERT INTO leaderboard
+                    (user_id, session_id, game_mode, final_money, rounds_completed, profit)
+                    SELECT %s, session_id, game_mode, %s, %s, %s
+                    FROM game_sessions
+                    WHERE session_id = %s
+                    RETURNING leaderboard_id, user_id, game_mode, final_money, profit,
+                              rounds_completed, recorded_at
+                )
+                SELECT i.*, u.username
+                FROM inserted i
+                JOIN users u ON i.user_id = u.user_id
+            """, (user_id, final_money, rounds_completed, profit, session_id))
+            entry = cursor.fetchone()
+            if entry is None:
+                raise ValueError(f"Unknown game session: {session_id}")
+        
+        # Only once committed
+        if self.leaderboard_index is not None:
+            self.leaderboard_index.add(entry)
+        return entry['leaderboard_id']
+    
+    def get_leaderboard(self, limit=10, after_money=None, after_id=None):
+        """
+        Get a page of leaderboard entries, best first.
+        Pass the final_money and leaderboard_id of the last entry of the
+        previous page as after_money/after_id to get the next page.
+        Each entry gets the same rank RANK() would give it.
+        """
+        with self.get_cursor(query_name='get_leaderboard') as cursor:
+            if after_money is None or after_id is None:
+                cursor.execute("""
+                    SELECT * FROM top_leaderboard
+                    ORDER BY final_money DESC, leaderboard_id DESC
+                    LIMIT %s
+                """, (limit,))
+            else:
+                cursor.execute("""
+                    SELECT * FROM top_leaderboard
+                    WHERE (final_money, leaderboard_id) < (%s, %s)
+                    ORDER BY final_money DESC, leaderboard_id DESC
+                    LIMIT %s
+                """, (after_money, after_id, limit))
+            rows = cursor.fetchall()
+            
+            if rows:
+                # Rank of the first row, plus how many entries tied with it
+                # come before it, gives the position of every row on the page
+                first = rows[0]
+                cursor.execute("""
+                    SELECT 
+                        leaderboard_rank(%s) as rank,
+                        (SELECT COUNT(*) FROM leaderboard
+                         WHERE final_money = %s AND leaderboard_id > %s) as ties_before
+                """, (first['final_money'], first['final_money'], first['leaderboard_id']))
+                position = cursor.fetchone()
+                offset = position['rank'] + position['ties_before']
+                
+                rank = position['rank']
+                for i, row in enumerate(rows):
+                    if i > 0 and row['final_money'] != rows[i - 1]['final_money']:
+                        rank = offset + i
+                    row['rank'] = rank
             
-            return cursor.fetchone()['leaderboard_id']
+            return rows
     
-    def get_leaderboard(self, limit=10):
-        """Get top leaderboard entries"""
-        with self.get_cursor() as cursor:
+    def get_leaderboard_rank(self, user_id=None, score=None):
+        """
+        Get the leaderboard rank of a score, or of a user's best entry.
+        Returns: {'rank': int, 'score': Decimal, 'leaderboard_id': int or None}
+                 or None if the user has no entries
+        """
+        with self.get_cursor(query_name='get_leaderboard_rank') as cursor:
+            if user_id is not None:
+                cursor.execute("""
+                    SELECT leaderboard_id, final_money as score,
+                           leaderboard_rank(final_money) as rank
+                    FROM leaderboard
+                    WHERE user_id = %s
+                    ORDER BY final_money DESC, leaderboard_id DESC
+                    LIMIT 1
+                """, (user_id,))
+                return cursor.fetchone()
+            
+            cursor.execute("""
+                SELECT NULL as leaderboard_id, %s::DECIMAL as score,
+                       leaderboard_rank(%s) as rank
+            """, (score, score))
+            return cursor.fetchone()
+    
+    def get_friends_leaderboard(self, user_id):
+        """
+        Get the best leaderboard entry of the user and each friend,
+        ranked among themselves. One index probe per friend, no per-friend queries.
+        """
+        with self.get_cursor(query_name='get_friends_leaderboard') as cursor:
+            cursor.execute("""
+                WITH members AS (
+                    SELECT friend_id as user_id FROM friend_edges
+                    WHERE user_id = %s
+                    UNION ALL
+                    SELECT %s
+                )
+                SELECT best.*, u.username,
+                       RANK() OVER (ORDER BY best.final_money DESC) as rank
+                FROM members m
+                JOIN users u ON u.user_id = m.user_id
+                CROSS JOIN LATERAL (
+                    SELECT l.leaderboard_id, l.user_id, l.game_mode, l.final_money,
+                           l.profit, l.rounds_completed, l.recorded_at
+                    FROM leaderboard l
+                    WHERE l.user_id = m.user_id
+                    ORDER BY l.final_money DESC, l.leaderboard_id DESC
+                    LIMIT 1
+                ) best
+                ORDER BY best.final_money DESC, best.leaderboard_id DESC
+            """, (user_id, user_id))
+            return cursor.fetchall()
+    
+    def get_leaderboard_entries_after(self, after_id, limit=10000):
+        """Get leaderboard entries with leaderboard_id > after_id, in id order"""
+        with self.get_cursor(query_name='get_leaderboard_entries_after') as cursor:
             cursor.execute("""
                 SELECT * FROM top_leaderboard
+                WHERE leaderboard_id > %s
+                ORDER BY leaderboard_id
                 LIMIT %s
-            """, (limit,))
+            """, (after_id, limit))
             return cursor.fetchall()
     
+    def enable_leaderboard_index(self, **index_options):
+        """
+        Load the in-memory leaderboard index and keep it reconciled
+        in the background. add_to_leaderboard writes through to it.
+        Returns: the LeaderboardIndex
+        """
+        if self.leaderboard_index is None:
+            index = LeaderboardIndex(self, **index_options)
+            index.start()
+            self.leaderboard_index = index
+        return self.leaderboard_index
+    
+    def rebuild_leaderboard_buckets(self):
+        """
+        Recount leaderboard_score_buckets from the leaderboard table.
+        Returns: number of buckets
+        """
+        with self.get_cursor(query_name='rebuild_leaderboard_buckets') as cursor:
+            cursor.execute("LOCK TABLE leaderboard IN SHARE MODE")
+            cursor.execute("DELETE FROM leaderboard_score_buckets")
+            cursor.execute("""
+                INSERT INTO leaderboard_score_buckets (bucket, entries)
+                SELECT leaderboard_bucket(final_money), COUNT(*)
+                FROM leaderboard
+                GROUP BY 1
+            """)
+            return cursor.rowcount
+    
     def get_user_leaderboard_entries(self, user_id):
         """Get all leaderboard entries for a user"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_user_leaderboard_entries') as cursor:
             cursor.execute("""
                 SELECT l.*, u.username
                 FROM leaderboard l
@@ -392,38 +1293,186 @@ class DatabaseHelper:
     # FRIENDSHIP OPERATIONS
 
     
+    # A pair of users has at most one friendships row (idx_f_pair), and
+    # accepted ones are mirrored both ways in friend_edges by trigger
+    
     def send_friend_request(self, user_id, friend_id):
-        """Send a friend request"""
-        with self.get_cursor() as cursor:
+        """
+        Send a friend request.
+        A request the other user rejected earlier is reopened.
+        Returns: friendship_id, or None if a request or friendship already exists
+        """
+        with self.get_cursor(query_name='send_friend_request') as cursor:
             cursor.execute("""
                 INSERT INTO friendships (user_id, friend_id, status)
                 VALUES (%s, %s, 'pending')
+                ON CONFLICT ((LEAST(user_id, friend_id)), (GREATEST(user_id, friend_id)))
+                DO UPDATE SET user_id = EXCLUDED.user_id,
+                              friend_id = EXCLUDED.friend_id,
+                              status = 'pending',
+                              updated_at = CURRENT_TIMESTAMP
+                WHERE friendships.status = 'rejected'
                 RETURNING friendship_id
             """, (user_id, friend_id))
             
-            return cursor.fetchone()['friendship_id']
+            row = cursor.fetchone()
+            return row['friendship_id'] if row else None
+    
+    # pg_advisory_xact_lock(FRIEND_LOCK_SPACE, user_id) is held by the
+    # transaction accepting or ending a friendship of that user (the
+    # schema's remove_mutual_friend_counts uses the same key)
+    FRIEND_LOCK_SPACE = 1
     
     def accept_friend_request(self, friendship_id):
-        """Accept a friend request"""
-        with self.get_cursor() as cursor:
+        """
+        Accept a friend request.
+        Both users are locked first, lowest id first: accepting b-c while
+        a-b commits would otherwise miss the a-b edge and undercount a-c.
+        """
+        with self.get_cursor(query_name='accept_friend_request') as cursor:
+            cursor.execute("""
+                SELECT user_id, friend_id FROM friendships
+                WHERE friendship_id = %s
+            """, (friendship_id,))
+            pair = cursor.fetchone()
+            if pair is None:
+                return
+            for user_id in sorted((pair['user_id'], pair['friend_id'])):
+                cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)",
+                               (self.FRIEND_LOCK_SPACE, user_id))
+            
             cursor.execute("""
                 UPDATE friendships
                 SET status = 'accepted', updated_at = CURRENT_TIMESTAMP
-                WHERE friendship_id = %s
+                WHERE friendship_id = %s AND status <> 'accepted'
+                RETURNING user_id, friend_id
             """, (friendship_id,))
+            friendship = cursor.fetchone()
+            
+            if friendship:
+                self._add_mutual_friend_counts(cursor, friendship['user_id'],
+                                               friendship['friend_id'])
+    
+    def _add_mutual_friend_counts(self, cursor, user_a, user_b):
+        """
+        a and b just became friends: b is now a mutual friend of a and each
+        of b's other friends, and the other way round
+        """
+        cursor.execute("""
+            INSERT INTO friend_suggestions (user_id, candidate_id, mutual_count)
+            SELECT pairs.user_id, pairs.candidate_id, COUNT(*)
+            FROM (
+                SELECT %(a)s as user_id, friend_id as candidate_id
+                FROM friend_edges WHERE user_id = %(b)s AND friend_id <> %(a)s
+                UNION ALL
+                SELECT friend_id, %(a)s
+                FROM friend_edges WHERE user_id = %(b)s AND friend_id <> %(a)s
+                UNION ALL
+                SELECT %(b)s, friend_id
+                FROM friend_edges WHERE user_id = %(a)s AND friend_id <> %(b)s
+                UNION ALL
+                SELECT friend_id, %(b)s
+                FROM friend_edges WHERE user_id = %(a)s AND friend_id <> %(b)s
+            ) pairs
+            GROUP BY pairs.user_id, pairs.candidate_id
+            ON CONFLICT (user_id, candidate_id) DO UPDATE
+            SET mutual_count = friend_suggestions.mutual_count + EXCLUDED.mutual_count
+        """, {'a': user_a, 'b': user_b})
+    
+    def get_friend_suggestions(self, user_id, limit=10):
+        """
+        Get friends-of-friends ranked by mutual friend count, leaving out
+        anyone the user already has a friendship or request with
+        """
+        with self.get_cursor(query_name='get_friend_suggestions') as cursor:
+            cursor.execute("""
+                SELECT s.candidate_id, u.username as candidate_name, s.mutual_count
+                FROM friend_suggestions s
+                JOIN users u ON s.candidate_id = u.user_id
+                WHERE s.user_id = %s
+                  AND s.mutual_count > 0
+                  AND NOT EXISTS (
+                      SELECT 1 FROM friendships f
+                      WHERE LEAST(f.user_id, f.friend_id) = LEAST(s.user_id, s.candidate_id)
+                        AND GREATEST(f.user_id, f.friend_id) = GREATEST(s.user_id, s.candidate_id)
+                  )
+                ORDER BY s.mutual_count DESC, s.candidate_id
+                LIMIT %s
+            """, (user_id, limit))
+            return cursor.fetchall()
+    
+    def rebuild_friend_suggestions(self):
+        """
+        Recount friend_suggestions from friend_edges.
+        Returns: number of suggestion rows
+        """
+        with self.get_cursor(query_name='rebuild_friend_suggestions') as cursor:
+            cursor.execute("LOCK TABLE friendships IN SHARE MODE")
+            cursor.execute("DELETE FROM friend_suggestions")
+            cursor.execute("""
+                INSERT INTO friend_suggestions (user_id, candidate_id, mutual_count)
+                SELECT a.user_id, b.friend_id, COUNT(*)
+                FROM friend_edges a
+                JOIN friend_edges b ON b.user_id = a.friend_id
+                WHERE b.friend_id <> a.user_id
+                GROUP BY a.user_id, b.friend_id
+            """)
+            return cursor.rowcount
     
     def get_friends(self, user_id):
-        """Get user's friends"""
-        with self.get_cursor() as cursor:
+        """
+        Get user's friends
+        Returns: [{'friendship_id', 'friend_id', 'friend_name', 'created_at'}, ...]
+        """
+        with self.get_cursor(query_name='get_friends') as cursor:
             cursor.execute("""
-                SELECT * FROM active_friends
-                WHERE user_id = %s OR friend_id = %s
-            """, (user_id, user_id))
+                SELECT e.friendship_id, e.friend_id, u.username as friend_name, e.created_at
+                FROM friend_edges e
+                JOIN users u ON e.friend_id = u.user_id
+                WHERE e.user_id = %s
+            """, (user_id,))
             return cursor.fetchall()
     
+    def are_friends(self, user_id, other_user_id):
+        """Check whether two users are friends"""
+        with self.get_cursor(query_name='are_friends') as cursor:
+            cursor.execute("""
+                SELECT 1 FROM friend_edges
+                WHERE user_id = %s AND friend_id = %s
+            """, (user_id, other_user_id))
+            return cursor.fetchone() is not None
+    
+    def get_friendship_between(self, user_id, other_user_id):
+        """Get the friendship (any status, either direction) between two users, or None"""
+        with self.get_cursor(query_name='get_friendship_between') as cursor:
+            cursor.execute("""
+                SELECT * FROM friendships
+                WHERE LEAST(user_id, friend_id) = LEAST(%s, %s)
+                  AND GREATEST(user_id, friend_id) = GREATEST(%s, %s)
+            """, (user_id, other_user_id, user_id, other_user_id))
+            return cursor.fetchone()
+    
+    def rebuild_friend_edges(self):
+        """
+        Recreate friend_edges from accepted friendships.
+        Returns: number of edges
+        """
+        with self.get_cursor(query_name='rebuild_friend_edges') as cursor:
+            cursor.execute("LOCK TABLE friendships IN SHARE MODE")
+            cursor.execute("DELETE FROM friend_edges")
+            cursor.execute("""
+                INSERT INTO friend_edges (user_id, friend_id, friendship_id, created_at)
+                SELECT user_id, friend_id, friendship_id, created_at
+                FROM friendships WHERE status = 'accepted'
+                UNION ALL
+                SELECT friend_id, user_id, friendship_id, created_at
+                FROM friendships WHERE status = 'accepted'
+            """)
+            return cursor.rowcount
+    
     def get_pending_friend_requests(self, user_id):
         """Get pending friend requests"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_pending_friend_requests') as cursor:
             cursor.execute("""
                 SELECT f.*, u.username as requester_name
                 FROM friendships f
@@ -436,62 +1485,133 @@ class DatabaseHelper:
     # MESSAGE OPERATIONS
 
     
+    # unread_counters holds the unread count per (receiver, sender); it is
+    # changed in the same transaction as the messages it counts
+    
     def send_message(self, sender_id, receiver_id, message_text):
         """Send a message"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='send_message') as cursor:
             cursor.execute("""
                 INSERT INTO messages (sender_id, receiver_id, message_text)
                 VALUES (%s, %s, %s)
-                RETURNING message_id
+                RETURNING message_id, sent_at
             """, (sender_id, receiver_id, message_text))
+            message = cursor.fetchone()
             
-            return cursor.fetchone()['message_id']
-    
-    def get_conversation(self, user_id, other_user_id, limit=50):
-        """Get conversation between two users"""
-        with self.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT m.*, 
-                       u1.username as sender_name,
-                       u2.username as receiver_name
-                FROM messages m
-                JOIN users u1 ON m.sender_id = u1.user_id
-                JOIN users u2 ON m.receiver_id = u2.user_id
-                WHERE (m.sender_id = %s AND m.receiver_id = %s)
-                   OR (m.sender_id = %s AND m.receiver_id = %s)
-                ORDER BY m.sent_at DESC
-                LIMIT %s
-            """, (user_id, other_user_id, other_user_id, user_id, limit))
+            cursor.execute("""
+                INSERT INTO unread_counters (receiver_id, sender_id, unread_count, last_message_at)
+                VALUES (%s, %s, 1, %s)
+                ON CONFLICT (receiver_id, sender_id) DO UPDATE
+                SET unread_count = unread_counters.unread_count + 1,
+                    last_message_at = GREATEST(unread_counters.last_message_at,
+                                               EXCLUDED.last_message_at)
+            """, (receiver_id, sender_id, message['sent_at']))
             
-            messages = cursor.fetchall()
-            return list(reversed(messages))  # Return chronological order
+            return message['message_id']
+    
+    def get_conversation(self, user_id, other_user_id, limit=50, before=None):
+        """
+        Get the latest messages between two users, in chronological order.
+        before: message_cursor() of the oldest message already shown, to
+        get the page of messages before it
+        """
+        user_low, user_high = sorted((user_id, other_user_id))
+        with self.get_cursor(query_name='get_conversation') as cursor:
+            cursor.execute(f"""
+                SELECT * FROM (
+                    SELECT m.*, 
+                           u1.username as sender_name,
+                           u2.username as receiver_name
+                    FROM messages m
+                    JOIN users u1 ON m.sender_id = u1.user_id
+                    JOIN users u2 ON m.receiver_id = u2.user_id
+                    WHERE m.user_low = %s AND m.user_high = %s
+                    {"AND (m.sent_at, m.message_id) < (%s, %s)" if before else ""}
+                    ORDER BY m.sent_at DESC, m.message_id DESC
+                    LIMIT %s
+                ) page
+                ORDER BY sent_at, message_id
+            """, (user_low, user_high, *(before or ()), limit))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def message_cursor(message):
+        return (message['sent_at'], message['message_id'])
     
     def mark_messages_read(self, receiver_id, sender_id):
         """Mark messages as read"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='mark_messages_read') as cursor:
             cursor.execute("""
                 UPDATE messages
                 SET is_read = TRUE
                 WHERE receiver_id = %s AND sender_id = %s AND is_read = FALSE
             """, (receiver_id, sender_id))
+            
+            # Only by the messages marked here; ones sent meanwhile stay unread
+            if cursor.rowcount > 0:
+                cursor.execute("""
+                    UPDATE unread_counters
+                    SET unread_count = GREATEST(unread_count - %s, 0)
+                    WHERE receiver_id = %s AND sender_id = %s
+                """, (cursor.rowcount, receiver_id, sender_id))
     
     def get_unread_count(self, user_id):
         """Get count of unread messages"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_unread_count') as cursor:
             cursor.execute("""
-                SELECT COUNT(*) as count
-                FROM messages
-                WHERE receiver_id = %s AND is_read = FALSE
+                SELECT COALESCE(SUM(unread_count), 0) as count
+                FROM unread_counters
+                WHERE receiver_id = %s
             """, (user_id,))
             
             return cursor.fetchone()['count']
     
+    def get_inbox_summary(self, user_id):
+        """
+        Get the unread count of every conversation sent to a user, latest first.
+        Returns: [{'sender_id', 'sender_name', 'unread_count', 'last_message_at'}, ...]
+        """
+        with self.get_cursor(query_name='get_inbox_summary') as cursor:
+            cursor.execute("""
+                SELECT c.sender_id, u.username as sender_name,
+                       c.unread_count, c.last_message_at
+                FROM unread_counters c
+                JOIN users u ON c.sender_id = u.user_id
+                WHERE c.receiver_id = %s
+                ORDER BY c.last_message_at DESC NULLS LAST
+            """, (user_id,))
+            return cursor.fetchall()
+    
+    def rebuild_unread_counters(self):
+        """
+        Recount unread_counters from the messages table.
+        Returns: number of counters
+        """
+        with self.get_cursor(query_name='rebuild_unread_counters') as cursor:
+            cursor.execute("LOCK TABLE messages IN SHARE MODE")
+            cursor.execute("DELETE FROM unread_counters")
+            cursor.execute("""
+                INSERT INTO unread_counters (receiver_id, sender_id, unread_count, last_message_at)
+                SELECT receiver_id, sender_id,
+                       COUNT(*) FILTER (WHERE NOT is_read),
+                       MAX(sent_at)
+                FROM messages
+                GROUP BY receiver_id, sender_id
+            """)
+            return cursor.rowcount
+    
     # ADMIN OPERATIONS
     
     def log_admin_action(self, admin_id, action_type, target_user_id, 
                         description, details=None):
-        """Log admin action"""
-        with self.get_cursor() as cursor:
+        """Log admin action (returns None when writes are buffered)"""
+        if self.write_buffer:
+            self.write_buffer.add('admin_logs', (
+                admin_id, action_type, target_user_id, description,
+                json.dumps(details) if details else None))
+            return None
+        
+        with self.get_cursor(query_name='log_admin_action') as cursor:
             cursor.execute("""
                 INSERT INTO admin_logs 
                 (admin_id, action_type, target_user_id, description, details)
@@ -502,34 +1622,92 @@ class DatabaseHelper:
             
             return cursor.fetchone()['log_id']
     
-    def get_admin_logs(self, limit=100):
-        """Get recent admin logs"""
-        with self.get_cursor() as cursor:
-            cursor.execute("""
+    # Admin listings page with keyset cursors: pass the cursor of the last
+    # row of a page (see *_cursor) as `after` to get the next one. Each page
+    # is one index range scan, however deep it is.
+    
+    def get_admin_logs(self, limit=100, after=None):
+        """
+        Get admin logs, newest first.
+        after: admin_log_cursor() of the last log of the previous page
+        """
+        with self.get_cursor(query_name='get_admin_logs') as cursor:
+            cursor.execute(f"""
                 SELECT al.*, 
                        u1.username as admin_name,
                        u2.username as target_username
                 FROM admin_logs al
                 JOIN users u1 ON al.admin_id = u1.user_id
                 LEFT JOIN users u2 ON al.target_user_id = u2.user_id
-                ORDER BY al.performed_at DESC
+                {"WHERE (al.performed_at, al.log_id) < (%s, %s)" if after else ""}
+                ORDER BY al.performed_at DESC, al.log_id DESC
                 LIMIT %s
-            """, (limit,))
+            """, (*(after or ()), limit))
             return cursor.fetchall()
     
-    def get_all_users(self, limit=100, offset=0):
-        """Get all users (admin only)"""
-        with self.get_cursor() as cursor:
-            cursor.execute("""
+    @staticmethod
+    def admin_log_cursor(log):
+        return (log['performed_at'], log['log_id'])
+    
+    def get_all_users(self, limit=100, after=None):
+        """
+        Get all users with statistics (admin only), most games played first.
+        after: user_statistics_cursor() of the last user of the previous page
+        """
+        with self.get_cursor(query_name='get_all_users') as cursor:
+            cursor.execute(f"""
                 SELECT * FROM user_statistics
-                ORDER BY total_games_played DESC
-                LIMIT %s OFFSET %s
-            """, (limit, offset))
+                {"WHERE total_games_played <= %s "
+                 "AND (total_games_played < %s OR user_id > %s)" if after else ""}
+                ORDER BY total_games_played DESC, user_id
+                LIMIT %s
+            """, (*((after[0], after[0], after[1]) if after else ()), limit))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def user_statistics_cursor(user):
+        return (user['total_games_played'], user['user_id'])
+    
+    def get_users_page(self, limit=50, after=None):
+        """
+        Get users in user_id order (admin only).
+        after: user_id of the last user of the previous page
+        """
+        with self.get_cursor(query_name='get_users_page') as cursor:
+            cursor.execute("""
+                SELECT user_id, username, email, role, is_banned, 
+                       total_games_played, created_at, last_login
+                FROM users
+                WHERE user_id > %s
+                ORDER BY user_id
+                LIMIT %s
+            """, (after or 0, limit))
             return cursor.fetchall()
     
+    def get_sessions_page(self, limit=20, after=None):
+        """
+        Get game sessions, most recently started first (admin only).
+        after: session_cursor() of the last session of the previous page
+        """
+        with self.get_cursor(query_name='get_sessions_page') as cursor:
+            cursor.execute(f"""
+                SELECT gs.*, u.username
+                FROM game_sessions gs
+                JOIN users u ON gs.user_id = u.user_id
+                {"WHERE (gs.started_at, gs.session_id) < (%s, %s)" if after else ""}
+                ORDER BY gs.started_at DESC, gs.session_id DESC
+                LIMIT %s
+            """, (*(after or ()), limit))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def session_cursor(session):
+        return (session['started_at'], session['session_id'])
+    
     def update_game_setting(self, setting_key, setting_value, admin_id):
-        """Update game setting"""
-        with self.get_cursor() as cursor:
+        """Update game setting. Raises ValueError if the value is invalid for it"""
+        SettingsCache.validate(setting_key, setting_value)
+        with self.get_cursor(query_name='update_game_setting') as cursor:
             cursor.execute("""
                 UPDATE game_settings
                 SET setting_value = %s, 
@@ -540,61 +1718,144 @@ class DatabaseHelper:
             
             self.log_admin_action(admin_id, 'update_setting', None,
                                 f'Updated {setting_key} to {setting_value}')
+        
+        # Other processes are told by the game_settings_changed trigger
+        self.settings_cache.invalidate()
     
     def get_game_settings(self):
         """Get all game settings"""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(query_name='get_game_settings') as cursor:
             cursor.execute("""
                 SELECT * FROM game_settings
             """)
             return cursor.fetchall()
     
     def get_game_setting(self, setting_key):
-        """Get specific game setting"""
-        with self.get_cursor() as cursor:
+        """Get specific game setting (cached)"""
+        return self.settings_cache.get(setting_key)
+    
+    def get_typed_setting(self, setting_key, default=None):
+        """Get specific game setting as int/float (cached), or default"""
+        return self.settings_cache.get_typed(setting_key, default)
+    
+    def _load_game_settings(self):
+        with self.get_cursor(query_name='_load_game_settings') as cursor:
             cursor.execute("""
-                SELECT setting_value FROM game_settings
-                WHERE setting_key = %s
-            """, (setting_key,))
-            
-            result = cursor.fetchone()
-            return result['setting_value'] if result else None
+                SELECT setting_key, setting_value FROM game_settings
+            """)
+            return {row['setting_key']: row['setting_value'] for row in cursor.fetchall()}
+    
+    def start_settings_listener(self):
+        """
+        Listen for game_settings_changed notifications on a dedicated
+        connection and drop the settings cache whenever any process
+        changes a setting
+        """
+        if self.settings_listener is None:
+            self.settings_listener = threading.Thread(target=self._listen_for_settings,
+                                                      daemon=True)
+            self.settings_listener.start()
+    
+    def _listen_for_settings(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.conn_params)
+                conn.autocommit = True
+                conn.cursor().execute("LISTEN game_settings_changed")
+                # Changes may have been missed while not listening
+                self.settings_cache.invalidate()
+                
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.settings_cache.invalidate()
+            except Exception:
+                logger.exception("Settings listener failed, reconnecting")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
     
 
     # STATISTICS OPERATIONS
     
+    # Profile counters are kept up to date by the trg_apply_new_rounds
+    # trigger on game_rounds, and users.total_games_played by
+    # complete_session. The rebuild methods below recompute them from
+    # scratch, for repair only.
+    #
+    # highest_balance is the highest balance a user has held, counting the
+    # profile's initial PROFILE_START_BALANCE: it never drops below that,
+    # even for a user who has only lost. Both paths use this rule.
+    
+    PROFILE_START_BALANCE = 1000.00  # user_profiles.highest_balance default
+    
     def update_user_statistics(self, user_id):
-        """Update user profile statistics"""
-        with self.get_cursor() as cursor:
-            # Calculate total winnings and losses
-            cursor.execute("""
+        """Recompute one user's profile statistics from all their rounds"""
+        with self.get_cursor(query_name='update_user_statistics') as cursor:
+            self._rebuild_statistics(cursor, "WHERE u.user_id = %s", (user_id,))
+    
+    def rebuild_all_user_statistics(self):
+        """Recompute every user's profile statistics. Returns users updated"""
+        with self.get_cursor(query_name='rebuild_all_user_statistics') as cursor:
+            return self._rebuild_statistics(cursor, "", ())
+    
+    def _rebuild_statistics(self, cursor, where, params):
+        cursor.execute(f"""
+            WITH round_stats AS (
                 SELECT 
-                    COALESCE(SUM(CASE WHEN winnings > 0 THEN winnings ELSE 0 END), 0) as total_winnings,
-                    COALESCE(SUM(CASE WHEN winnings < 0 THEN ABS(winnings) ELSE 0 END), 0) as total_losses,
-                    MAX(balance_after) as highest_balance
-                FROM game_rounds gr
-                JOIN game_sessions gs ON gr.session_id = gs.session_id
-                WHERE gs.user_id = %s
-            """, (user_id,))
-            
-            stats = cursor.fetchone()
-            
-            # Update user profile
-            cursor.execute("""
-                UPDATE user_profiles
-                SET total_winnings = %s,
-                    total_losses = %s,
-                    highest_balance = %s
-                WHERE user_id = %s
-            """, (stats['total_winnings'], stats['total_losses'],
-                  stats['highest_balance'], user_id))
-            
-            # Update total games played
-            cursor.execute("""
-                UPDATE users
-                SET total_games_played = (
-                    SELECT COUNT(*) FROM game_sessions
-                    WHERE user_id = %s AND status = 'completed'
-                )
-                WHERE user_id = %s
-            """, (user_id, user_id))
\ No newline at end of file
+                    u.user_id,
+                    COALESCE(SUM(CASE WHEN gr.winnings > 0 THEN gr.winnings ELSE 0 END), 0) as total_winnings,
+                    COALESCE(SUM(CASE WHEN gr.winnings < 0 THEN ABS(gr.winnings) ELSE 0 END), 0) as total_losses,
+                    GREATEST(COALESCE(MAX(gr.balance_after), 0), %s) as highest_balance
+                FROM users u
+                LEFT JOIN game_sessions gs ON gs.user_id = u.user_id
+                LEFT JOIN game_rounds gr ON gr.session_id = gs.session_id
+                {where}
+                GROUP BY u.user_id
+            )
+            UPDATE user_profiles up
+            SET total_winnings = rs.total_winnings,
+                total_losses = rs.total_losses,
+                highest_balance = rs.highest_balance
+            FROM round_stats rs
+            WHERE up.user_id = rs.user_id
+        """, (self.PROFILE_START_BALANCE,) + tuple(params))
+        updated = cursor.rowcount
+        
+        cursor.execute(f"""
+            UPDATE users u
+            SET total_games_played = (
+                SELECT COUNT(*) FROM game_sessions gs
+                WHERE gs.user_id = u.user_id AND gs.status = 'completed'
+            )
+            {where}
+        """, params)
+        
+        # Rollup behind the user_statistics view
+        cursor.execute(f"""
+            INSERT INTO user_round_stats
+                (user_id, total_sessions, rounds_played, rounds_won, rounds_lost)
+            SELECT 
+                u.user_id,
+                COUNT(DISTINCT gs.session_id),
+                COUNT(gr.round_id),
+                COUNT(gr.round_id) FILTER (WHERE gr.result = 'win'),
+                COUNT(gr.round_id) FILTER (WHERE gr.result = 'loss')
+            FROM users u
+            LEFT JOIN game_sessions gs ON gs.user_id = u.user_id
+            LEFT JOIN game_rounds gr ON gr.session_id = gs.session_id
+            {where}
+            GROUP BY u.user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET total_sessions = EXCLUDED.total_sessions,
+                rounds_played = EXCLUDED.rounds_played,
+                rounds_won = EXCLUDED.rounds_won,
+                rounds_lost = EXCLUDED.rounds_lost
+        """, params)
+        
+        return updated
@@ -0,0 +1,356 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.database import DatabaseHelper
+
+# Bulk synthetic data for load testing: users, profiles, sessions, rounds,
+# leaderboard entries, friendships and messages, streamed in with COPY.
+# Usage: python generate_load_data.py --users 1000000 [options]
+# Rows get explicit ids after the current maximum, so it can be run against
+# a database that already has data; sequences are moved past them at the end.
+
+PASSWORD_HASH = "$2b$12$abcdefghijklmnopqrstuv1234567890abcd"  # dummy hash, as create_dummy_users
+
+# Round outcomes, roughly as simulation.py measures them with the default rules
+RESULTS = ('win', 'loss', 'push', 'blackjack', 'bust')
+RESULT_WEIGHTS = (0.38, 0.34, 0.08, 0.04, 0.16)
+
+GAME_MODES = ('tournament', 'freeplay', 'web')
+SUITS = ('Hearts', 'Diamonds', 'Clubs', 'Spades')
+
+# Tables whose user triggers maintain derived data (see schema.sql);
+# --no-triggers disables them and rebuilds that data afterwards
+TRIGGER_TABLES = ('game_sessions', 'game_rounds', 'leaderboard', 'friendships')
+
+COLUMNS = {
+    'users': ('user_id', 'username', 'email', 'password_hash', 'role', 'created_at',
+              'last_login'),
+    'user_profiles': ('user_id', 'display_name'),
+    'game_sessions': ('session_id', 'user_id', 'game_mode', 'starting_money', 'current_money',
+                      'rounds_completed', 'max_rounds', 'status', 'started_at', 'ended_at'),
+    'game_rounds': ('round_id', 'session_id', 'round_number', 'bet_amount', 'player_hand',
+                    'dealer_hand', 'player_score', 'dealer_score', 'result', 'winnings',
+                    'balance_after', 'played_at'),
+    'leaderboard': ('leaderboard_id', 'user_id', 'session_id', 'game_mode', 'final_money',
+                    'rounds_completed', 'profit', 'recorded_at'),
+    'friendships': ('friendship_id', 'user_id', 'friend_id', 'status', 'created_at',
+                    'updated_at'),
+    'messages': ('message_id', 'sender_id', 'receiver_id', 'message_text', 'is_read',
+                 'sent_at'),
+}
+
+ID_COLUMNS = {
+    'users': 'user_id',
+    'game_sessions': 'session_id',
+    'game_rounds': 'round_id',
+    'leaderboard': 'leaderboard_id',
+    'friendships': 'friendship_id',
+    'messages': 'message_id',
+}
+
+
+class CopyWriter:
+    """Buffers rows per table as CSV and sends them with COPY FROM STDIN"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.buffers = {}
+        self.counts = {table: 0 for table in COLUMNS}
+
+    def add(self, table, row):
+        if table not in self.buffers:
+            buffer = io.StringIO()
+            self.buffers[table] = (buffer, csv.writer(buffer))
+        self.buffers[table][1].writerow(['\\N' if value is None else value for value in row])
+        self.counts[table] += 1
+
+    def send(self, *tables):
+        """COPY the buffered rows of tables, in the order given (for foreign keys)"""
+        for table in tables:
+            if table not in self.buffers:
+                continue
+            buffer, _ = self.buffers.pop(table)
+            buffer.seek(0)
+            self.cursor.copy_expert(
+                f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN "
+                "WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+
+def exponential_count(rng, mean):
+    """Non-negative whole number with the given mean (long tail)"""
+    if mean <= 0:
+        return 0
+    return int(rng.expovariate(1.0 / (mean + 0.5)))
+
+
+def pareto_count(rng, mean, alpha=2.0):
+    """Whole number with the given mean and a heavy tail (a few very social users)"""
+    if mean <= 0:
+        return 0
+    scale = mean * (alpha - 1) / alpha
+    return int(scale * rng.paretovariate(alpha) + 0.5)
+
+
+def random_scores(rng, result):
+    """Plausible (player_score, dealer_score) for a round result"""
+    if result == 'win':
+        player = rng.randint(18, 21)
+        return player, rng.choice((rng.randint(17, player - 1), rng.randint(22, 26)))
+    if result == 'loss':
+        dealer = rng.randint(18, 21)
+        return rng.randint(12, dealer - 1), dealer
+    if result == 'push':
+        score = rng.randint(17, 21)
+        return score, score
+    if result == 'blackjack':
+        return 21, rng.randint(4, 21)
+    # bust: the dealer does not draw
+    return rng.randint(22, 26), rng.randint(4, 21)
+
+
+def random_hand(rng, total):
+    """A hand (card dicts, as Hand.to_dict) adding up to total"""
+    values = []
+    remaining = total
+    while remaining > 10:
+        value = rng.randint(2, min(10, remaining - 2))
+        values.append(value)
+        remaining -= value
+    values.append(remaining)
+    return json.dumps([
+        {'suit': rng.choice(SUITS),
+         'rank': rng.choice(('10', 'J', 'Q', 'K')) if value == 10 else str(value)}
+        for value in values
+    ])
+
+
+def next_ids(cursor):
+    """First free id for every table with a serial key"""
+    ids = {}
+    for table, column in ID_COLUMNS.items():
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 as next_id FROM {table}")
+        ids[table] = cursor.fetchone()['next_id']
+    return ids
+
+
+def set_sequences(cursor, ids):
+    """Move every serial sequence past the generated ids"""
+    for table, column in ID_COLUMNS.items():
+        cursor.execute("SELECT setval(pg_get_serial_sequence(%s, %s), %s, false)",
+                       (table, column, ids[table]))
+
+
+def generate_users(db, args, rng, ids, now):
+    """Users with their sessions, rounds and leaderboard entries, one batch per commit"""
+    first_user = ids['users']
+    last_user = first_user + args.users
+    span = timedelta(days=args.days).total_seconds()
+    mode_weights = [args.tournament_weight, args.freeplay_weight, args.web_weight]
+
+    for batch_start in range(first_user, last_user, args.batch_size):
+        with db.get_cursor(query_name='generate_users') as cursor:
+            writer = CopyWriter(cursor)
+            for user_id in range(batch_start, min(batch_start + args.batch_size, last_user)):
+                created_at = now - timedelta(seconds=rng.uniform(0, span))
+                writer.add('users', (user_id, f"load{user_id}", f"load{user_id}@example.com",
+                                     PASSWORD_HASH, 'player', created_at, None))
+                writer.add('user_profiles', (user_id, f"Load User {user_id}"))
+
+                for _ in range(exponential_count(rng, args.sessions_per_user)):
+                    session_id = ids['game_sessions']
+                    ids['game_sessions'] += 1
+                    game_mode = rng.choices(GAME_MODES, mode_weights)[0]
+                    started_at = created_at + timedelta(
+                        seconds=rng.uniform(0, (now - created_at).total_seconds()))
+                    starting_money = args.starting_money
+                    balance = starting_money
+
+                    rounds = 1 + exponential_count(rng, args.rounds_per_session - 1)
+                    played = 0
+                    for round_number in range(1, rounds + 1):
+                        if balance < args.min_bet:
+                            break
+                        bet = min(balance, rng.randrange(args.min_bet, args.max_bet + 1, args.min_bet))
+                        result = rng.choices(RESULTS, RESULT_WEIGHTS)[0]
+                        if result in ('win', 'push'):
+                            winnings = bet if result == 'win' else 0
+                        elif result == 'blackjack':
+                            winnings = int(bet * args.blackjack_payout)
+                        else:
+                            winnings = -bet
+                        player, dealer = random_scores(rng, result)
+                        balance += winnings
+                        played += 1
+                        writer.add('game_rounds', (
+                            ids['game_rounds'], session_id, round_number, bet,
+                            random_hand(rng, player), random_hand(rng, dealer),
+                            player, dealer, result, winnings, balance,
+                            started_at + timedelta(seconds=30 * round_number)
+                        ))
+                        ids['game_rounds'] += 1
+
+                    ended_at = started_at + timedelta(seconds=30 * (played + 1))
+                    status = 'abandoned' if rng.random() < args.abandon_ratio else 'completed'
+                    writer.add('game_sessions', (
+                        session_id, user_id, game_mode, starting_money, balance, played,
+                        rounds if game_mode == 'tournament' else None, status, started_at,
+                        ended_at
+                    ))
+
+                    if status == 'completed' and rng.random() < args.leaderboard_ratio:
+                        writer.add('leaderboard', (
+                            ids['leaderboard'], user_id, session_id, game_mode, balance, played,
+                            balance - starting_money, ended_at
+                        ))
+                        ids['leaderboard'] += 1
+
+            writer.send('users', 'user_profiles', 'game_sessions', 'game_rounds', 'leaderboard')
+        print(f"Users {batch_start}-{min(batch_start + args.batch_size, last_user) - 1}: "
+              f"{writer.counts['game_sessions']:,} sessions, "
+              f"{writer.counts['game_rounds']:,} rounds, "
+              f"{writer.counts['leaderboard']:,} leaderboard entries")
+
+
+def generate_social(db, args, rng, ids, user_range, now):
+    """Friendships and messages between the generated users"""
+    first_user, last_user = user_range
+    count = last_user - first_user
+    if count < 2:
+        return
+    # Each unordered pair is generated from its lower end only: friend =
+    # user + offset (wrapping), with offsets up to half the user count
+    max_offset = (count - 1) // 2
+    span = timedelta(days=args.days).total_seconds()
+
+    for batch_start in range(first_user, last_user, args.batch_size):
+        with db.get_cursor(query_name='generate_social') as cursor:
+            writer = CopyWriter(cursor)
+            for user_id in range(batch_start, min(batch_start + args.batch_size, last_user)):
+                friends = min(pareto_count(rng, args.friends_per_user / 2), max_offset)
+                for offset in rng.sample(range(1, max_offset + 1), friends) if friends else ():
+                    friend_id = first_user + (user_id - first_user + offset) % count
+                    if rng.random() < 0.5:
+                        requester, receiver = user_id, friend_id
+                    else:
+                        requester, receiver = friend_id, user_id
+                    status = 'pending' if rng.random() < args.pending_ratio else 'accepted'
+                    created_at = now - timedelta(seconds=rng.uniform(0, span))
+                    writer.add('friendships', (ids['friendships'], requester, receiver, status,
+                                               created_at, created_at))
+                    ids['friendships'] += 1
+
+                for _ in range(exponential_count(rng, args.messages_per_user)):
+                    receiver = first_user + (user_id - first_user
+                                             + rng.randint(1, count - 1)) % count
+                    sent_at = now - timedelta(seconds=rng.uniform(0, span))
+                    is_read = rng.random() < args.read_ratio
+                    writer.add('messages', (ids['messages'], user_id, receiver,
+                                            f"Load test message {ids['messages']}",
+                                            is_read, sent_at))
+                    ids['messages'] += 1
+
+            writer.send('friendships', 'messages')
+        print(f"Users {batch_start}-{min(batch_start + args.batch_size, last_user) - 1}: "
+              f"{writer.counts['friendships']:,} friendships, "
+              f"{writer.counts['messages']:,} messages")
+
+
+def set_triggers(db, enabled):
+    with db.get_cursor(query_name='set_triggers') as cursor:
+        for table in TRIGGER_TABLES:
+            cursor.execute(f"ALTER TABLE {table} {'ENABLE' if enabled else 'DISABLE'} TRIGGER USER")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate bulk synthetic data for load testing")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--sessions-per-user', type=float, default=5,
+                        help="mean, exponentially distributed")
+    parser.add_argument('--rounds-per-session', type=float, default=10,
+                        help="mean, exponentially distributed (at least 1)")
+    parser.add_argument('--friends-per-user', type=float, default=10,
+                        help="mean, Pareto distributed")
+    parser.add_argument('--messages-per-user', type=float, default=20,
+                        help="mean messages sent, exponentially distributed")
+    parser.add_argument('--leaderboard-ratio', type=float, default=0.3,
+                        help="share of completed sessions with a leaderboard entry")
+    parser.add_argument('--abandon-ratio', type=float, default=0.05)
+    parser.add_argument('--pending-ratio', type=float, default=0.1,
+                        help="share of friendships still pending")
+    parser.add_argument('--read-ratio', type=float, default=0.8,
+                        help="share of messages already read")
+    parser.add_argument('--tournament-weight', type=float, default=3)
+    parser.add_argument('--freeplay-weight', type=float, default=5)
+    parser.add_argument('--web-weight', type=float, default=2)
+    parser.add_argument('--starting-money', type=int, default=1000)
+    parser.add_argument('--min-bet', type=int, default=10)
+    parser.add_argument('--max-bet', type=int, default=500)
+    parser.add_argument('--blackjack-payout', type=float, default=1.5)
+    parser.add_argument('--days', type=int, default=90,
+                        help="spread timestamps over this many days")
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help="users per COPY batch and commit")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--no-triggers', action='store_true',
+                        help="disable maintenance triggers while loading, rebuild afterwards")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='blackjack_db')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='1234')
+    args = parser.parse_args()
+
+    db = DatabaseHelper(
+        host=args.host,
+        port=args.port,
+        database=args.database,
+        user=args.user,
+        password=args.password
+    )
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    started = time.monotonic()
+
+    with db.get_cursor(query_name='next_ids') as cursor:
+        ids = next_ids(cursor)
+    user_range = (ids['users'], ids['users'] + args.users)
+
+    if args.no_triggers:
+        set_triggers(db, False)
+    try:
+        generate_users(db, args, rng, ids, now)
+        generate_social(db, args, rng, ids, user_range, now)
+    finally:
+        with db.get_cursor(query_name='set_sequences') as cursor:
+            set_sequences(cursor, ids)
+        if args.no_triggers:
+            set_triggers(db, True)
+
+    # Profile counters were applied by trigger as rounds were loaded (or
+    # not at all with --no-triggers); recompute them either way
+    print("Rebuilding user statistics...")
+    db.rebuild_all_user_statistics()
+    if args.no_triggers:
+        db.rebuild_leaderboard_buckets()
+        db.rebuild_friend_edges()
+    # Maintained by send_message and accept_friend_request, which COPY bypasses
+    db.rebuild_unread_counters()
+    db.rebuild_friend_suggestions()
+
+    with db.get_cursor(query_name='analyze') as cursor:
+        cursor.execute("ANALYZE")
+    print(f"\nFinished in {time.monotonic() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+MAX_LEVELS = 32
+
+# Boards kept per game mode ('all' is every mode) and time window
+MODES = ('all', 'tournament', 'freeplay', 'web')
+WINDOWS = ('daily', 'weekly', 'all_time')
+
+
+class _Node:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, height):
+        self.key = key
+        self.value = value
+        self.next = [None] * height
+        # width[level]: number of positions to the next node on that level
+        self.width = [1] * height
+
+
+class SkipList:
+    """
+    Indexable skip list: ordered by key, with O(log n) insert, remove,
+    rank (number of smaller keys) and lookup by position.
+    """
+
+    def __init__(self):
+        self.head = _Node(None, None, MAX_LEVELS)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _predecessors(self, key):
+        """Last node before key on every level, and its position"""
+        chain = [None] * MAX_LEVELS
+        positions = [0] * MAX_LEVELS
+        node = self.head
+        position = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key, value):
+        chain, positions = self._predecessors(key)
+        height = 1
+        while height < MAX_LEVELS and random.random() < 0.5:
+            height += 1
+
+        node = _Node(key, value, height)
+        position = positions[0] + 1
+        for level in range(height):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = positions[level] + prev.width[level] - position + 1
+            prev.width[level] = position - positions[level]
+        for level in range(height, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        """Remove key. Returns False if it is not in the list"""
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            return False
+
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+        return True
+
+    def count_less(self, key):
+        """Number of keys smaller than key"""
+        node = self.head
+        position = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def iter_from(self, index):
+        """Values from position index (0-based) onwards"""
+        if index < 0:
+            index = 0
+        if index >= self.size:
+            return
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+
+def _key(final_money, leaderboard_id):
+    # Best first: highest final_money, then newest entry, as the SQL keyset order
+    return (-final_money, -leaderboard_id)
+
+
+def _money(value):
+    # final_money is NUMERIC(10, 2); floats from the API would not compare
+    # equal to the stored value
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _score_key(score):
+    # Sorts before every entry with final_money == score
+    return (-_money(score), float('-inf'))
+
+
+def period_start(window, moment):
+    """Start of the daily/weekly period containing moment (None for all_time)"""
+    if window == 'all_time':
+        return None
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == 'daily':
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+class Board:
+    """One ranked leaderboard: the entries of one mode and period"""
+
+    def __init__(self, period_start=None):
+        self.period_start = period_start
+        self.entries = SkipList()
+        self.best_by_user = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def accepts(self, entry):
+        if self.period_start is None:
+            return True
+        return entry.get('recorded_at') is not None and entry['recorded_at'] >= self.period_start
+
+    def insert(self, entry):
+        key = _key(entry['final_money'], entry['leaderboard_id'])
+        self.entries.insert(key, entry)
+        best = self.best_by_user.get(entry['user_id'])
+        if best is None or key < _key(best['final_money'], best['leaderboard_id']):
+            self.best_by_user[entry['user_id']] = entry
+
+    def _ranked(self, index, limit):
+        """Up to limit entries from position index, each with its rank"""
+        rows = []
+        for entry in self.entries.iter_from(index):
+            if len(rows) >= limit:
+                break
+            if rows and entry['final_money'] == rows[-1]['final_money']:
+                rank = rows[-1]['rank']
+            elif rows:
+                rank = index + len(rows) + 1
+            else:
+                rank = self.entries.count_less(_score_key(entry['final_money'])) + 1
+            rows.append(dict(entry, rank=rank))
+        return rows
+
+    def top(self, limit=10, after_money=None, after_id=None):
+        index = 0
+        if after_money is not None and after_id is not None:
+            # Position just past the cursor entry
+            index = self.entries.count_less(_key(_money(after_money), after_id - 0.5))
+        return self._ranked(index, limit)
+
+    def around(self, user_id, radius=5):
+        best = self.best_by_user.get(user_id)
+        if best is None:
+            return None
+        index = self.entries.count_less(_key(best['final_money'], best['leaderboard_id']))
+        start = max(0, index - radius)
+        return self._ranked(start, index - start + radius + 1)
+
+    def rank_of_score(self, score):
+        return self.entries.count_less(_score_key(score)) + 1
+
+    def rank_of_user(self, user_id):
+        best = self.best_by_user.get(user_id)
+        if best is None:
+            return None
+        return {
+            'rank': self.rank_of_score(best['final_money']),
+            'score': best['final_money'],
+            'leaderboard_id': best['leaderboard_id'],
+        }
+
+
+class LeaderboardIndex:
+    """
+    Process-resident ranked copies of the leaderboard table: one Board per
+    game mode and daily/weekly/all-time window, filled as entries arrive.
+    Daily and weekly boards start empty at each period boundary.
+
+    Loaded in leaderboard_id batches, then kept current by
+    add() (write-through from DatabaseHelper.add_to_leaderboard) and by
+    refresh(), which picks up entries written by other processes.
+    refresh() only looks past the highest leaderboard_id it has seen, so
+    entries committed out of id order, and deletions, are caught by the
+    periodic full reload instead.
+    Ranks match SQL RANK() over final_money DESC.
+    """
+
+    def __init__(self, db, refresh_interval=5.0, reload_interval=300.0, batch_size=10000,
+                 clock=datetime.now):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.batch_size = batch_size
+        # Same clock as leaderboard.recorded_at (CURRENT_TIMESTAMP, server local time)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.boards = self._new_boards()
+        self.by_id = {}
+        self.max_id = 0
+        self.loaded_at = 0.0
+        self.thread = None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def _new_boards(self):
+        now = self.clock()
+        return {(mode, window): Board(period_start(window, now))
+                for mode in MODES for window in WINDOWS}
+
+    def _rotate(self, boards):
+        """Replace daily/weekly boards whose period has ended"""
+        now = self.clock()
+        for (mode, window), board in boards.items():
+            if board.period_start is not None:
+                start = period_start(window, now)
+                if start != board.period_start:
+                    boards[(mode, window)] = Board(start)
+
+    def _insert(self, boards, by_id, entry):
+        if entry['leaderboard_id'] in by_id:
+            return
+        by_id[entry['leaderboard_id']] = entry
+        for mode in ('all', entry.get('game_mode')):
+            for window in WINDOWS:
+                board = boards.get((mode, window))
+                if board is not None and board.accepts(entry):
+                    board.insert(entry)
+
+    def board(self, mode='all', window='all_time'):
+        """The current Board for a mode and window. Call with the lock held"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown game mode: {mode}")
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window: {window}")
+        self._rotate(self.boards)
+        return self.boards[(mode, window)]
+
+    def _fetch_after(self, after_id):
+        """Entries with leaderboard_id > after_id, in batches"""
+        while True:
+            rows = self.db.get_leaderboard_entries_after(after_id, self.batch_size)
+            for row in rows:
+                yield dict(row)
+            if len(rows) < self.batch_size:
+                return
+            after_id = rows[-1]['leaderboard_id']
+
+    def load(self):
+        """Rebuild the index from the leaderboard table"""
+        boards, by_id = self._new_boards(), {}
+        max_id = 0
+        started = time.monotonic()
+        for entry in self._fetch_after(0):
+            self._insert(boards, by_id, entry)
+            max_id = entry['leaderboard_id']
+
+        with self.lock:
+            # Keep write-through entries added while loading
+            for leaderboard_id, entry in self.by_id.items():
+                if leaderboard_id > max_id:
+                    self._insert(boards, by_id, entry)
+            self._rotate(boards)
+            self.boards, self.by_id = boards, by_id
+            self.max_id = max(self.max_id, max_id)
+            self.loaded_at = time.monotonic()
+        logger.info("Loaded %d leaderboard entries in %.2fs",
+                    len(by_id), time.monotonic() - started)
+
+    def refresh(self):
+        """Add entries written since the last load or refresh. Returns entries added"""
+        added = 0
+        for entry in self._fetch_after(self.max_id):
+            with self.lock:
+                if entry['leaderboard_id'] not in self.by_id:
+                    self._rotate(self.boards)
+                    self._insert(self.boards, self.by_id, entry)
+                    added += 1
+                self.max_id = max(self.max_id, entry['leaderboard_id'])
+        return added
+
+    def add(self, entry):
+        """Add a newly committed entry (leaderboard row plus username and game_mode)"""
+        with self.lock:
+            self._rotate(self.boards)
+            self._insert(self.boards, self.by_id, dict(entry))
+
+    def top(self, limit=10, after_money=None, after_id=None, mode='all', window='all_time'):
+        """Page of entries, best first; same paging as DatabaseHelper.get_leaderboard"""
+        with self.lock:
+            return self.board(mode, window).top(limit, after_money, after_id)
+
+    def around(self, user_id, radius=5, mode='all', window='all_time'):
+        """
+        Entries around a user's best entry: radius above and below it.
+        Returns: list of entries, or None if the user has no entries
+        """
+        with self.lock:
+            return self.board(mode, window).around(user_id, radius)
+
+    def rank_of_score(self, score, mode='all', window='all_time'):
+        """RANK() a score would get: 1 + entries with a higher final_money"""
+        with self.lock:
+            return self.board(mode, window).rank_of_score(score)
+
+    def rank_of_user(self, user_id, mode='all', window='all_time'):
+        """
+        Rank of a user's best entry.
+        Returns: {'rank': int, 'score': Decimal, 'leaderboard_id': int} or None
+        """
+        with self.lock:
+            return self.board(mode, window).rank_of_user(user_id)
+
+    def start(self):
+        """Load the index and keep it reconciled on a background thread"""
+        self.load()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                if time.monotonic() - self.loaded_at >= self.reload_interval:
+                    self.load()
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception("Leaderboard index reconcile failed")
@@ -0,0 +1,82 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+# Cost factors allowed for the bcrypt_rounds setting: below 10 a hash is
+# cheap to brute force, above 15 a single login takes seconds of CPU
+MIN_ROUNDS, MAX_ROUNDS = 10, 15
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has max_pending jobs waiting"""
+
+
+def hash_rounds(hashed_password):
+    """Cost factor of a bcrypt hash ('$2b$12$...' -> 12), or None if unreadable"""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _hashpw(password, salt):
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool.
+
+    At most `workers` hashes run at once, so a burst of logins cannot take
+    every CPU; up to `max_pending` more wait their turn, and beyond that
+    hash()/verify() raise HasherBusy straight away instead of queueing.
+    The cost factor comes from `rounds`, a number or a callable returning
+    one (read on every hash, so it can follow a setting), kept within
+    MIN_ROUNDS..MAX_ROUNDS.
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=None, max_pending=32):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 4
+        self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix='password-hasher')
+        self.slots = threading.BoundedSemaphore(self.workers + max_pending)
+
+    def current_rounds(self):
+        rounds = self.rounds() if callable(self.rounds) else self.rounds
+        return min(max(int(rounds), MIN_ROUNDS), MAX_ROUNDS)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on the pool without waiting. Returns its Future"""
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def hash(self, password):
+        """bcrypt hash of password at the current cost factor"""
+        return self.hash_async(password).result()
+
+    def hash_async(self, password):
+        """Like hash(), but returns a Future of the hash instead of waiting"""
+        return self.submit(_hashpw, password, bcrypt.gensalt(self.current_rounds()))
+
+    def verify(self, password, hashed_password):
+        """Check password against a bcrypt hash"""
+        return self.submit(bcrypt.checkpw, password.encode('utf-8'),
+                           hashed_password.encode('utf-8')).result()
+
+    def needs_rehash(self, hashed_password):
+        """True if the hash was made with a different cost factor than the current one"""
+        return hash_rounds(hashed_password) != self.current_rounds()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
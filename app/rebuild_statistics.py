@@ -0,0 +1,30 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.database import DatabaseHelper
+
+# Recompute the incrementally maintained user statistics, leaderboard
+# score buckets, unread message counters, friend edges and friend
+# suggestions from scratch.
+# Usage: python rebuild_statistics.py [user_id]
+db = DatabaseHelper(
+    host='localhost',
+    port=5432,
+    database='blackjack_db',
+    user='postgres',
+    password='1234'
+)
+
+if len(sys.argv) > 1:
+    db.update_user_statistics(int(sys.argv[1]))
+    print(f"Rebuilt statistics for user {sys.argv[1]}.")
+else:
+    updated = db.rebuild_all_user_statistics()
+    print(f"Rebuilt statistics for {updated} users.")
+    buckets = db.rebuild_leaderboard_buckets()
+    print(f"Rebuilt {buckets} leaderboard score buckets.")
+    counters = db.rebuild_unread_counters()
+    print(f"Rebuilt {counters} unread message counters.")
+    edges = db.rebuild_friend_edges()
+    print(f"Rebuilt {edges} friend edges.")
+    suggestions = db.rebuild_friend_suggestions()
+    print(f"Rebuilt {suggestions} friend suggestions.")
@@ -18,6 +18,7 @@ CREATE TABLE users (
 
 CREATE INDEX idx_username ON users(username);
 CREATE INDEX idx_email ON users(email);
+CREATE INDEX idx_users_games_played ON users(total_games_played DESC, user_id);
 
 -- ============================================
 -- USER PROFILES TABLE
@@ -30,18 +31,36 @@ CREATE TABLE user_profiles (
     avatar_url VARCHAR(255),
     total_winnings DECIMAL(10, 2) DEFAULT 0.00,
     total_losses DECIMAL(10, 2) DEFAULT 0.00,
+    -- Highest balance held, never below this starting value
+    -- (DatabaseHelper.PROFILE_START_BALANCE)
     highest_balance DECIMAL(10, 2) DEFAULT 1000.00,
     longest_win_streak INT DEFAULT 0,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- ============================================
+-- AUTH SESSIONS TABLE
+-- Login sessions shared by every API process (session_store.PostgresSessionStore)
+-- ============================================
+CREATE TABLE auth_sessions (
+    -- sha256 hex digest of the token (session_store.token_hash); tokens are not stored
+    token_hash CHAR(64) PRIMARY KEY,
+    user_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Expired session cleanup
+CREATE INDEX idx_as_expires ON auth_sessions(expires_at);
+
 -- ============================================
 -- GAME SESSIONS TABLE
 -- ============================================
 CREATE TABLE game_sessions (
     session_id SERIAL PRIMARY KEY,
     user_id INT NOT NULL,
-    game_mode VARCHAR(20) NOT NULL CHECK (game_mode IN ('tournament', 'freeplay')),
+    game_mode VARCHAR(20) NOT NULL CHECK (game_mode IN ('tournament', 'freeplay', 'web')),
     starting_money DECIMAL(10, 2) DEFAULT 1000.00,
     current_money DECIMAL(10, 2) NOT NULL,
     rounds_completed INT DEFAULT 0,
@@ -53,13 +72,18 @@ CREATE TABLE game_sessions (
 );
 
 CREATE INDEX idx_user_status ON game_sessions(user_id, status);
+-- Admin session listing, newest first (keyset paging)
+CREATE INDEX idx_gs_started ON game_sessions(started_at DESC, session_id DESC);
 
 -- ============================================
 -- GAME STATES TABLE (for saving mid-round)
 -- ============================================
+-- One row per session, updated in place on every save. The deck is stored
+-- as its shuffle seed and position, hands as lists of card codes. The lower
+-- fillfactor leaves room for HOT updates.
 CREATE TABLE game_states (
     state_id SERIAL PRIMARY KEY,
-    session_id INT NOT NULL,
+    session_id INT UNIQUE NOT NULL,
     round_number INT NOT NULL,
     player_hand JSON NOT NULL,
     dealer_hand JSON NOT NULL,
@@ -68,9 +92,7 @@ CREATE TABLE game_states (
     game_phase VARCHAR(20) NOT NULL CHECK (game_phase IN ('betting', 'player_turn', 'dealer_turn', 'complete')),
     saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (session_id) REFERENCES game_sessions(session_id) ON DELETE CASCADE
-);
-
-CREATE INDEX idx_gs_session ON game_states(session_id);
+) WITH (fillfactor = 70);
 
 -- ============================================
 -- GAME ROUNDS TABLE (individual hand history)
@@ -93,6 +115,87 @@ CREATE TABLE game_rounds (
 
 CREATE INDEX idx_session_round ON game_rounds(session_id, round_number);
 
+-- ============================================
+-- USER ROUND STATS TABLE (rollup behind the user_statistics view)
+-- Kept current by triggers on game_sessions and game_rounds
+-- ============================================
+CREATE TABLE user_round_stats (
+    user_id INT PRIMARY KEY,
+    total_sessions INT NOT NULL DEFAULT 0,
+    rounds_played INT NOT NULL DEFAULT 0,
+    rounds_won INT NOT NULL DEFAULT 0,
+    rounds_lost INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE FUNCTION count_new_sessions() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_round_stats (user_id, total_sessions)
+    SELECT user_id, COUNT(*)
+    FROM new_sessions
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET total_sessions = user_round_stats.total_sessions + EXCLUDED.total_sessions;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_count_new_sessions
+AFTER INSERT ON game_sessions
+REFERENCING NEW TABLE AS new_sessions
+FOR EACH STATEMENT EXECUTE FUNCTION count_new_sessions();
+
+CREATE FUNCTION count_new_rounds() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_round_stats (user_id, rounds_played, rounds_won, rounds_lost)
+    SELECT gs.user_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE r.result = 'win'),
+           COUNT(*) FILTER (WHERE r.result = 'loss')
+    FROM new_rounds r
+    JOIN game_sessions gs ON gs.session_id = r.session_id
+    GROUP BY gs.user_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET rounds_played = user_round_stats.rounds_played + EXCLUDED.rounds_played,
+        rounds_won = user_round_stats.rounds_won + EXCLUDED.rounds_won,
+        rounds_lost = user_round_stats.rounds_lost + EXCLUDED.rounds_lost;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_count_new_rounds
+AFTER INSERT ON game_rounds
+REFERENCING NEW TABLE AS new_rounds
+FOR EACH STATEMENT EXECUTE FUNCTION count_new_rounds();
+
+-- Profile totals follow the rounds actually written, including batches
+-- from the write-behind buffer (DatabaseHelper._rebuild_statistics is the
+-- same rule computed from scratch)
+CREATE FUNCTION apply_new_rounds() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE user_profiles up
+    SET total_winnings = up.total_winnings + d.winnings,
+        total_losses = up.total_losses + d.losses,
+        highest_balance = GREATEST(up.highest_balance, d.highest_balance)
+    FROM (
+        SELECT gs.user_id,
+               SUM(GREATEST(r.winnings, 0)) as winnings,
+               SUM(GREATEST(-r.winnings, 0)) as losses,
+               MAX(r.balance_after) as highest_balance
+        FROM new_rounds r
+        JOIN game_sessions gs ON gs.session_id = r.session_id
+        GROUP BY gs.user_id
+    ) d
+    WHERE up.user_id = d.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_apply_new_rounds
+AFTER INSERT ON game_rounds
+REFERENCING NEW TABLE AS new_rounds
+FOR EACH STATEMENT EXECUTE FUNCTION apply_new_rounds();
+
 -- ============================================
 -- LEADERBOARD TABLE
 -- ============================================
@@ -100,6 +203,7 @@ CREATE TABLE leaderboard (
     leaderboard_id SERIAL PRIMARY KEY,
     user_id INT NOT NULL,
     session_id INT NOT NULL,
+    game_mode VARCHAR(20) NOT NULL CHECK (game_mode IN ('tournament', 'freeplay', 'web')),
     final_money DECIMAL(10, 2) NOT NULL,
     rounds_completed INT NOT NULL,
     profit DECIMAL(10, 2) NOT NULL,
@@ -109,8 +213,71 @@ CREATE TABLE leaderboard (
     FOREIGN KEY (session_id) REFERENCES game_sessions(session_id) ON DELETE CASCADE
 );
 
-CREATE INDEX idx_lb_final_money ON leaderboard(final_money DESC);
-CREATE INDEX idx_lb_user ON leaderboard(user_id);
+-- Keyset paging order: (final_money, leaderboard_id) descending
+CREATE INDEX idx_lb_final_money ON leaderboard(final_money DESC, leaderboard_id DESC);
+-- Best entry per user (friends leaderboard) without sorting their entries
+CREATE INDEX idx_lb_user ON leaderboard(user_id, final_money DESC, leaderboard_id DESC);
+
+-- ============================================
+-- LEADERBOARD SCORE BUCKETS TABLE
+-- Entry counts per $10 score band, kept current by trigger, so a rank
+-- lookup sums the bands above a score and only scans the rows of its own band
+-- ============================================
+CREATE TABLE leaderboard_score_buckets (
+    bucket INT PRIMARY KEY,
+    entries BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE FUNCTION leaderboard_bucket(score DECIMAL) RETURNS INT AS $$
+    SELECT FLOOR(score / 10)::INT
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE FUNCTION count_leaderboard_buckets() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO leaderboard_score_buckets (bucket, entries)
+        SELECT leaderboard_bucket(final_money), COUNT(*)
+        FROM new_entries
+        GROUP BY 1
+        ON CONFLICT (bucket) DO UPDATE
+        SET entries = leaderboard_score_buckets.entries + EXCLUDED.entries;
+    ELSE
+        UPDATE leaderboard_score_buckets b
+        SET entries = b.entries - d.entries
+        FROM (
+            SELECT leaderboard_bucket(final_money) as bucket, COUNT(*) as entries
+            FROM old_entries
+            GROUP BY 1
+        ) d
+        WHERE b.bucket = d.bucket;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_leaderboard_buckets_insert
+AFTER INSERT ON leaderboard
+REFERENCING NEW TABLE AS new_entries
+FOR EACH STATEMENT EXECUTE FUNCTION count_leaderboard_buckets();
+
+CREATE TRIGGER trg_leaderboard_buckets_delete
+AFTER DELETE ON leaderboard
+REFERENCING OLD TABLE AS old_entries
+FOR EACH STATEMENT EXECUTE FUNCTION count_leaderboard_buckets();
+
+-- RANK() of a score: 1 + number of entries with a strictly higher final_money
+CREATE FUNCTION leaderboard_rank(score DECIMAL) RETURNS BIGINT AS $$
+    SELECT 1
+        + COALESCE((
+            SELECT SUM(entries) FROM leaderboard_score_buckets
+            WHERE bucket > leaderboard_bucket(score)
+        ), 0)
+        + (
+            SELECT COUNT(*) FROM leaderboard
+            WHERE final_money > score
+              AND final_money < (leaderboard_bucket(score) + 1) * 10
+        )
+$$ LANGUAGE SQL STABLE;
 
 -- ============================================
 -- FRIENDSHIPS TABLE
@@ -124,13 +291,96 @@ CREATE TABLE friendships (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (friend_id) REFERENCES users(user_id) ON DELETE CASCADE,
-    UNIQUE (user_id, friend_id),
     CHECK (user_id != friend_id)
 );
 
+-- At most one friendship per pair of users, whichever of them asked
+CREATE UNIQUE INDEX idx_f_pair ON friendships(LEAST(user_id, friend_id), GREATEST(user_id, friend_id));
 CREATE INDEX idx_f_user_status ON friendships(user_id, status);
 CREATE INDEX idx_f_friend_status ON friendships(friend_id, status);
 
+-- ============================================
+-- FRIEND EDGES TABLE
+-- Accepted friendships in both directions, so friend lookups are a single
+-- primary key range read. Kept current by trigger on friendships.
+-- ============================================
+CREATE TABLE friend_edges (
+    user_id INT NOT NULL,
+    friend_id INT NOT NULL,
+    friendship_id INT NOT NULL,
+    created_at TIMESTAMP,
+    PRIMARY KEY (user_id, friend_id),
+    FOREIGN KEY (friendship_id) REFERENCES friendships(friendship_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_fe_friendship ON friend_edges(friendship_id);
+
+CREATE FUNCTION sync_friend_edges() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'accepted' THEN
+        DELETE FROM friend_edges WHERE friendship_id = OLD.friendship_id;
+        IF TG_OP = 'DELETE' OR NEW.status <> 'accepted' THEN
+            PERFORM remove_mutual_friend_counts(OLD.user_id, OLD.friend_id);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'accepted' THEN
+        INSERT INTO friend_edges (user_id, friend_id, friendship_id, created_at)
+        VALUES (NEW.user_id, NEW.friend_id, NEW.friendship_id, NEW.created_at),
+               (NEW.friend_id, NEW.user_id, NEW.friendship_id, NEW.created_at)
+        ON CONFLICT (user_id, friend_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_sync_friend_edges
+AFTER INSERT OR DELETE OR UPDATE OF status, user_id, friend_id ON friendships
+FOR EACH ROW EXECUTE FUNCTION sync_friend_edges();
+
+-- ============================================
+-- FRIEND SUGGESTIONS TABLE
+-- Friends-of-friends with their mutual friend count, raised by
+-- DatabaseHelper.accept_friend_request and lowered by sync_friend_edges
+-- when a friendship ends (rejected, deleted, or a user deleted)
+-- ============================================
+CREATE TABLE friend_suggestions (
+    user_id INT NOT NULL,
+    candidate_id INT NOT NULL,
+    mutual_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, candidate_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (candidate_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_fs_ranked ON friend_suggestions(user_id, mutual_count DESC, candidate_id);
+
+-- a and b are no longer friends (their edges are already gone): b stops
+-- being a mutual friend of a and each of b's friends, and the other way
+-- round. The inverse of DatabaseHelper._add_mutual_friend_counts, under
+-- the same per-user advisory locks (DatabaseHelper.FRIEND_LOCK_SPACE = 1).
+CREATE FUNCTION remove_mutual_friend_counts(a INT, b INT) RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(1, LEAST(a, b));
+    PERFORM pg_advisory_xact_lock(1, GREATEST(a, b));
+    UPDATE friend_suggestions s
+    SET mutual_count = s.mutual_count - 1
+    FROM (
+        SELECT a as user_id, friend_id as candidate_id
+        FROM friend_edges WHERE user_id = b AND friend_id <> a
+        UNION ALL
+        SELECT friend_id, a
+        FROM friend_edges WHERE user_id = b AND friend_id <> a
+        UNION ALL
+        SELECT b, friend_id
+        FROM friend_edges WHERE user_id = a AND friend_id <> b
+        UNION ALL
+        SELECT friend_id, b
+        FROM friend_edges WHERE user_id = a AND friend_id <> b
+    ) pairs
+    WHERE s.user_id = pairs.user_id AND s.candidate_id = pairs.candidate_id;
+END;
+$$ LANGUAGE plpgsql;
+
 -- ============================================
 -- MESSAGES TABLE
 -- ============================================
@@ -141,12 +391,31 @@ CREATE TABLE messages (
     message_text TEXT NOT NULL,
     is_read BOOLEAN DEFAULT FALSE,
     sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Canonical conversation key: the same for both directions
+    user_low INT GENERATED ALWAYS AS (LEAST(sender_id, receiver_id)) STORED,
+    user_high INT GENERATED ALWAYS AS (GREATEST(sender_id, receiver_id)) STORED,
     FOREIGN KEY (sender_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (receiver_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
 CREATE INDEX idx_m_receiver_read ON messages(receiver_id, is_read);
-CREATE INDEX idx_m_conversation ON messages(sender_id, receiver_id, sent_at);
+-- Conversation pages, newest first (keyset paging)
+CREATE INDEX idx_m_conversation ON messages(user_low, user_high, sent_at DESC, message_id DESC);
+
+-- ============================================
+-- UNREAD COUNTERS TABLE
+-- Unread messages per (receiver, sender), maintained by
+-- DatabaseHelper.send_message and mark_messages_read
+-- ============================================
+CREATE TABLE unread_counters (
+    receiver_id INT NOT NULL,
+    sender_id INT NOT NULL,
+    unread_count INT NOT NULL DEFAULT 0,
+    last_message_at TIMESTAMP,
+    PRIMARY KEY (receiver_id, sender_id),
+    FOREIGN KEY (receiver_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (sender_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
 
 -- ============================================
 -- ADMIN LOGS TABLE
@@ -165,6 +434,8 @@ CREATE TABLE admin_logs (
 
 CREATE INDEX idx_al_admin_time ON admin_logs(admin_id, performed_at);
 CREATE INDEX idx_al_action_type ON admin_logs(action_type);
+-- Admin log listing, newest first (keyset paging)
+CREATE INDEX idx_al_performed ON admin_logs(performed_at DESC, log_id DESC);
 
 -- ============================================
 -- GAME SETTINGS TABLE (for admin configuration)
@@ -179,6 +450,22 @@ CREATE TABLE game_settings (
     FOREIGN KEY (updated_by) REFERENCES users(user_id) ON DELETE SET NULL
 );
 
+-- Tell listening processes to drop their cached settings
+CREATE FUNCTION notify_game_settings_changed() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('game_settings_changed', OLD.setting_key);
+    ELSE
+        PERFORM pg_notify('game_settings_changed', NEW.setting_key);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_game_settings_changed
+AFTER INSERT OR UPDATE OR DELETE ON game_settings
+FOR EACH ROW EXECUTE FUNCTION notify_game_settings_changed();
+
 -- ============================================
 -- Insert Default Game Settings
 -- ============================================
@@ -187,28 +474,34 @@ INSERT INTO game_settings (setting_key, setting_value, description) VALUES
 ('tournament_rounds', '10', 'Number of rounds in tournament mode'),
 ('blackjack_payout', '1.5', 'Payout multiplier for blackjack'),
 ('min_bet', '10', 'Minimum bet amount'),
-('max_bet', '500', 'Maximum bet amount');
+('max_bet', '500', 'Maximum bet amount'),
+('num_decks', '1', 'Number of decks in the shoe'),
+('shoe_penetration', '0.75', 'Fraction of the shoe dealt before reshuffling'),
+('bcrypt_rounds', '12', 'bcrypt cost factor for password hashes, 10-15 (passwords are rehashed on login)');
 
 -- ============================================
 -- Create Views for Common Queries
 -- ============================================
 
--- Top 10 Leaderboard View
+-- Leaderboard View
+-- No window function or LIMIT here, so callers' keyset conditions and
+-- LIMIT reach idx_lb_final_money; ranks come from leaderboard_rank()
 CREATE VIEW top_leaderboard AS
 SELECT 
     l.leaderboard_id,
+    l.user_id,
     u.username,
+    l.game_mode,
     l.final_money,
     l.profit,
     l.rounds_completed,
-    l.recorded_at,
-    RANK() OVER (ORDER BY l.final_money DESC) as rank
+    l.recorded_at
 FROM leaderboard l
-JOIN users u ON l.user_id = u.user_id
-ORDER BY l.final_money DESC
-LIMIT 10;
+JOIN users u ON l.user_id = u.user_id;
 
 -- User Statistics View
+-- Reads the user_round_stats rollup instead of aggregating every round;
+-- sorting by total_games_played uses idx_users_games_played
 CREATE VIEW user_statistics AS
 SELECT 
     u.user_id,
@@ -217,18 +510,13 @@ SELECT
     up.total_losses,
     up.highest_balance,
     u.total_games_played,
-    COUNT(DISTINCT gs.session_id) as total_sessions,
-    COUNT(DISTINCT CASE WHEN gr.result = 'win' THEN gr.round_id END) as rounds_won,
-    COUNT(DISTINCT CASE WHEN gr.result = 'loss' THEN gr.round_id END) as rounds_lost,
-    ROUND(
-        COUNT(DISTINCT CASE WHEN gr.result = 'win' THEN gr.round_id END) * 100.0 / 
-        NULLIF(COUNT(DISTINCT gr.round_id), 0), 2
-    ) as win_percentage
+    COALESCE(s.total_sessions, 0) as total_sessions,
+    COALESCE(s.rounds_won, 0) as rounds_won,
+    COALESCE(s.rounds_lost, 0) as rounds_lost,
+    ROUND(s.rounds_won * 100.0 / NULLIF(s.rounds_played, 0), 2) as win_percentage
 FROM users u
 LEFT JOIN user_profiles up ON u.user_id = up.user_id
-LEFT JOIN game_sessions gs ON u.user_id = gs.user_id
-LEFT JOIN game_rounds gr ON gs.session_id = gr.session_id
-GROUP BY u.user_id, u.username, up.total_winnings, up.total_losses, up.highest_balance, u.total_games_played;
+LEFT JOIN user_round_stats s ON u.user_id = s.user_id;
 
 -- Active Friends View
 CREATE VIEW active_friends AS
@@ -0,0 +1,240 @@
+import hashlib
+import heapq
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def token_hash(session_token):
+    """sha256 hex digest of a session token, the key the shared backends store"""
+    return hashlib.sha256(session_token.encode('utf-8')).hexdigest()
+
+
+class _Stripe:
+    __slots__ = ('lock', 'sessions', 'expiries')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}  # {session_token: {'user_id': int, 'expires': datetime}}
+        self.expiries = []  # min-heap of (expires, session_token)
+
+
+class MemorySessionStore:
+    """
+    Sessions in memory, local to this process.
+    Every worker has its own sessions and a restart logs everyone out;
+    use PostgresSessionStore when running more than one API process.
+
+    Tokens are spread over `stripes` independently locked dicts, so request
+    threads rarely wait on each other. Each stripe keeps a min-heap of
+    expiry times: cleanup pops only the expired entries, O(expired log n),
+    and holds a stripe lock for at most sweep_batch of them at a time.
+    Heap entries of logged-out sessions are skipped when they come due.
+    """
+
+    def __init__(self, stripes=16, sweep_batch=1000):
+        self.stripes = [_Stripe() for _ in range(stripes)]
+        self.sweep_batch = sweep_batch
+
+    def __len__(self):
+        return sum(len(stripe.sessions) for stripe in self.stripes)
+
+    def _stripe(self, session_token):
+        return self.stripes[hash(session_token) % len(self.stripes)]
+
+    def create(self, session_token, user_id, expires):
+        stripe = self._stripe(session_token)
+        with stripe.lock:
+            stripe.sessions[session_token] = {'user_id': user_id, 'expires': expires}
+            heapq.heappush(stripe.expiries, (expires, session_token))
+
+    def get(self, session_token):
+        """Session dict ({'user_id', 'expires'}), or None"""
+        # A single dict lookup is atomic; no lock needed
+        return self._stripe(session_token).sessions.get(session_token)
+
+    def delete(self, session_token):
+        """Returns True if the session existed"""
+        stripe = self._stripe(session_token)
+        with stripe.lock:
+            return stripe.sessions.pop(session_token, None) is not None
+
+    def _sweep_stripe(self, stripe, now):
+        removed = 0
+        while True:
+            with stripe.lock:
+                for _ in range(self.sweep_batch):
+                    if not stripe.expiries or stripe.expiries[0][0] >= now:
+                        return removed
+                    expires, token = heapq.heappop(stripe.expiries)
+                    session = stripe.sessions.get(token)
+                    # Skip logged-out tokens and superseded heap entries
+                    if session is not None and session['expires'] == expires:
+                        del stripe.sessions[token]
+                        removed += 1
+
+    def cleanup_expired(self, now=None):
+        """Remove expired sessions. Returns the number removed"""
+        now = now or datetime.now()
+        return sum(self._sweep_stripe(stripe, now) for stripe in self.stripes)
+
+
+class _CacheStripe:
+    __slots__ = ('lock', 'entries')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # {session_token: (session, cached_at)}, oldest use first
+
+
+class CachedSessionStore:
+    """
+    Base for shared session stores: sessions live in a backend (_save,
+    _load, _remove, _remove_expired) and recently used ones are also kept
+    in a local LRU cache, so validating an active session does not touch
+    the backend. A logout on another process is seen here after at most
+    cache_ttl seconds.
+
+    Like MemorySessionStore, the cache is split over `stripes` independently
+    locked LRUs of cache_size / stripes entries each, so concurrent requests
+    only contend when their tokens land on the same stripe.
+
+    Backends are given token_hash(session_token), never the token itself,
+    so a leaked table or database dump cannot be replayed as logins.
+    """
+
+    def __init__(self, cache_ttl=30.0, cache_size=100000, stripes=16):
+        self.cache_ttl = cache_ttl
+        self.cache_stripes = [_CacheStripe() for _ in range(stripes)]
+        self.stripe_size = max(1, -(-cache_size // stripes))
+
+    def _cache_stripe(self, session_token):
+        return self.cache_stripes[hash(session_token) % len(self.cache_stripes)]
+
+    def _cache_put(self, session_token, session):
+        stripe = self._cache_stripe(session_token)
+        with stripe.lock:
+            stripe.entries[session_token] = (session, time.monotonic())
+            stripe.entries.move_to_end(session_token)
+            while len(stripe.entries) > self.stripe_size:
+                stripe.entries.popitem(last=False)
+
+    def _cache_drop(self, session_token):
+        stripe = self._cache_stripe(session_token)
+        with stripe.lock:
+            stripe.entries.pop(session_token, None)
+
+    def create(self, session_token, user_id, expires):
+        self._save(token_hash(session_token), user_id, expires)
+        self._cache_put(session_token, {'user_id': user_id, 'expires': expires})
+
+    def get(self, session_token):
+        """Session dict ({'user_id', 'expires'}), or None"""
+        stripe = self._cache_stripe(session_token)
+        with stripe.lock:
+            cached = stripe.entries.get(session_token)
+            if cached and time.monotonic() - cached[1] < self.cache_ttl:
+                stripe.entries.move_to_end(session_token)
+                return cached[0]
+
+        session = self._load(token_hash(session_token))
+        if session is None:
+            self._cache_drop(session_token)
+        else:
+            self._cache_put(session_token, session)
+        return session
+
+    def delete(self, session_token):
+        """Returns True if the session existed"""
+        self._cache_drop(session_token)
+        return self._remove(token_hash(session_token))
+
+    def cleanup_expired(self, now=None):
+        """
+        Remove expired sessions from the backend. Returns the number removed.
+        Expired sessions still cached are dropped by AuthManager.validate_session
+        or pushed out of the LRU cache.
+        """
+        return self._remove_expired(now or datetime.now())
+
+
+class PostgresSessionStore(CachedSessionStore):
+    """Sessions in the auth_sessions table, shared by every process"""
+
+    def __init__(self, db, cache_ttl=30.0, cache_size=100000, stripes=16):
+        super().__init__(cache_ttl, cache_size, stripes)
+        self.db = db
+
+    def _save(self, key, user_id, expires):
+        self.db.create_auth_session(key, user_id, expires)
+
+    def _load(self, key):
+        row = self.db.get_auth_session(key)
+        if row is None:
+            return None
+        return {'user_id': row['user_id'], 'expires': row['expires_at']}
+
+    def _remove(self, key):
+        return self.db.delete_auth_session(key)
+
+    def _remove_expired(self, now):
+        return self.db.delete_expired_auth_sessions(now)
+
+
+class SQLiteSessionStore(CachedSessionStore):
+    """
+    Sessions in a local SQLite file: survives restarts and is shared by
+    processes on the same machine, without a database server
+    """
+
+    def __init__(self, path='sessions.db', cache_ttl=30.0, cache_size=100000, stripes=16):
+        super().__init__(cache_ttl, cache_size, stripes)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS auth_sessions (
+                token_hash TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_as_expires ON auth_sessions(expires_at)
+        """)
+
+    def _save(self, key, user_id, expires):
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO auth_sessions (token_hash, user_id, expires_at)
+                VALUES (?, ?, ?)
+            """, (key, user_id, expires.timestamp()))
+
+    def _load(self, key):
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT user_id, expires_at FROM auth_sessions WHERE token_hash = ?
+            """, (key,)).fetchone()
+        if row is None:
+            return None
+        return {'user_id': row[0], 'expires': datetime.fromtimestamp(row[1])}
+
+    def _remove(self, key):
+        with self.lock:
+            cursor = self.conn.execute("""
+                DELETE FROM auth_sessions WHERE token_hash = ?
+            """, (key,))
+        return cursor.rowcount > 0
+
+    def _remove_expired(self, now):
+        with self.lock:
+            cursor = self.conn.execute("""
+                DELETE FROM auth_sessions WHERE expires_at < ?
+            """, (now.timestamp(),))
+        return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,220 @@
+import argparse
+import numpy as np
+
+# Card values exactly as Hand.calculate_value sees them, indexed by the card
+# codes used in blackjack.Deck: 2-10, faces are 10, aces count 11 and are
+# softened to 1 while the hand is over 21.
+CARD_VALUES = np.array([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4, dtype=np.int16)
+
+# Outcome codes, named after game_rounds.result
+WIN, LOSS, PUSH, BLACKJACK, BUST = range(5)
+RESULT_NAMES = ('win', 'loss', 'push', 'blackjack', 'bust')
+
+DEFAULT_PROFILE = {
+    'blackjack_payout': 1.5,
+    'min_bet': 10,
+    'max_bet': 500,
+    'num_decks': 1,
+}
+
+
+def profile_from_settings(settings, **overrides):
+    """
+    Build a settings profile from game_settings rows
+    (as returned by DatabaseHelper.get_game_settings)
+    """
+    profile = dict(DEFAULT_PROFILE)
+    for row in settings:
+        key = row['setting_key']
+        if key in profile:
+            profile[key] = type(profile[key])(float(row['setting_value']))
+    profile.update(overrides)
+    return profile
+
+
+class BlackjackSimulator:
+    """
+    Headless batch simulator for blackjack rounds.
+
+    Plays whole batches of rounds at once on NumPy arrays, dealing each
+    round from a freshly shuffled shoe of `num_decks` decks, with the same
+    rules as BlackjackGame.play_round:
+    a two-card 21 is paid as blackjack straight away, the player stands
+    automatically on 21, and the dealer draws while under 17.
+    """
+
+    def __init__(self, seed=None, player_stand_on=17, num_decks=1, batch_size=200000):
+        self.rng = np.random.default_rng(seed)
+        self.player_stand_on = min(player_stand_on, 21)
+        self.num_decks = num_decks
+        self.batch_size = max(1, batch_size // num_decks)
+
+    @staticmethod
+    def _soften(totals, aces):
+        """Count soft aces as 1 while the hand is over 21"""
+        over = (totals > 21) & (aces > 0)
+        while over.any():
+            totals[over] -= 10
+            aces[over] -= 1
+            over = (totals > 21) & (aces > 0)
+
+    def _draw_until(self, values, pos, totals, aces, active, stand_on):
+        """Deal cards to every active hand until it reaches stand_on"""
+        rows = np.arange(len(values))
+        active = active & (totals < stand_on)
+        while active.any():
+            card = values[rows[active], pos[active]]
+            totals[active] += card
+            aces[active] += card == 11
+            pos[active] += 1
+            self._soften(totals, aces)
+            active &= totals < stand_on
+
+    def play_batch(self, size):
+        """
+        Play `size` rounds.
+        Returns: array of outcome codes (WIN, LOSS, PUSH, BLACKJACK, BUST)
+        """
+        decks = np.tile(np.arange(52, dtype=np.int8), (size, self.num_decks))
+        return self.play_decks(CARD_VALUES[self.rng.permuted(decks, axis=1)])
+
+    def play_decks(self, values):
+        """
+        Play one round on each row of `values`, a (rounds, cards) array of
+        card values in dealing order.
+        Returns: array of outcome codes
+        """
+        size = len(values)
+        # Deal order matches play_round: player, dealer, player, dealer
+        player = values[:, 0] + values[:, 2]
+        player_aces = (values[:, 0] == 11).astype(np.int16) + (values[:, 2] == 11)
+        dealer = values[:, 1] + values[:, 3]
+        dealer_aces = (values[:, 1] == 11).astype(np.int16) + (values[:, 3] == 11)
+        self._soften(player, player_aces)
+        self._soften(dealer, dealer_aces)
+        pos = np.full(size, 4)
+
+        blackjack = player == 21
+        self._draw_until(values, pos, player, player_aces, ~blackjack, self.player_stand_on)
+        bust = player > 21
+        self._draw_until(values, pos, dealer, dealer_aces, ~blackjack & ~bust, 17)
+
+        outcomes = np.full(size, PUSH, dtype=np.int8)
+        outcomes[player < dealer] = LOSS
+        outcomes[(player > dealer) | (dealer > 21)] = WIN
+        outcomes[bust] = BUST
+        outcomes[blackjack] = BLACKJACK
+        return outcomes
+
+    def simulate(self, hands):
+        """
+        Play `hands` rounds in batches.
+        Returns: outcome counts indexed by outcome code
+        """
+        counts = np.zeros(len(RESULT_NAMES), dtype=np.int64)
+        remaining = hands
+        while remaining > 0:
+            size = min(remaining, self.batch_size)
+            counts += np.bincount(self.play_batch(size), minlength=len(RESULT_NAMES))
+            remaining -= size
+        return counts
+
+
+def house_edge_report(counts, profile):
+    """
+    Summarise outcome counts for one settings profile.
+    Returns edge and variance per unit bet, plus the expected result of a
+    round at the profile's min and max bet (blackjack winnings are truncated
+    to whole dollars, as in play_round).
+    """
+    hands = int(counts.sum())
+    rates = counts / hands
+    payout = float(profile['blackjack_payout'])
+
+    # Result of one round per unit bet, for each outcome code
+    unit = np.array([1.0, -1.0, 0.0, payout, -1.0])
+    expected = float(rates @ unit)
+    variance = float(rates @ unit ** 2) - expected ** 2
+
+    def expected_at(bet):
+        dollars = np.array([bet, -bet, 0, int(bet * payout), -bet], dtype=float)
+        return float(rates @ dollars)
+
+    report = {
+        'profile': dict(profile),
+        'hands': hands,
+        'house_edge': -expected,
+        'player_return': expected,
+        'variance': variance,
+        'std_dev': variance ** 0.5,
+        'std_error': (variance / hands) ** 0.5,
+        'expected_at_min_bet': expected_at(profile['min_bet']),
+        'expected_at_max_bet': expected_at(profile['max_bet']),
+    }
+    for code, name in enumerate(RESULT_NAMES):
+        report[f'{name}_rate'] = float(rates[code])
+    return report
+
+
+def simulate_profiles(profiles, hands=1000000, seed=None, player_stand_on=17):
+    """
+    Simulate `hands` rounds and report on every settings profile.
+    Only the deck count changes how rounds play out, so profiles with the
+    same num_decks share the same simulated outcomes.
+    """
+    counts_by_decks = {}
+    reports = []
+    for profile in profiles:
+        num_decks = int(profile.get('num_decks', 1))
+        if num_decks not in counts_by_decks:
+            simulator = BlackjackSimulator(seed=seed, player_stand_on=player_stand_on,
+                                           num_decks=num_decks)
+            counts_by_decks[num_decks] = simulator.simulate(hands)
+        reports.append(house_edge_report(counts_by_decks[num_decks], profile))
+    return reports
+
+
+def print_report(report):
+    """Print a house edge report"""
+    profile = report['profile']
+    print("\n" + "=" * 60)
+    print("Payout {blackjack_payout}x, bets ${min_bet}-${max_bet}, {num_decks} deck(s)".format(
+        **dict(DEFAULT_PROFILE, **profile)))
+    print("=" * 60)
+    print(f"Hands simulated: {report['hands']:,}")
+    print(f"House edge: {report['house_edge'] * 100:.3f}% "
+          f"(+/- {1.96 * report['std_error'] * 100:.3f}%)")
+    print(f"Variance per unit bet: {report['variance']:.4f} "
+          f"(std dev {report['std_dev']:.4f})")
+    print(f"Expected result at min bet: ${report['expected_at_min_bet']:.4f}")
+    print(f"Expected result at max bet: ${report['expected_at_max_bet']:.4f}")
+    print("Outcomes: " + ", ".join(
+        f"{name} {report[f'{name}_rate'] * 100:.2f}%" for name in RESULT_NAMES
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate blackjack rounds per settings profile")
+    parser.add_argument('--hands', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--stand-on', type=int, default=17,
+                        help="player hits below this total")
+    parser.add_argument('--payout', type=float, nargs='+',
+                        default=[DEFAULT_PROFILE['blackjack_payout']])
+    parser.add_argument('--min-bet', type=int, default=DEFAULT_PROFILE['min_bet'])
+    parser.add_argument('--max-bet', type=int, default=DEFAULT_PROFILE['max_bet'])
+    parser.add_argument('--decks', type=int, nargs='+', default=[DEFAULT_PROFILE['num_decks']])
+    args = parser.parse_args()
+
+    profiles = [
+        {'blackjack_payout': payout, 'min_bet': args.min_bet, 'max_bet': args.max_bet,
+         'num_decks': num_decks}
+        for num_decks in args.decks
+        for payout in args.payout
+    ]
+    for report in simulate_profiles(profiles, args.hands, args.seed, args.stand_on):
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# tests/conftest.py
+# scripted_db gives a DatabaseHelper over a scripted cursor, to check the
+# queries a method sends without a database.
+# Tests that need PostgreSQL use the pg_db fixture. They are skipped unless
+# BLACKJACK_TEST_DSN is set, e.g.
+#   BLACKJACK_TEST_DSN="dbname=blackjack_test user=postgres" python -m pytest ../tests
+# Each test gets app/schema.sql loaded into a throwaway schema.
+import os
+import uuid
+
+import pytest
+
+from database import DatabaseHelper, QueryStats
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'schema.sql')
+
+class ScriptedCursor:
+    """Returns the given results, one per execute()"""
+    rowcount = 0
+    statement = None
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        self.current = self.results.pop(0)
+
+    def fetchall(self):
+        return self.current
+
+    def fetchone(self):
+        return self.current[0] if self.current else None
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_factory=None):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakePool:
+    def __init__(self, cursor):
+        self.conn = FakeConnection(cursor)
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+@pytest.fixture
+def scripted_db():
+    """scripted_db(results) returns (db, cursor); see ScriptedCursor"""
+    def make(results):
+        cursor = ScriptedCursor(results)
+        db = DatabaseHelper.__new__(DatabaseHelper)
+        db.connection_pool = FakePool(cursor)
+        db.query_stats = QueryStats()
+        db.write_buffer = None
+        return db, cursor
+    return make
+
+class SingleConnectionPool:
+    """Hands every checkout the same connection"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+@pytest.fixture
+def pg_db():
+    dsn = os.environ.get('BLACKJACK_TEST_DSN')
+    if not dsn:
+        pytest.skip("set BLACKJACK_TEST_DSN to run PostgreSQL tests")
+
+    import psycopg2
+
+    schema = 'test_' + uuid.uuid4().hex[:12]
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(f"SET search_path TO {schema}")
+        with open(SCHEMA_PATH) as f:
+            cursor.execute(f.read())
+    conn.commit()
+
+    db = DatabaseHelper.__new__(DatabaseHelper)
+    db.connection_pool = SingleConnectionPool(conn)
+    db.query_stats = QueryStats()
+    db.write_buffer = None
+    db.leaderboard_index = None
+    try:
+        yield db
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+@pytest.fixture
+def make_users(pg_db):
+    """make_users(n) creates n users and returns their ids"""
+    def make(count):
+        start = len(make.created)
+        ids = [pg_db.create_user(f'user{i}', f'user{i}@example.com', 'not-a-hash')
+               for i in range(start, start + count)]
+        make.created.extend(ids)
+        return ids
+    make.created = []
+    return make
+
+@pytest.fixture
+def befriend(pg_db):
+    """befriend(a, b) sends and accepts a friend request; returns the friendship_id"""
+    def make(user_id, friend_id):
+        friendship_id = pg_db.send_friend_request(user_id, friend_id)
+        pg_db.accept_friend_request(friendship_id)
+        return friendship_id
+    return make
@@ -0,0 +1,29 @@
+# tests/test_admin_pagination.py
+from admin import AdminPanel
+
+def _panel():
+    panel = AdminPanel.__new__(AdminPanel)
+    panel.PAGE_SIZE = 3
+    return panel
+
+def test_next_and_previous_pages(monkeypatch):
+    rows = list(range(1, 9))
+    fetched = []
+    shown = []
+
+    def fetch_page(after):
+        fetched.append(after)
+        start = 0 if after is None else rows.index(after) + 1
+        return rows[start:start + 3]
+
+    answers = iter(['n', 'n', 'n', 'p', 'p', 'q'])
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+
+    assert _panel().paginate(fetch_page, shown.append, lambda row: row)
+    # The third page is short, so 'n' there stays on it
+    assert shown == [[1, 2, 3], [4, 5, 6], [7, 8], [7, 8], [4, 5, 6], [1, 2, 3]]
+    assert fetched == [None, 3, 6, 6, 3, None]
+
+def test_empty_listing(monkeypatch):
+    monkeypatch.setattr('builtins.input', lambda prompt: 'q')
+    assert not _panel().paginate(lambda after: [], print, lambda row: row)
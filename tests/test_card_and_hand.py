@@ -1,7 +1,7 @@
 # tests/test_card_and_hand.py
 import builtins
 
-from blackjack import Card, Hand
+from blackjack import Card, Deck, Hand
 
 def test_card_str_and_value_faces_and_ace():
     assert str(Card("Hearts", "J")) == "J of Hearts"
@@ -30,3 +30,36 @@ def test_hand_value_multiple_aces_softening():
     h.add_card(Card("Clubs", "A"))
     h.add_card(Card("Spades", "9"))
     assert h.calculate_value() == 21
+
+def test_cards_are_interned_flyweights():
+    c = Card("Spades", "A")
+    assert c is Card("Spades", "A")
+    assert Card.from_dict(c.to_dict()) is c
+    assert Card.from_code(c.code) is c
+    assert not hasattr(c, "__dict__")
+
+def test_running_total_matches_full_rescan():
+    import random
+    rng = random.Random(5)
+    for _ in range(500):
+        h = Hand()
+        for card in rng.sample(Deck().cards, rng.randint(1, 8)):
+            h.add_card(card)
+            value = sum(c.value() for c in h.cards)
+            aces = sum(c.rank == "A" for c in h.cards)
+            while value > 21 and aces:
+                value -= 10
+                aces -= 1
+            assert h.calculate_value() == value
+            assert h.is_soft() == (aces > 0)
+
+def test_from_dict_rebuilds_running_total():
+    h = Hand()
+    h.add_card(Card("Hearts", "A"))
+    h.add_card(Card("Clubs", "6"))
+    restored = Hand.from_dict(h.to_dict())
+    assert restored.calculate_value() == 17
+    assert restored.is_soft()
+    restored.add_card(Card("Spades", "K"))
+    assert restored.calculate_value() == 17
+    assert not restored.is_soft()
@@ -0,0 +1,75 @@
+# tests/test_connection_pool.py
+import threading
+import time
+
+import pytest
+
+from database import BlockingConnectionPool, PoolTimeoutError
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection")
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    opened = 0
+
+    def __init__(self, **params):
+        FakeConnection.opened += 1
+        self.closed = 0
+        self.broken = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+def _pool(**options):
+    return BlockingConnectionPool(1, 2, connection_factory=FakeConnection, **options)
+
+def test_waits_for_a_connection_instead_of_raising():
+    p = _pool(timeout=5)
+    a, b = p.getconn(), p.getconn()
+    assert a is not b
+    assert p.stats()['in_use'] == 2
+
+    got = []
+    t = threading.Thread(target=lambda: got.append(p.getconn()))
+    t.start()
+    time.sleep(0.05)
+    assert p.stats()['waiting'] == 1
+    p.putconn(a)
+    t.join(1)
+    assert got == [a]
+    assert p.stats()['max_wait'] > 0
+
+def test_times_out_when_exhausted():
+    p = _pool(timeout=0.05)
+    p.getconn(), p.getconn()
+    with pytest.raises(PoolTimeoutError):
+        p.getconn()
+    assert p.stats()['timeouts'] == 1
+
+def test_unhealthy_and_stale_connections_are_replaced():
+    p = _pool(health_check_after=0)
+    conn = p.getconn()
+    conn.broken = True
+    p.putconn(conn)
+    fresh = p.getconn()
+    assert fresh is not conn and conn.closed
+    p.putconn(fresh)
+
+    p.max_lifetime = 0
+    time.sleep(0.01)
+    assert p.getconn() is not fresh
+    assert p.stats()['recycled'] == 2
@@ -22,3 +22,11 @@ def test_shuffle_changes_order_most_of_the_time():
     # Extremely unlikely to be identical after shuffle
     orders_equal = [(c1.suit, c1.rank) for c1 in d1.cards] == [(c2.suit, c2.rank) for c2 in d2.cards]
     assert not orders_equal
+
+def test_deck_stores_codes_and_round_trips():
+    d = Deck()
+    d.shuffle()
+    assert isinstance(d.codes, bytearray)
+    restored = Deck.from_dict(d.to_dict())
+    assert restored.codes == d.codes
+    assert restored.deal() is d.deal()
@@ -0,0 +1,164 @@
+# tests/test_friends.py
+# The scripted tests check what is sent to the database; the pg_db ones
+# (see conftest.py) run the real SQL and need BLACKJACK_TEST_DSN.
+from decimal import Decimal
+
+def _score(db, user_id, final_money):
+    session_id = db.create_game_session(user_id, 'freeplay')
+    return db.add_to_leaderboard(user_id, session_id, Decimal(final_money), 10,
+                                 Decimal(final_money) - 1000)
+
+def test_friends_leaderboard_is_one_query(scripted_db):
+    rows = [{'user_id': 2, 'final_money': Decimal('1500'), 'rank': 1}]
+    db, cursor = scripted_db([rows])
+    assert db.get_friends_leaderboard(1) == rows
+    assert len(cursor.executed) == 1
+    sql, params = cursor.executed[0]
+    assert 'friend_edges' in sql
+    assert params == (1, 1)
+
+def test_friends_leaderboard_ranks_best_entry_of_user_and_friends(pg_db, make_users, befriend):
+    me, friend, other_friend, stranger = make_users(4)
+    befriend(me, friend)
+    befriend(other_friend, me)
+    _score(pg_db, me, '1200')
+    _score(pg_db, friend, '1500')
+    _score(pg_db, friend, '900')
+    _score(pg_db, other_friend, '1200')
+    _score(pg_db, stranger, '2000')
+
+    rows = pg_db.get_friends_leaderboard(me)
+    assert [(row['user_id'], row['final_money'], row['rank']) for row in rows] == [
+        (friend, Decimal('1500'), 1),
+        (other_friend, Decimal('1200'), 2),
+        (me, Decimal('1200'), 2),
+    ]
+
+def test_friends_leaderboard_leaves_out_users_without_entries(pg_db, make_users, befriend):
+    me, friend = make_users(2)
+    befriend(me, friend)
+    _score(pg_db, friend, '1100')
+    assert [row['user_id'] for row in pg_db.get_friends_leaderboard(me)] == [friend]
+
+def _reject(db, friendship_id):
+    # As api_respond_friend_request does
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE friendships SET status = 'rejected' WHERE friendship_id = %s",
+                       (friendship_id,))
+
+def test_send_friend_request_returns_none_when_not_reopened(scripted_db):
+    db, cursor = scripted_db([[]])
+    assert db.send_friend_request(1, 2) is None
+    sql, params = cursor.executed[0]
+    assert "WHERE friendships.status = 'rejected'" in sql
+    assert params == (1, 2)
+
+def test_are_friends_reads_friend_edges(scripted_db):
+    db, cursor = scripted_db([[{'?column?': 1}], []])
+    assert db.are_friends(1, 2)
+    assert not db.are_friends(1, 3)
+    assert all('FROM friend_edges' in sql for sql, _ in cursor.executed)
+    assert [params for _, params in cursor.executed] == [(1, 2), (1, 3)]
+
+def test_request_can_be_resent_after_rejection(pg_db, make_users):
+    ann, bob = make_users(2)
+    friendship_id = pg_db.send_friend_request(ann, bob)
+    # Pending either way round: no second request
+    assert pg_db.send_friend_request(ann, bob) is None
+    assert pg_db.send_friend_request(bob, ann) is None
+
+    _reject(pg_db, friendship_id)
+    # The rejected user may ask again; the same row is reopened, now from bob
+    assert pg_db.send_friend_request(bob, ann) == friendship_id
+    friendship = pg_db.get_friendship_between(ann, bob)
+    assert (friendship['user_id'], friendship['friend_id'], friendship['status']) == (
+        bob, ann, 'pending')
+
+    pg_db.accept_friend_request(friendship_id)
+    assert pg_db.send_friend_request(ann, bob) is None
+    assert pg_db.get_friendship_between(bob, ann)['status'] == 'accepted'
+
+def test_are_friends_follows_friendship_status(pg_db, make_users, befriend):
+    ann, bob, cat = make_users(3)
+    friendship_id = befriend(ann, bob)
+    assert pg_db.are_friends(ann, bob) and pg_db.are_friends(bob, ann)
+    assert not pg_db.are_friends(ann, cat)
+
+    pg_db.send_friend_request(ann, cat)
+    assert not pg_db.are_friends(ann, cat)
+
+    _reject(pg_db, friendship_id)
+    assert not pg_db.are_friends(ann, bob) and not pg_db.are_friends(bob, ann)
+
+def test_accept_locks_both_users_before_counting(scripted_db):
+    pair = [{'user_id': 5, 'friend_id': 2}]
+    db, cursor = scripted_db([pair, [], [], pair, []])
+    db.accept_friend_request(9)
+    locks = [params for sql, params in cursor.executed if 'pg_advisory_xact_lock' in sql]
+    assert locks == [(db.FRIEND_LOCK_SPACE, 2), (db.FRIEND_LOCK_SPACE, 5)]
+    assert 'UPDATE friendships' in cursor.executed[3][0]
+    assert 'INSERT INTO friend_suggestions' in cursor.executed[4][0]
+
+def test_accept_unknown_request_does_nothing(scripted_db):
+    db, cursor = scripted_db([[]])
+    db.accept_friend_request(9)
+    assert len(cursor.executed) == 1
+
+def test_accept_again_adds_no_counts(scripted_db):
+    pair = [{'user_id': 5, 'friend_id': 2}]
+    db, cursor = scripted_db([pair, [], [], []])
+    db.accept_friend_request(9)
+    assert not any('friend_suggestions' in sql for sql, _ in cursor.executed)
+
+def _suggestion_counts(db):
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT user_id, candidate_id, mutual_count FROM friend_suggestions")
+        return {(row['user_id'], row['candidate_id']): row['mutual_count']
+                for row in cursor.fetchall() if row['mutual_count'] > 0}
+
+def test_incremental_suggestions_match_rebuild(pg_db, make_users, befriend):
+    ann, bob, cat, dan, eve, fay = make_users(6)
+    friendship_ids = [befriend(a, b) for a, b in (
+        (ann, bob), (ann, cat), (bob, cat), (dan, bob), (cat, dan),
+        (bob, eve), (eve, fay), (fay, dan))]
+
+    # Accepting again must not count the new mutual friends twice
+    incremental = _suggestion_counts(pg_db)
+    for friendship_id in friendship_ids:
+        pg_db.accept_friend_request(friendship_id)
+    assert _suggestion_counts(pg_db) == incremental
+
+    pg_db.rebuild_friend_suggestions()
+    assert _suggestion_counts(pg_db) == incremental
+    assert incremental[(ann, dan)] == 2
+    assert incremental[(dan, ann)] == 2
+    assert incremental[(ann, eve)] == 1
+
+def test_suggestions_leave_out_friends_and_requests(pg_db, make_users, befriend):
+    ann, bob, cat, dan, eve = make_users(5)
+    for a, b in ((ann, bob), (ann, cat), (bob, cat), (bob, dan), (cat, dan), (bob, eve)):
+        befriend(a, b)
+    # bob and cat have a mutual friend with ann but are already her friends
+    assert [(row['candidate_id'], row['mutual_count'])
+            for row in pg_db.get_friend_suggestions(ann)] == [(dan, 2), (eve, 1)]
+
+    pg_db.send_friend_request(eve, ann)
+    assert [row['candidate_id'] for row in pg_db.get_friend_suggestions(ann)] == [dan]
+
+def test_ended_friendships_lower_suggestion_counts(pg_db, make_users, befriend):
+    ann, bob, cat, dan, eve, fay = make_users(6)
+    friendship_ids = {pair: befriend(*pair) for pair in (
+        (ann, bob), (ann, cat), (bob, cat), (dan, bob), (cat, dan),
+        (bob, eve), (eve, fay), (fay, dan))}
+    assert _suggestion_counts(pg_db)[(ann, dan)] == 2
+
+    # Deleting a user cascades through friendships to friend_edges
+    with pg_db.get_cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE user_id = %s", (bob,))
+    _reject(pg_db, friendship_ids[(fay, dan)])
+
+    incremental = _suggestion_counts(pg_db)
+    assert incremental[(ann, dan)] == 1
+    assert (ann, eve) not in incremental
+    pg_db.rebuild_friend_suggestions()
+    assert _suggestion_counts(pg_db) == incremental
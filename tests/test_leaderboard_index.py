@@ -0,0 +1,134 @@
+# tests/test_leaderboard_index.py
+import random
+from datetime import datetime
+from decimal import Decimal
+from leaderboard_index import SkipList, LeaderboardIndex, period_start
+
+class FakeDB:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get_leaderboard_entries_after(self, after_id, limit=10000):
+        rows = sorted((e for e in self.entries if e['leaderboard_id'] > after_id),
+                      key=lambda e: e['leaderboard_id'])
+        return rows[:limit]
+
+def _entry(leaderboard_id, user_id, money):
+    return {'leaderboard_id': leaderboard_id, 'user_id': user_id,
+            'username': f'user{user_id}', 'final_money': Decimal(money),
+            'profit': Decimal(money) - 1000, 'rounds_completed': 10, 'recorded_at': None}
+
+def _sql_rank(entries, money):
+    return 1 + sum(1 for e in entries if e['final_money'] > money)
+
+def _random_entries(count, seed=7):
+    rng = random.Random(seed)
+    return [_entry(i, rng.randint(1, 20), rng.choice(['0', '500', '1000', '1000', '1250.50', '2000']))
+            for i in range(1, count + 1)]
+
+def test_skiplist_matches_sorted_list():
+    rng = random.Random(1)
+    skiplist = SkipList()
+    keys = []
+    for _ in range(500):
+        key = rng.randint(0, 200)
+        if key in keys and rng.random() < 0.5:
+            assert skiplist.remove(key)
+            keys.remove(key)
+        elif key not in keys:
+            skiplist.insert(key, key)
+            keys.append(key)
+    keys.sort()
+    assert len(skiplist) == len(keys)
+    assert list(skiplist.iter_from(0)) == keys
+    assert list(skiplist.iter_from(37)) == keys[37:]
+    for probe in range(0, 201, 13):
+        assert skiplist.count_less(probe) == sum(1 for k in keys if k < probe)
+    assert not skiplist.remove(1000)
+
+def test_pages_cover_table_with_sql_ranks():
+    entries = _random_entries(120)
+    index = LeaderboardIndex(FakeDB(entries), batch_size=25)
+    index.load()
+    assert len(index) == 120
+
+    seen = []
+    page = index.top(7)
+    while page:
+        for row in page:
+            assert row['rank'] == _sql_rank(entries, row['final_money'])
+        seen.extend(row['leaderboard_id'] for row in page)
+        last = page[-1]
+        page = index.top(7, float(last['final_money']), last['leaderboard_id'])
+
+    expected = sorted(entries, key=lambda e: (-e['final_money'], -e['leaderboard_id']))
+    assert seen == [e['leaderboard_id'] for e in expected]
+
+def test_rank_and_around_user():
+    entries = _random_entries(60)
+    index = LeaderboardIndex(FakeDB(entries))
+    index.load()
+
+    best = max((e for e in entries if e['user_id'] == 3),
+               key=lambda e: (e['final_money'], e['leaderboard_id']))
+    rank = index.rank_of_user(3)
+    assert rank['leaderboard_id'] == best['leaderboard_id']
+    assert rank['rank'] == _sql_rank(entries, best['final_money'])
+    assert index.rank_of_user(999) is None
+    assert index.rank_of_score(1500) == _sql_rank(entries, Decimal('1500'))
+
+    around = index.around(3, radius=2)
+    ids = [row['leaderboard_id'] for row in around]
+    assert best['leaderboard_id'] in ids
+    assert len(around) <= 5
+
+def test_refresh_picks_up_other_writers_and_ignores_duplicates():
+    entries = _random_entries(10)
+    db = FakeDB(entries)
+    index = LeaderboardIndex(db)
+    index.load()
+
+    written_here = _entry(11, 1, '5000')
+    entries.append(written_here)
+    index.add(written_here)
+    entries.append(_entry(12, 2, '4000'))
+
+    assert index.refresh() == 1
+    assert len(index) == 12
+    assert [row['rank'] for row in index.top(2)] == [1, 2]
+
+def test_boards_per_mode_and_window_rotate():
+    now = [datetime(2026, 3, 4, 23, 0)]  # a Wednesday
+    def _timed(leaderboard_id, user_id, money, mode, recorded_at):
+        return dict(_entry(leaderboard_id, user_id, money), game_mode=mode, recorded_at=recorded_at)
+
+    entries = [
+        _timed(1, 1, '3000', 'tournament', datetime(2026, 2, 20)),
+        _timed(2, 2, '1500', 'freeplay', datetime(2026, 3, 2, 9, 0)),
+        _timed(3, 3, '1200', 'web', datetime(2026, 3, 4, 8, 0)),
+    ]
+    index = LeaderboardIndex(FakeDB(entries), clock=lambda: now[0])
+    index.load()
+
+    def ids(mode, window):
+        return [row['leaderboard_id'] for row in index.top(10, mode=mode, window=window)]
+
+    assert ids('all', 'all_time') == [1, 2, 3]
+    assert ids('all', 'weekly') == [2, 3]
+    assert ids('all', 'daily') == [3]
+    assert ids('tournament', 'weekly') == []
+    assert ids('web', 'daily') == [3]
+    assert index.rank_of_user(3, 'all', 'weekly')['rank'] == 2
+
+    # Next day: the daily boards start over, the weekly ones carry on
+    now[0] = datetime(2026, 3, 5, 0, 5)
+    index.add(_timed(4, 4, '900', 'web', now[0]))
+    assert ids('all', 'daily') == [4]
+    assert ids('all', 'weekly') == [2, 3, 4]
+    assert index.rank_of_user(3, 'all', 'daily') is None
+
+def test_period_start():
+    moment = datetime(2026, 3, 5, 13, 30)
+    assert period_start('daily', moment) == datetime(2026, 3, 5)
+    assert period_start('weekly', moment) == datetime(2026, 3, 2)
+    assert period_start('all_time', moment) is None
@@ -0,0 +1,18 @@
+# tests/test_leaderboard_page.py
+from decimal import Decimal
+
+def _entry(leaderboard_id, money):
+    return {'leaderboard_id': leaderboard_id, 'final_money': Decimal(money)}
+
+def test_page_ranks_match_sql_rank(scripted_db):
+    # Page starts on the second of three entries tied at rank 4
+    page = [_entry(8, '500'), _entry(5, '500'), _entry(9, '450'), _entry(2, '450'), _entry(1, '300')]
+    db, cursor = scripted_db([page, [{'rank': 4, 'ties_before': 1}]])
+    rows = db.get_leaderboard(5, after_money=Decimal('500'), after_id=10)
+    assert [row['rank'] for row in rows] == [4, 4, 7, 7, 9]
+    assert cursor.executed[0][1] == (Decimal('500'), 10, 5)
+
+def test_empty_page_skips_rank_query(scripted_db):
+    db, cursor = scripted_db([[]])
+    assert db.get_leaderboard(10) == []
+    assert len(cursor.executed) == 1
@@ -0,0 +1,87 @@
+# tests/test_messages.py
+# The scripted tests check what is sent to the database; the pg_db ones
+# (see conftest.py) run the real SQL and need BLACKJACK_TEST_DSN.
+from datetime import datetime
+
+def test_conversation_is_read_by_sorted_pair(scripted_db):
+    db, cursor = scripted_db([[]])
+    db.get_conversation(7, 3, limit=20)
+    sql, params = cursor.executed[0]
+    assert 'm.user_low = %s AND m.user_high = %s' in sql
+    assert params == (3, 7, 20)
+
+def test_conversation_page_before_cursor(scripted_db):
+    db, cursor = scripted_db([[]])
+    db.get_conversation(3, 7, limit=20, before=('2024-01-01', 42))
+    sql, params = cursor.executed[0]
+    assert '(m.sent_at, m.message_id) < (%s, %s)' in sql
+    assert params == (3, 7, '2024-01-01', 42, 20)
+
+def test_conversation_has_both_directions_in_order(pg_db, make_users):
+    ann, bob, cat = make_users(3)
+    sent = [pg_db.send_message(ann, bob, 'hi'),
+            pg_db.send_message(bob, ann, 'hello'),
+            pg_db.send_message(ann, cat, 'not for bob'),
+            pg_db.send_message(ann, bob, 'how are you')]
+
+    for user, other in ((ann, bob), (bob, ann)):
+        messages = pg_db.get_conversation(user, other)
+        assert [m['message_id'] for m in messages] == [sent[0], sent[1], sent[3]]
+        assert all((m['user_low'], m['user_high']) == (min(ann, bob), max(ann, bob))
+                   for m in messages)
+
+def test_conversation_pages_back_with_message_cursor(pg_db, make_users):
+    ann, bob = make_users(2)
+    sent = [pg_db.send_message(ann, bob, f'message {i}') for i in range(5)]
+
+    latest = pg_db.get_conversation(ann, bob, limit=2)
+    assert [m['message_id'] for m in latest] == sent[3:]
+    earlier = pg_db.get_conversation(ann, bob, limit=2,
+                                     before=pg_db.message_cursor(latest[0]))
+    assert [m['message_id'] for m in earlier] == sent[1:3]
+
+def test_send_message_bumps_unread_counter(scripted_db):
+    sent_at = datetime(2024, 1, 1, 12, 0)
+    db, cursor = scripted_db([[{'message_id': 5, 'sent_at': sent_at}], []])
+    assert db.send_message(3, 7, 'hi') == 5
+    sql, params = cursor.executed[1]
+    assert 'unread_count = unread_counters.unread_count + 1' in sql
+    assert params == (7, 3, sent_at)
+
+def test_mark_read_lowers_counter_by_messages_marked(scripted_db):
+    db, cursor = scripted_db([[], []])
+    cursor.rowcount = 3
+    db.mark_messages_read(7, 3)
+    sql, params = cursor.executed[1]
+    assert 'GREATEST(unread_count - %s, 0)' in sql
+    assert params == (3, 7, 3)
+
+def test_mark_read_with_nothing_unread_leaves_counter(scripted_db):
+    db, cursor = scripted_db([[]])
+    db.mark_messages_read(7, 3)
+    assert len(cursor.executed) == 1
+
+def _counters(db, user_id):
+    return {row['sender_id']: row['unread_count'] for row in db.get_inbox_summary(user_id)}
+
+def test_unread_counters_follow_send_and_read(pg_db, make_users):
+    ann, bob, cat = make_users(3)
+    for i in range(3):
+        pg_db.send_message(ann, bob, f'message {i}')
+    pg_db.send_message(cat, bob, 'hey')
+    assert pg_db.get_unread_count(bob) == 4
+    assert _counters(pg_db, bob) == {ann: 3, cat: 1}
+    assert pg_db.get_unread_count(ann) == 0
+
+    pg_db.mark_messages_read(bob, ann)
+    assert _counters(pg_db, bob) == {ann: 0, cat: 1}
+    pg_db.mark_messages_read(bob, ann)
+    assert _counters(pg_db, bob) == {ann: 0, cat: 1}
+
+    pg_db.send_message(ann, bob, 'one more')
+    assert pg_db.get_unread_count(bob) == 2
+
+    # Same counts as recounting from messages
+    incremental = _counters(pg_db, bob)
+    pg_db.rebuild_unread_counters()
+    assert _counters(pg_db, bob) == incremental
@@ -0,0 +1,114 @@
+# tests/test_password_hasher.py
+import threading
+
+import pytest
+
+from auth import AuthManager
+from password_hasher import MAX_ROUNDS, MIN_ROUNDS, HasherBusy, PasswordHasher, hash_rounds
+
+class FakeDB:
+    def __init__(self, password_hash, rounds=MIN_ROUNDS):
+        self.user = {'user_id': 1, 'username': 'ann', 'password_hash': password_hash,
+                     'is_banned': False, 'role': 'player'}
+        self.rounds = rounds
+        self.updated = []
+        self.rehashed = threading.Event()
+
+    def get_typed_setting(self, key, default=None):
+        return self.rounds if key == 'bcrypt_rounds' else default
+
+    def get_user_by_username(self, username):
+        return dict(self.user)
+
+    def update_last_login(self, user_id):
+        pass
+
+    def update_password_hash(self, user_id, password_hash):
+        self.updated.append((user_id, password_hash))
+        self.user['password_hash'] = password_hash
+        self.rehashed.set()
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=MIN_ROUNDS, workers=2)
+    hashed = hasher.hash('secret')
+    assert hash_rounds(hashed) == MIN_ROUNDS
+    assert hasher.verify('secret', hashed)
+    assert not hasher.verify('wrong', hashed)
+    # Interchangeable with the synchronous helpers
+    assert AuthManager.verify_password('secret', hashed)
+
+def test_rounds_follow_callable_and_are_clamped():
+    rounds = [MIN_ROUNDS]
+    hasher = PasswordHasher(rounds=lambda: rounds[0], workers=1)
+    hashed = hasher.hash('secret')
+    assert not hasher.needs_rehash(hashed)
+    rounds[0] = MIN_ROUNDS + 1
+    assert hasher.needs_rehash(hashed)
+    # A setting outside the allowed range is clamped
+    rounds[0] = 4
+    assert hasher.current_rounds() == MIN_ROUNDS
+    assert not hasher.needs_rehash(hashed)
+    rounds[0] = 31
+    assert hasher.current_rounds() == MAX_ROUNDS
+    assert hasher.needs_rehash('not a bcrypt hash')
+
+def test_saturated_pool_rejects_immediately():
+    hasher = PasswordHasher(rounds=MIN_ROUNDS, workers=1, max_pending=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait()
+
+    running = hasher.submit(blocked)
+    started.wait()
+    queued = hasher.submit(lambda: None)
+    with pytest.raises(HasherBusy):
+        hasher.hash('secret')
+    release.set()
+    running.result()
+    queued.result()
+    # Slots are released once the jobs finish
+    assert hasher.verify('secret', hasher.hash('secret'))
+
+def test_login_rehashes_when_cost_changes():
+    db = FakeDB(AuthManager.hash_password('secret'), rounds=MIN_ROUNDS)
+    auth = AuthManager(db)
+    result = auth.login('ann', 'secret')
+    assert result['success']
+    assert 'password_hash' not in result['user']
+    assert db.rehashed.wait(5)
+    assert len(db.updated) == 1
+    assert hash_rounds(db.user['password_hash']) == MIN_ROUNDS
+
+    # Already at the configured cost: left alone
+    db.rehashed.clear()
+    assert auth.login('ann', 'secret')['success']
+    assert not db.rehashed.is_set()
+    assert len(db.updated) == 1
+
+def test_login_does_not_wait_for_rehash():
+    db = FakeDB(AuthManager.hash_password('secret'))
+    release = threading.Event()
+
+    class SlowRehashHasher(PasswordHasher):
+        def hash_async(self, password):
+            return self.submit(lambda: release.wait() and 'new hash')
+
+    auth = AuthManager(db, hasher=SlowRehashHasher(rounds=MIN_ROUNDS, workers=2))
+    assert auth.login('ann', 'secret')['success']
+    assert db.updated == []
+    release.set()
+    assert db.rehashed.wait(5)
+    assert db.updated == [(1, 'new hash')]
+
+def test_login_reports_busy():
+    class BusyHasher:
+        def verify(self, password, hashed_password):
+            raise HasherBusy()
+
+    auth = AuthManager(FakeDB('hash'), hasher=BusyHasher())
+    result = auth.login('ann', 'secret')
+    assert not result['success']
+    assert result['busy']
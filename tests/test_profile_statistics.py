@@ -0,0 +1,32 @@
+# tests/test_profile_statistics.py
+# Needs PostgreSQL: see the pg_db fixture in conftest.py
+from decimal import Decimal
+
+def _profile(db, user_id):
+    with db.get_cursor() as cursor:
+        cursor.execute("""
+            SELECT total_winnings, total_losses, highest_balance
+            FROM user_profiles WHERE user_id = %s
+        """, (user_id,))
+        return cursor.fetchone()
+
+def test_rounds_update_profile_like_a_rebuild(pg_db, make_users):
+    user_id, = make_users(1)
+    session_id = pg_db.create_game_session(user_id, 'freeplay')
+    pg_db.commit_round(session_id, 1, 50, [], [], 21, 18, 'win', 50, 1050)
+    pg_db.commit_round(session_id, 2, 80, [], [], 17, 20, 'loss', -80, 970)
+    pg_db.save_game_round(session_id, 3, 10, [], [], 19, 19, 'push', 0, 970)
+
+    incremental = _profile(pg_db, user_id)
+    assert incremental == {'total_winnings': Decimal('50.00'), 'total_losses': Decimal('80.00'),
+                           'highest_balance': Decimal('1050.00')}
+    pg_db.update_user_statistics(user_id)
+    assert _profile(pg_db, user_id) == incremental
+
+def test_losing_player_keeps_starting_highest_balance(pg_db, make_users):
+    user_id, = make_users(1)
+    session_id = pg_db.create_game_session(user_id, 'freeplay')
+    pg_db.commit_round(session_id, 1, 100, [], [], 15, 20, 'loss', -100, 900)
+    assert _profile(pg_db, user_id)['highest_balance'] == Decimal('1000.00')
+    pg_db.update_user_statistics(user_id)
+    assert _profile(pg_db, user_id)['highest_balance'] == Decimal('1000.00')
@@ -0,0 +1,78 @@
+# tests/test_query_stats.py
+from database import DatabaseHelper, QueryStats
+
+class FakeCursor:
+    """Records statements like DatabaseHelper's cursors (see _statement_cursor)"""
+    rowcount = 3
+    statement = None
+    # What psycopg2 keeps after binding: must never be reported
+    query = b"SELECT * FROM auth_sessions WHERE session_token = 'secret-token'"
+
+    def execute(self, sql, params=None):
+        self.statement = sql
+
+    def fetchall(self):
+        return [{}, {}, {}]
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def cursor(self, cursor_factory=None):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class FakePool:
+    def getconn(self):
+        return FakeConnection()
+
+    def putconn(self, conn):
+        pass
+
+def _db(slow_query_ms=200.0):
+    db = DatabaseHelper.__new__(DatabaseHelper)
+    db.connection_pool = FakePool()
+    db.query_stats = QueryStats(slow_query_ms)
+    db.write_buffer = None
+    return db
+
+def test_queries_are_named_by_the_calling_method():
+    db = _db()
+    db.get_all_users(5)
+    db.get_all_users(5)
+    stats = db.get_query_stats()
+    assert stats['get_all_users']['calls'] == 2
+    assert stats['get_all_users']['rows'] == 6
+    assert stats['connection_checkout']['calls'] == 2
+
+def test_slow_queries_are_logged(caplog):
+    db = _db(slow_query_ms=0)
+    db.get_all_users(5)
+    slow = db.get_slow_queries()
+    assert slow[-1]['query'] == 'get_all_users'
+    assert slow[-1]['sql'].startswith("SELECT * FROM user_statistics")
+    assert "Slow query get_all_users" in caplog.text
+
+def test_slow_query_log_has_no_bound_parameters(caplog):
+    db = _db(slow_query_ms=0)
+    db.get_auth_session('secret-token')
+    assert '%s' in db.get_slow_queries()[-1]['sql']
+    assert 'secret-token' not in str(db.get_slow_queries())
+    assert 'secret-token' not in caplog.text
+
+def test_percentiles():
+    stats = QueryStats()
+    for ms in range(1, 101):
+        stats.record('q', ms / 1000)
+    snap = stats.snapshot()['q']
+    assert snap['p50_ms'] == 51
+    assert snap['p95_ms'] == 96
+    assert snap['p99_ms'] == 100
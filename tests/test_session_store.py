@@ -0,0 +1,220 @@
+# tests/test_session_store.py
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from auth import AuthManager
+from session_store import (
+    CachedSessionStore, MemorySessionStore, PostgresSessionStore, SQLiteSessionStore, token_hash)
+
+class CountingStore(CachedSessionStore):
+    """Cached store over a dict that counts backend reads"""
+    def __init__(self, cache_ttl=30.0, cache_size=100000, stripes=16):
+        super().__init__(cache_ttl, cache_size, stripes)
+        self.rows = {}
+        self.loads = 0
+
+    def _save(self, token, user_id, expires):
+        self.rows[token] = {'user_id': user_id, 'expires': expires}
+
+    def _load(self, token):
+        self.loads += 1
+        return self.rows.get(token)
+
+    def _remove(self, token):
+        return self.rows.pop(token, None) is not None
+
+    def _remove_expired(self, now):
+        expired = [token for token, row in self.rows.items() if now > row['expires']]
+        for token in expired:
+            del self.rows[token]
+        return len(expired)
+
+class FakeSessionDB:
+    """The DatabaseHelper auth session methods over a dict"""
+    def __init__(self):
+        self.rows = {}
+        self.expired_before = []
+
+    def create_auth_session(self, key, user_id, expires_at):
+        self.rows[key] = {'user_id': user_id, 'expires_at': expires_at}
+
+    def get_auth_session(self, key):
+        return self.rows.get(key)
+
+    def delete_auth_session(self, key):
+        return self.rows.pop(key, None) is not None
+
+    def delete_expired_auth_sessions(self, now):
+        self.expired_before.append(now)
+        return 0
+
+def later(hours=1):
+    return datetime.now() + timedelta(hours=hours)
+
+def test_memory_store_roundtrip():
+    store = MemorySessionStore()
+    store.create('a', 1, later())
+    assert store.get('a')['user_id'] == 1
+    assert store.delete('a')
+    assert not store.delete('a')
+    assert store.get('a') is None
+
+def test_memory_store_cleanup_expired():
+    store = MemorySessionStore()
+    store.create('old', 1, later(-1))
+    store.create('new', 2, later())
+    assert store.cleanup_expired() == 1
+    assert store.get('old') is None
+    assert store.get('new') is not None
+
+def test_sqlite_store_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    first, second = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    expires = later()
+    first.create('a', 7, expires)
+    session = second.get('a')
+    assert session['user_id'] == 7
+    assert abs((session['expires'] - expires).total_seconds()) < 0.001
+
+    second.create('old', 8, later(-1))
+    assert first.cleanup_expired() == 1
+    assert second.delete('a')
+    assert not first.delete('a')
+    first.close()
+    second.close()
+
+def test_cache_hit_skips_backend():
+    store = CountingStore()
+    store.create('a', 1, later())
+    for _ in range(3):
+        assert store.get('a')['user_id'] == 1
+    assert store.loads == 0
+
+def test_cache_entries_expire_after_ttl():
+    store = CountingStore(cache_ttl=0)
+    store.create('a', 1, later())
+    # Deleted by another process: seen once the cached copy is stale
+    del store.rows[token_hash('a')]
+    assert store.get('a') is None
+    assert store.loads == 1
+
+def test_cache_is_bounded():
+    store = CountingStore(cache_size=2, stripes=1)
+    for token in 'abc':
+        store.create(token, 1, later())
+    assert list(store.cache_stripes[0].entries) == ['b', 'c']
+    assert store.get('a')['user_id'] == 1
+    assert store.loads == 1
+
+def test_cache_size_is_split_over_stripes():
+    store = CountingStore(cache_size=8, stripes=4)
+    for i in range(100):
+        store.create(f'token{i}', i, later())
+    assert all(len(stripe.entries) <= 2 for stripe in store.cache_stripes)
+    # The most recent token of each stripe is still cached
+    store.loads = 0
+    assert store.get('token99')['user_id'] == 99
+    assert store.loads == 0
+
+def test_cached_store_concurrent_access():
+    store = CountingStore(cache_size=1000, stripes=8)
+    expires = later()
+
+    def worker(n):
+        for i in range(500):
+            token = f'{n}-{i}'
+            store.create(token, n, expires)
+            assert store.get(token)['user_id'] == n
+            if i % 2:
+                store.delete(token)
+                assert store.get(token) is None
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.rows) == 8 * 250
+    assert sum(len(stripe.entries) for stripe in store.cache_stripes) <= 1000
+
+def test_auth_manager_uses_store():
+    store = CountingStore()
+    auth = AuthManager(db=None, session_store=store)
+    token = auth.create_session(5)
+    assert token_hash(token) in store.rows
+    assert token not in store.rows
+    assert auth.validate_session(token) == {'valid': True, 'user_id': 5}
+    assert auth.logout(token)
+    assert auth.validate_session(token) == {'valid': False, 'user_id': None}
+
+def test_auth_manager_drops_expired_session():
+    auth = AuthManager(db=None)
+    token = auth.create_session(5, duration_hours=-1)
+    assert auth.validate_session(token)['valid'] is False
+    assert auth.sessions.get(token) is None
+
+def test_memory_store_sweeps_only_expired_heap_entries():
+    store = MemorySessionStore(stripes=4, sweep_batch=2)
+    now = datetime.now()
+    for i in range(10):
+        store.create(f'old{i}', i, now - timedelta(minutes=i + 1))
+    for i in range(5):
+        store.create(f'new{i}', i, now + timedelta(hours=1))
+    # Logged out before expiring: its heap entry is skipped
+    store.delete('old0')
+    assert store.cleanup_expired(now) == 9
+    assert len(store) == 5
+    assert all(len(stripe.expiries) == len(stripe.sessions) for stripe in store.stripes)
+
+def test_memory_store_recreated_token_keeps_new_expiry():
+    store = MemorySessionStore()
+    now = datetime.now()
+    store.create('a', 1, now - timedelta(minutes=1))
+    store.create('a', 1, now + timedelta(hours=1))
+    assert store.cleanup_expired(now) == 0
+    assert store.get('a')['expires'] > now
+
+def test_memory_store_concurrent_access():
+    store = MemorySessionStore(stripes=8)
+    expires = later()
+
+    def worker(n):
+        for i in range(500):
+            token = f'{n}-{i}'
+            store.create(token, n, expires)
+            assert store.get(token)['user_id'] == n
+            if i % 2:
+                store.delete(token)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 8 * 250
+
+def test_postgres_store_keeps_only_token_hashes():
+    db = FakeSessionDB()
+    store = PostgresSessionStore(db, cache_ttl=0)
+    expires = later()
+    store.create('secret-token', 3, expires)
+    key = hashlib.sha256(b'secret-token').hexdigest()
+    assert list(db.rows) == [key]
+    assert len(key) == 64
+
+    # cache_ttl=0: every get goes to _load
+    assert store.get('secret-token') == {'user_id': 3, 'expires': expires}
+    assert store.get(key) is None
+    assert store.get('other') is None
+
+    assert store.delete('secret-token')
+    assert db.rows == {}
+    assert not store.delete('secret-token')
+    assert store.get('secret-token') is None
+
+def test_postgres_store_cleanup_passes_now():
+    db = FakeSessionDB()
+    now = datetime.now()
+    assert PostgresSessionStore(db).cleanup_expired(now) == 0
+    assert db.expired_before == [now]
@@ -0,0 +1,75 @@
+# tests/test_settings_cache.py
+import pytest
+
+from admin import AdminPanel
+from database import DatabaseHelper, SettingsCache
+
+class Loader:
+    def __init__(self, values):
+        self.values = values
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.values)
+
+def test_settings_are_loaded_once_and_typed():
+    loader = Loader({'starting_money': '1000', 'tournament_rounds': '10', 'blackjack_payout': '1.5'})
+    cache = SettingsCache(loader)
+    assert cache.get('starting_money') == '1000'
+    assert cache.get_typed('starting_money') == 1000.0
+    assert cache.get_typed('tournament_rounds') == 10
+    assert cache.get_typed('blackjack_payout') == 1.5
+    assert cache.get_typed('max_bet', 500) == 500
+    assert loader.calls == 1
+
+def test_invalid_values_fall_back_to_default():
+    cache = SettingsCache(Loader({'min_bet': 'ten'}))
+    assert cache.get_typed('min_bet', 10) == 10
+
+def test_invalidate_reloads():
+    loader = Loader({'min_bet': '10'})
+    cache = SettingsCache(loader)
+    assert cache.get_typed('min_bet') == 10
+    loader.values['min_bet'] = '25'
+    assert cache.get_typed('min_bet') == 10
+    cache.invalidate()
+    assert cache.get_typed('min_bet') == 25
+    assert loader.calls == 2
+
+def test_ttl_bounds_staleness():
+    loader = Loader({'min_bet': '10'})
+    cache = SettingsCache(loader, ttl=0)
+    cache.get('min_bet')
+    cache.get('min_bet')
+    assert loader.calls == 2
+
+def test_validate_converts_and_checks_range():
+    assert SettingsCache.validate('bcrypt_rounds', '12') == 12
+    assert SettingsCache.validate('min_bet', '25') == 25
+    assert SettingsCache.validate('welcome_text', 'hi') == 'hi'
+    for value in ('4', '16', 'twelve'):
+        with pytest.raises(ValueError, match='bcrypt_rounds'):
+            SettingsCache.validate('bcrypt_rounds', value)
+    with pytest.raises(ValueError):
+        SettingsCache.validate('blackjack_payout', 'lots')
+
+def test_validate_shoe_settings():
+    assert SettingsCache.validate('num_decks', '8') == 8
+    assert SettingsCache.validate('shoe_penetration', '1') == 1.0
+    for value in ('0', '9', '-2'):
+        with pytest.raises(ValueError, match='num_decks must be between 1 and 8'):
+            SettingsCache.validate('num_decks', value)
+    for value in ('0', '1.5', '5'):
+        with pytest.raises(ValueError, match='shoe_penetration must be above 0.0'):
+            SettingsCache.validate('shoe_penetration', value)
+
+def test_invalid_setting_is_not_written():
+    db = DatabaseHelper.__new__(DatabaseHelper)  # no pool: any query would fail
+    with pytest.raises(ValueError, match='between 10 and 15'):
+        db.update_game_setting('bcrypt_rounds', '4', admin_id=1)
+
+def test_preview_rejects_invalid_setting(capsys):
+    panel = AdminPanel.__new__(AdminPanel)
+    assert not panel.preview_setting_change([], 'bcrypt_rounds', '40')
+    assert 'bcrypt_rounds must be between' in capsys.readouterr().out
@@ -0,0 +1,133 @@
+# tests/test_shoe.py
+from collections import Counter
+
+from blackjack import Card, Shoe
+
+def test_shoe_holds_every_deck():
+    shoe = Shoe(num_decks=6)
+    assert len(shoe.codes) == 6 * 52
+    counts = Counter((c.suit, c.rank) for c in shoe.cards)
+    assert set(counts.values()) == {6}
+
+def test_reshuffle_only_at_cut_card():
+    shoe = Shoe(num_decks=2, penetration=0.5)
+    for _ in range(51):
+        shoe.deal()
+    assert not shoe.needs_reshuffle()
+    shoe.deal()
+    assert shoe.needs_reshuffle()
+    shoe.reshuffle()
+    assert shoe.cards_dealt() == 0
+
+def test_empty_shoe_reshuffles_on_deal():
+    shoe = Shoe(num_decks=1, penetration=1.0)
+    for _ in range(52):
+        shoe.deal()
+    assert isinstance(shoe.deal(), Card)
+    assert shoe.cards_dealt() == 1
+
+def test_shoe_round_trip_and_legacy_deck():
+    shoe = Shoe(num_decks=3, penetration=0.8)
+    shoe.deal()
+    restored = Shoe.from_dict(shoe.to_dict())
+    assert restored.codes == shoe.codes
+    assert (restored.num_decks, restored.penetration) == (3, 0.8)
+
+    legacy = Shoe.from_dict([{'suit': 'Hearts', 'rank': 'A'}, {'suit': 'Clubs', 'rank': '9'}])
+    assert legacy.num_decks == 1
+    assert legacy.deal() is Card("Clubs", "9")
+
+def test_shoe_rebuilds_from_seed_and_position():
+    shoe = Shoe(num_decks=2, penetration=0.75, seed=42)
+    for _ in range(80):
+        shoe.deal()
+    shoe.reshuffle()
+    for _ in range(10):
+        shoe.deal()
+    state = shoe.to_dict()
+    assert 'codes' not in state
+    restored = Shoe.from_dict(state)
+    assert restored.codes == shoe.codes
+    assert [restored.deal() for _ in range(20)] == [shoe.deal() for _ in range(20)]
+
+def test_hand_round_trips_through_codes():
+    from blackjack import Hand
+    h = Hand()
+    h.add_card(Card("Hearts", "A"))
+    h.add_card(Card("Spades", "7"))
+    restored = Hand.from_dict(h.to_codes())
+    assert restored.cards == h.cards
+    assert restored.calculate_value() == 18
+
+def test_refill_mid_round_leaves_out_cards_on_the_table():
+    shoe = Shoe(num_decks=1, penetration=1.0, seed=7)
+    for _ in range(48):
+        shoe.deal()
+    shoe.begin_round()
+    table = [shoe.deal() for _ in range(6)]
+    assert shoe.cards_dealt() == 2
+    assert len(shoe.codes) == 46
+    remaining = Counter(c.code for c in shoe.cards)
+    assert all(remaining[c.code] == 0 for c in table)
+
+    restored = Shoe.from_dict(shoe.to_dict())
+    assert restored.codes == shoe.codes
+    # The held cards come back at the next reshuffle
+    assert shoe.begin_round() is False
+    shoe.reshuffle()
+    assert len(shoe.codes) == 52 and not shoe.held
+
+def test_begin_round_reshuffles_at_cut_card():
+    shoe = Shoe(num_decks=1, penetration=0.5)
+    for _ in range(26):
+        shoe.deal()
+    assert shoe.begin_round()
+    assert shoe.cards_dealt() == 0
+
+def test_completed_session_drops_its_shoe():
+    from blackjack import BlackjackGame
+
+    class FakeDB:
+        def __init__(self):
+            self.completed = []
+        def get_typed_setting(self, key, default=None):
+            return default
+        def complete_session(self, session_id):
+            self.completed.append(session_id)
+
+    db = FakeDB()
+    game = BlackjackGame(db, auth=None)
+    game.get_shoe(1)
+    game.get_shoe(2)
+    game.complete_session(1)
+    assert db.completed == [1]
+    assert list(game.shoes) == [2]
+
+def test_shoe_settings_out_of_range_are_clamped():
+    from blackjack import BlackjackGame
+
+    class FakeDB:
+        settings = {'num_decks': 0, 'shoe_penetration': 5.0}
+        def get_typed_setting(self, key, default=None):
+            return self.settings.get(key, default)
+
+    game = BlackjackGame(FakeDB(), auth=None)
+    shoe = game.get_shoe(1)
+    assert (shoe.num_decks, shoe.penetration) == (1, 1.0)
+    assert shoe.deal() is not None
+
+    FakeDB.settings = {'num_decks': 20, 'shoe_penetration': 0.0}
+    shoe = game.get_shoe(2)
+    assert (shoe.num_decks, shoe.penetration) == (8, 0.75)
+
+def test_legacy_shoe_keeps_its_card_order_until_reshuffled():
+    legacy = Shoe.from_dict([{'suit': 'Hearts', 'rank': 'A'}, {'suit': 'Clubs', 'rank': '9'},
+                             {'suit': 'Spades', 'rank': '4'}])
+    state = legacy.to_dict()
+    assert state['codes'] == list(legacy.codes)
+    again = Shoe.from_dict(state)
+    assert again.codes == legacy.codes
+    assert Shoe.from_dict(again.to_dict()).codes == legacy.codes
+
+    legacy.reshuffle()
+    assert 'codes' not in legacy.to_dict()
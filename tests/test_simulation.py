@@ -0,0 +1,62 @@
+# tests/test_simulation.py
+import numpy as np
+
+from blackjack import Card, Hand
+from simulation import (
+    BlackjackSimulator, CARD_VALUES, WIN, LOSS, PUSH, BLACKJACK, BUST,
+    house_edge_report, profile_from_settings,
+)
+
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A'] * 4
+
+def _values(ranks):
+    """Card values for a deck dealt in the given order, padded with 2s"""
+    row = [Card("Hearts", r).value() for r in ranks]
+    return np.array([row + [2] * (52 - len(row))], dtype=np.int16)
+
+def _reference_round(codes, stand_on=17):
+    """Play one round card by card with Hand, the way play_round does"""
+    cards = iter(Card("Hearts", RANKS[c]) for c in codes)
+    player, dealer = Hand(), Hand()
+    for hand in (player, dealer, player, dealer):
+        hand.add_card(next(cards))
+    if player.calculate_value() == 21:
+        return BLACKJACK
+    while player.calculate_value() < stand_on:
+        player.add_card(next(cards))
+    if player.calculate_value() > 21:
+        return BUST
+    while dealer.calculate_value() < 17:
+        dealer.add_card(next(cards))
+    p, d = player.calculate_value(), dealer.calculate_value()
+    if d > 21 or p > d:
+        return WIN
+    return LOSS if p < d else PUSH
+
+def test_fixed_decks_follow_play_round_rules():
+    sim = BlackjackSimulator(seed=0)
+    # player 10+Q stands on 20, dealer 6+9 hits 8 and busts
+    assert sim.play_decks(_values(["10", "6", "Q", "9", "8"]))[0] == WIN
+    # player A+K is blackjack even if the dealer also has 21
+    assert sim.play_decks(_values(["A", "A", "K", "K"]))[0] == BLACKJACK
+    # player 10+6 hits 9 and busts
+    assert sim.play_decks(_values(["10", "10", "6", "7", "9"]))[0] == BUST
+    # player 10+8 stands, dealer 10+8 stands: push
+    assert sim.play_decks(_values(["10", "10", "8", "8"]))[0] == PUSH
+
+def test_batch_matches_hand_based_reference():
+    rng = np.random.default_rng(7)
+    codes = np.array([rng.permutation(52) for _ in range(2000)])
+    outcomes = BlackjackSimulator().play_decks(CARD_VALUES[codes])
+    expected = [_reference_round(row) for row in codes]
+    assert outcomes.tolist() == expected
+
+def test_report_edge_follows_payout():
+    counts = BlackjackSimulator(seed=3).simulate(50000)
+    assert counts.sum() == 50000
+    low = house_edge_report(counts, profile_from_settings([], blackjack_payout=1.2))
+    high = house_edge_report(counts, profile_from_settings([
+        {'setting_key': 'blackjack_payout', 'setting_value': '2'},
+    ]))
+    assert high['house_edge'] < low['house_edge']
+    assert abs(sum(low[f'{n}_rate'] for n in ('win', 'loss', 'push', 'blackjack', 'bust')) - 1) < 1e-9
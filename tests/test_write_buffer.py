@@ -0,0 +1,140 @@
+# tests/test_write_buffer.py
+import json
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+from database import DatabaseHelper, WriteBehindBuffer
+
+class FakeCursor:
+    def __init__(self, executed, reject=None):
+        self.executed = executed
+        self.reject = reject
+
+    def execute(self, sql, params):
+        if self.reject is not None and self.reject in params:
+            raise psycopg2.IntegrityError("violates foreign key constraint")
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return {'round_id': 1}
+
+class FakeDB:
+    """Stands in for DatabaseHelper.get_cursor; can be made to fail"""
+    def __init__(self):
+        self.executed = []
+        self.fail = False
+        self.reject = None
+
+    @contextmanager
+    def get_cursor(self, query_name=None):
+        if self.fail:
+            raise RuntimeError("database down")
+        yield FakeCursor(self.executed, self.reject)
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def _log_row(i):
+    return (1, 'update_setting', None, f'change {i}', None)
+
+def test_flushes_multi_row_insert_at_size_threshold(tmp_path):
+    db = FakeDB()
+    buf = WriteBehindBuffer(db, flush_size=3, flush_interval=60,
+                            spool_path=str(tmp_path / "spool"))
+    buf.add('admin_logs', _log_row(1))
+    buf.add('admin_logs', _log_row(2))
+    assert db.executed == []
+    buf.add('admin_logs', _log_row(3))
+
+    # Written by the flush thread, not by add()
+    assert _wait_for(lambda: len(db.executed) == 1)
+    sql, params = db.executed[0]
+    assert sql.startswith("INSERT INTO admin_logs")
+    assert sql.count("(%s, %s, %s, %s, %s)") == 3
+    assert len(params) == 15
+    assert buf.pending() == 0
+    buf.close()
+
+def test_failed_flush_spools_rows_and_retries(tmp_path):
+    db = FakeDB()
+    spool = tmp_path / "spool"
+    buf = WriteBehindBuffer(db, flush_size=100, flush_interval=60, spool_path=str(spool))
+    buf.add('admin_logs', _log_row(1))
+    db.fail = True
+    assert buf.flush() == 0
+    assert spool.exists()
+
+    db.fail = False
+    buf.add('admin_logs', _log_row(2))
+    assert buf.flush() == 2
+    assert not spool.exists()
+    # The spooled row is retried in its own insert, before new rows
+    assert [params[3] for _, params in db.executed] == ['change 1', 'change 2']
+    buf.close()
+
+def test_rejected_row_is_dead_lettered_without_blocking_others(tmp_path):
+    db = FakeDB()
+    spool = tmp_path / "spool"
+    buf = WriteBehindBuffer(db, flush_size=100, flush_interval=60,
+                            spool_path=str(spool), max_attempts=2)
+    db.reject = 'change 2'
+    for i in range(1, 4):
+        buf.add('admin_logs', _log_row(i))
+    # Batch fails, rows 1 and 3 go in one by one, row 2 is spooled
+    assert buf.flush() == 2
+    assert [params[3] for _, params in db.executed] == ['change 1', 'change 3']
+    assert spool.exists()
+
+    buf.add('admin_logs', _log_row(4))
+    assert buf.flush() == 1
+    assert not spool.exists()
+    dead = [json.loads(line) for line in open(str(spool) + '.dead')]
+    assert [(entry['row'][3], entry['attempts']) for entry in dead] == [('change 2', 2)]
+    buf.close()
+
+def test_unreachable_database_does_not_count_attempts(tmp_path):
+    class DownDB(FakeDB):
+        @contextmanager
+        def get_cursor(self, query_name=None):
+            raise psycopg2.OperationalError("connection refused")
+            yield
+
+    spool = tmp_path / "spool"
+    buf = WriteBehindBuffer(DownDB(), flush_size=100, flush_interval=60,
+                            spool_path=str(spool), max_attempts=1)
+    buf.add('admin_logs', _log_row(1))
+    for _ in range(3):
+        assert buf.flush() == 0
+    assert [json.loads(line)['attempts'] for line in open(spool)] == [0]
+    assert not (tmp_path / "spool.dead").exists()
+    buf.db = FakeDB()
+    buf.close()
+
+def test_commit_round_inserts_round_even_when_buffered(tmp_path):
+    db = DatabaseHelper.__new__(DatabaseHelper)
+    fake = FakeDB()
+    db.get_cursor = fake.get_cursor
+    db.write_buffer = WriteBehindBuffer(fake, flush_size=100, flush_interval=60,
+                                        spool_path=str(tmp_path / "spool"))
+    assert db.commit_round(1, 1, 10, [], [], 20, 18, 'win', 10, 1010) == 1
+    assert fake.executed[0][0].strip().startswith("INSERT INTO game_rounds")
+    assert db.write_buffer.pending() == 0
+    db.write_buffer.close()
+
+def test_buffered_round_touches_nothing_until_written(tmp_path):
+    # Profile totals are applied by trigger with the row, not beforehand
+    db = DatabaseHelper.__new__(DatabaseHelper)
+    fake = FakeDB()
+    db.get_cursor = fake.get_cursor
+    db.write_buffer = WriteBehindBuffer(fake, flush_size=100, flush_interval=60,
+                                        spool_path=str(tmp_path / "spool"))
+    assert db.save_game_round(1, 1, 10, [], [], 20, 18, 'win', 10, 1010) is None
+    assert fake.executed == []
+    assert db.write_buffer.flush() == 1
+    assert [sql.split('(')[0].strip() for sql, _ in fake.executed] == ["INSERT INTO game_rounds"]
+    db.write_buffer.close()